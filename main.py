@@ -1,29 +1,19 @@
 import json
-import os
 import sys
 from pathlib import Path
 
-import typer
-
-# Runners
-from media_processor.runner import (
-    batch_audio_runner,
-    batch_runner_media_converter,
-    batch_timelapse,
-    add_chapters_runner,
-    batch_merge_runner,
-    batch_subtitle_runner,
-)
-
-app = typer.Typer(help="Media Processor CLI")
-
-
-@app.callback()
-def callback():
-    """
-    Media Processor CLI Entry Point
-    """
+from media_processor.runner import registry
 
+"""
+CLI Entry Point:
+启动路径尽量轻: watch / cron 每天会启动上千次，大部分时候其实没事可做。
+- task 对应的 runner (以及它的 processor) 只在被选中时才 import (见 runner/registry.py)
+- `run` / `plan` 走 argparse 快速路径，typer 只在需要完整 CLI (帮助、report) 时才加载
+- `plan` / `run --dry-run` 只做发现 (目录遍历 + 存在性检查)，不启动 ffmpeg
+- `plan --output plan.json [--shards N]` 输出完整 job 列表，`run --plan plan.json [--shard K]` 原样执行
+- `calibrate [--jobs N]` 在本机实测 libx264 线程组合 (供 convert 的 auto_tune 使用)
+启动耗时可用 `make bench-startup` 测量。
+"""
 
 DEFAULT_PARAMS_FILE = Path("params/params.json")
 
@@ -46,85 +36,359 @@ def load_params(config_path: Path):
         sys.exit(1)
 
 
-@app.command()
-def run(
-    config: Path = typer.Option(
-        DEFAULT_PARAMS_FILE, "--config", "-c", help="Path to JSON config file"
-    )
-):
-    """Run task based on configuration file (default: params/params.json)."""
-    params = load_params(config)
+def validate_params(params):
+    """Checks the task name and required fields, exiting on error.
+
+    Returns:
+        str: The task type.
+    """
     task_type = params.get("task")
-    output_dir = params.get("output_dir")
 
     if not task_type:
         print("❌ Missing 'task' field in params.json")
         sys.exit(1)
 
-    print(f"🚀 Launching Task: {task_type.upper()}")
+    if task_type not in registry.TASKS:
+        print(f"❌ Unknown task type: {task_type}")
+        print(f"Available tasks: {', '.join(registry.task_names())}")
+        sys.exit(1)
+
+    if registry.TASKS[task_type]["requires_output_dir"] and not params.get(
+        "output_dir"
+    ):
+        print(f"❌ Missing 'output_dir' for {task_type} task.")
+        sys.exit(1)
+
+    if params.get("dedup", "off") != "off":
+        from media_processor.service.common.dedup import DEDUP_POLICIES
 
-    if task_type == "audio":
-        if not output_dir:
-            print("❌ Missing 'output_dir' for audio task.")
+        if params["dedup"] not in DEDUP_POLICIES:
+            print(f"❌ Invalid 'dedup' value: {params['dedup']}")
+            print(f"Available policies: {', '.join(DEDUP_POLICIES)}")
             sys.exit(1)
-        batch_audio_runner.run(
-            input_dirs=params.get("input_dirs", []),
-            output_dir=output_dir,
-            batch_size=params.get("batch_size", 0),
-        )
 
-    elif task_type == "convert":
-        if not output_dir:
-            print("❌ Missing 'output_dir' for convert task.")
+    if params.get("encoder") or params.get("quality") or params.get("speed"):
+        from media_processor.service.media_process import encoders
+
+        # encoder 可以写编码器名 (libx265) 或编码格式 (hevc)
+        names = list(encoders.ENCODERS) + list(encoders.FAMILIES)
+        if params.get("encoder") and params["encoder"] not in names:
+            print(f"❌ Invalid 'encoder' value: {params['encoder']}")
+            print(f"Available encoders: {', '.join(names)}")
             sys.exit(1)
-        batch_runner_media_converter.run(
-            input_dirs=params.get("input_dirs", []),
-            output_dir=output_dir,
-            use_gpu=params.get("use_gpu", False),
-            target_resolution=params.get("resolution", "1080p"),
-            delete_source=params.get("delete_source", False),
-            use_suffix=params.get("use_suffix", False),
-            compatibility_mode=params.get("compatibility_mode", False),
-            embed_subtitles=params.get("embed_subtitles", False),
-            remove_subtitle=params.get("remove_subtitle", False),
-            test_mode=params.get("test", False),
-        )
+        for key, levels in (
+            ("quality", encoders.QUALITY_LEVELS),
+            ("speed", encoders.SPEED_LEVELS),
+        ):
+            if params.get(key) and params[key] not in levels:
+                print(f"❌ Invalid '{key}' value: {params[key]}")
+                print(f"Available levels: {', '.join(levels)}")
+                sys.exit(1)
 
-    elif task_type == "timelapse":
-        if not output_dir:
-            print("❌ Missing 'output_dir' for timelapse task.")
+    if params.get("streaming"):
+        from media_processor.service.media_process import streaming
+
+        try:
+            streaming.normalize_options(params["streaming"])
+        except ValueError as e:
+            print(f"❌ Invalid 'streaming' value: {e}")
+            print(f"Available formats: {', '.join(streaming.STREAMING_FORMATS)}")
             sys.exit(1)
-        batch_timelapse.run(
-            input_dirs=params.get("input_dirs", []),
-            output_dir=output_dir,
-            speed_ratio=params.get("speed_ratio", 20),
-            use_gpu=params.get("use_gpu", True),
-        )
 
-    elif task_type == "chapter":
-        add_chapters_runner.run(tasks=params.get("tasks", []), output_dir=output_dir)
+    return task_type
 
-    elif task_type == "merge":
-        if not output_dir:
-            print("❌ Missing 'output_dir' for merge task.")
+
+def print_plan(task_type, jobs):
+    """Prints the jobs a run would execute."""
+    skipped = [j for j in jobs if j["skip"]]
+    print(f"📋 Plan: {task_type.upper()} ({len(jobs)} jobs, {len(skipped)} skipped)")
+    for job in jobs:
+        if job["skip"]:
+            print(f"  ⏭️  {job['input']} ({job['skip']})")
+        else:
+            print(f"  ▶️  {job['input']} -> {', '.join(job['outputs'])}")
+            if job.get("not_yet_detected"):
+                pending = ", ".join(job["not_yet_detected"])
+                print(f"      🔍 Not yet detected: {pending} (decided when encoding)")
+
+
+def plan_command(config: Path, output: Path = None, shards=1):
+    """Lists the jobs of a config without running anything.
+
+    With `output`, writes the full plan (ffmpeg argv, cost estimates, shards) as JSON
+    for `run --plan`.
+    """
+    params = load_params(config)
+    task_type = validate_params(params)
+
+    if not output and shards <= 1:
+        runner = registry.load_runner(task_type)
+        jobs = runner.plan(**registry.build_kwargs(task_type, params))
+        print_plan(task_type, jobs)
+        return
+
+    from media_processor.runner import job_plan
+
+    plan = job_plan.build_plan(task_type, params, shards)
+    print_plan(task_type, plan["jobs"])
+    print(f"\n⚖️  Shards: {plan['shards']}")
+    for shard, cost in enumerate(plan["shard_costs"]):
+        count = len(job_plan.select_jobs(plan, shard))
+        print(f"   #{shard}: {count} jobs, ~{cost / 60:.1f} min")
+    if params.get("dedup", "off") != "off":
+        print("⚠️  dedup is not applied to plan files (it needs content hashes).")
+    if output:
+        job_plan.write_plan(plan, output)
+        print(f"💾 Plan saved: {output}")
+
+
+def run_command(
+    config: Path,
+    profile: Path = None,
+    dry_run=False,
+    plan: Path = None,
+    shard=None,
+    metrics_file: Path = None,
+    metrics_port=None,
+):
+    """Run task based on configuration file (default: params/params.json)."""
+    if dry_run:
+        plan_command(config)
+        return
+
+    exporters = (metrics_file, metrics_port)
+    if plan:
+        from media_processor.runner import job_plan
+
+        try:
+            loaded = job_plan.load_plan(plan)
+        except (OSError, ValueError) as e:
+            print(f"❌ Failed to load plan: {e}")
+            sys.exit(1)
+        try:
+            job_plan.check_shard(loaded, shard)
+        except ValueError as e:
+            print(f"❌ {e}")
             sys.exit(1)
-        batch_merge_runner.run(
-            input_dirs=params.get("input_dirs", []), output_dir=output_dir
+        _instrumented(
+            loaded["task"], exporters, profile, job_plan.execute_plan, loaded, shard
         )
+        return
+
+    params = load_params(config)
+    task_type = validate_params(params)
+    _instrumented(task_type, exporters, profile, _run_task, task_type, params)
+
+
+def _instrumented(task_type, exporters, profile, func, *args):
+    """Calls `func` with metrics exported to `exporters` (textfile, port) if given."""
+    metrics_file, metrics_port = exporters
+    if not metrics_file and not metrics_port:
+        _profiled(profile, func, *args)
+        return
+
+    from media_processor.service.common import metrics
 
-    elif task_type == "subtitle":
-        # output_dir is optional for subtitle task (In-place processing)
-        batch_subtitle_runner.run(
-            input_dirs=params.get("input_dirs", []),
-            output_dir=output_dir,  # Can be None
-            remove_subtitle=params.get("remove_subtitle", True),
+    try:
+        metrics.enable(task_type, metrics_file, metrics_port)
+    except OSError as e:
+        print(f"❌ Failed to start metrics: {e}")
+        sys.exit(1)
+    try:
+        _profiled(profile, func, *args)
+    finally:
+        metrics.shutdown()
+
+
+def _profiled(profile, func, *args):
+    """Calls `func`, recording a trace to `profile` if given."""
+    if not profile:
+        func(*args)
+        return
+
+    from media_processor.service.common import profiler
+
+    profiler.enable()
+    try:
+        func(*args)
+    finally:
+        profiler.export(profile)
+
+
+def _run_task(task_type, params):
+    """Dispatches a validated configuration to its task runner."""
+    print(f"🚀 Launching Task: {task_type.upper()}")
+    runner = registry.load_runner(task_type)
+    runner.run(**registry.build_kwargs(task_type, params))
+
+
+def report_command(by, period):
+    """Show how encode throughput (realtime factor) varies by setting over time."""
+    from media_processor.service.common import perf_history
+
+    rows = perf_history.build_report(perf_history.load_records(), by=by, period=period)
+    print(perf_history.format_report(rows, by))
+
+
+def calibrate_command(jobs=1, seconds=None, sizes=None):
+    """Benchmark libx264 thread layouts on this machine for `auto_tune`."""
+    import subprocess
+
+    from media_processor.service.media_process import tuning
+
+    seconds = seconds or tuning.CALIBRATION_SECONDS
+    print(f"⏱️  Calibrating libx264 ({jobs} parallel jobs, {seconds}s testsrc2 clips)...")
+    try:
+        tuning.calibrate(jobs, seconds, sizes)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"❌ Calibration failed: {e}")
+        sys.exit(1)
+    print("💾 Saved. Convert tasks with `auto_tune: true` now use these settings.")
+
+
+# --- CLI ---
+
+
+def build_app():
+    """Builds the full typer CLI (imported lazily: typer is slow to import)."""
+    from typing import List
+
+    import typer
+
+    app = typer.Typer(help="Media Processor CLI")
+
+    @app.callback()
+    def callback():
+        """
+        Media Processor CLI Entry Point
+        """
+
+    @app.command()
+    def run(
+        config: Path = typer.Option(
+            DEFAULT_PARAMS_FILE, "--config", "-c", help="Path to JSON config file"
+        ),
+        profile: Path = typer.Option(
+            None,
+            "--profile",
+            help="Write a per-stage timing trace (Chrome trace JSON) to this file",
+        ),
+        dry_run: bool = typer.Option(
+            False, "--dry-run", help="Only list the jobs that would run"
+        ),
+        plan: Path = typer.Option(
+            None, "--plan", help="Execute the jobs of a plan file (see `plan --output`)"
+        ),
+        shard: int = typer.Option(
+            None, "--shard", help="With --plan: only run the jobs of this shard"
+        ),
+        metrics_file: Path = typer.Option(
+            None,
+            "--metrics-file",
+            help="Write Prometheus metrics to this .prom file (textfile collector)",
+        ),
+        metrics_port: int = typer.Option(
+            None, "--metrics-port", help="Serve Prometheus metrics on localhost:PORT"
+        ),
+    ):
+        """Run task based on configuration file (default: params/params.json)."""
+        run_command(config, profile, dry_run, plan, shard, metrics_file, metrics_port)
+
+    @app.command()
+    def plan(
+        config: Path = typer.Option(
+            DEFAULT_PARAMS_FILE, "--config", "-c", help="Path to JSON config file"
+        ),
+        output: Path = typer.Option(
+            None,
+            "--output",
+            "-o",
+            help="Write the full plan (ffmpeg argv, estimated cost) as JSON",
+        ),
+        shards: int = typer.Option(
+            1, "--shards", help="Split the jobs into N balanced shards"
+        ),
+    ):
+        """List the jobs a config would run (discovery only, nothing is processed)."""
+        plan_command(config, output, shards)
+
+    @app.command()
+    def report(
+        by: str = typer.Option(
+            "compatibility_mode",
+            "--by",
+            "-b",
+            help="Setting to compare (e.g. compatibility_mode, encoder, preset, resolution, host)",
+        ),
+        period: str = typer.Option(
+            "week", "--period", "-p", help="day, week or month"
+        ),
+    ):
+        """Show how encode throughput (realtime factor) varies by setting over time."""
+        report_command(by, period)
+
+    @app.command()
+    def calibrate(
+        jobs: int = typer.Option(
+            1, "--jobs", "-j", help="Number of encodes that run at the same time"
+        ),
+        seconds: int = typer.Option(
+            None, "--seconds", help="Length of the synthetic clip per measurement"
+        ),
+        size: List[str] = typer.Option(
+            None, "--size", help="Only calibrate these sizes (480p, 720p, 1080p, 2160p)"
+        ),
+    ):
+        """Measure the fastest libx264 thread layout on this machine (for auto_tune)."""
+        calibrate_command(jobs, seconds, size or None)
+
+    return app
+
+
+# 不需要 typer 的常用命令 (帮助信息仍由 typer 提供)
+FAST_COMMANDS = ("run", "plan")
+
+
+def _fast_cli(argv):
+    """Parses `run` / `plan` with argparse, skipping the typer import."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="main.py", add_help=False)
+    parser.add_argument("command", choices=FAST_COMMANDS)
+    parser.add_argument("--config", "-c", type=Path, default=DEFAULT_PARAMS_FILE)
+    if argv[0] == "run":
+        parser.add_argument("--profile", type=Path, default=None)
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--plan", type=Path, default=None)
+        parser.add_argument("--shard", type=int, default=None)
+        parser.add_argument("--metrics-file", type=Path, default=None)
+        parser.add_argument("--metrics-port", type=int, default=None)
+    else:
+        parser.add_argument("--output", "-o", type=Path, default=None)
+        parser.add_argument("--shards", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "plan":
+        plan_command(args.config, args.output, args.shards)
+    else:
+        run_command(
+            args.config,
+            args.profile,
+            args.dry_run,
+            args.plan,
+            args.shard,
+            args.metrics_file,
+            args.metrics_port,
         )
 
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in FAST_COMMANDS and not {"--help", "-h"} & set(argv):
+        _fast_cli(argv)
     else:
-        print(f"❌ Unknown task type: {task_type}")
-        print("Available tasks: audio, convert, timelapse, chapter, merge, subtitle")
-        sys.exit(1)
+        build_app()(args=argv)
 
 
 if __name__ == "__main__":
-    app()
+    main()
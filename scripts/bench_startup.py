@@ -0,0 +1,93 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+"""
+Startup Benchmark:
+测量 CLI 的启动开销 (cron / watch 场景下绝大多数调用都是 "没事可做")。
+
+- plan:   快速路径 (argparse + 只加载被选中的 runner)，对一个空目录做 convert 发现
+- --help: 完整 typer CLI
+- import: `python -X importtime` 下 plan 路径里最耗时的模块
+
+Usage:
+    PYTHONPATH=src python scripts/bench_startup.py [runs]
+"""
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _time_command_python(runs, env):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], env=env)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def _time_command(args, runs, env):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(ROOT / "main.py")] + args,
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def _slowest_imports(args, env, top=10):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", str(ROOT / "main.py")] + args,
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    env = dict(os.environ, PYTHONPATH=str(ROOT / "src"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = Path(tmp) / "params.json"
+        config.write_text(
+            json.dumps(
+                {"task": "convert", "input_dirs": [tmp], "output_dir": f"{tmp}/out"}
+            ),
+            encoding="utf-8",
+        )
+        plan_args = ["plan", "--config", str(config)]
+
+        baseline = _time_command_python(runs, env)
+        print(f"🐍 python -c pass:   {baseline:7.1f} ms")
+        print(f"📋 plan (fast path): {_time_command(plan_args, runs, env):7.1f} ms")
+        print(f"📖 --help (typer):   {_time_command(['--help'], runs, env):7.1f} ms")
+
+        print("\n🐢 Slowest imports on the plan path (cumulative):")
+        for cumulative, name in _slowest_imports(plan_args, env):
+            print(f"   {cumulative / 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # --- Default Paths ---
@@ -5,6 +6,18 @@ from pathlib import Path
 INPUT_DIR = Path("resources")
 OUTPUT_DIR = Path("output")
 
+# --- Local State ---
+# 性能历史、探测缓存等本地状态 (可用环境变量 MEDIA_PROCESSOR_HOME 覆盖)
+STATE_DIR = Path(
+    os.environ.get("MEDIA_PROCESSOR_HOME", Path.home() / ".media_processor")
+)
+CACHE_DIR = STATE_DIR / "cache"
+PERF_HISTORY_FILE = STATE_DIR / "perf_history.jsonl"
+
+# 转码结果复用缓存 (内容寻址，LRU 淘汰)
+ARTIFACT_CACHE_DIR = CACHE_DIR / "artifacts"
+ARTIFACT_CACHE_MAX_GB = float(os.environ.get("MEDIA_PROCESSOR_ARTIFACT_CACHE_GB", 50))
+
 
 # --- FFmpeg Settings ---
 
@@ -12,14 +25,92 @@ OUTPUT_DIR = Path("output")
 AUDIO_BITRATE = "128k"
 AUDIO_SAMPLE_RATE = "44100"
 AUDIO_CODEC = "libmp3lame"
+AUDIO_OPUS_BITRATE = "96k"  # Opus 在 96k 下语音/音乐已接近透明
+AUDIO_OPUS_SAMPLE_RATE = "48000"  # libopus 不支持 44.1kHz
+
+# Loudness Normalization (EBU R128) & Silence Trimming
+LOUDNORM_TARGET_I = "-16"  # Integrated loudness (LUFS)，语音/播客常用值
+LOUDNORM_TARGET_TP = "-1.5"  # True peak (dBTP)
+LOUDNORM_TARGET_LRA = "11"  # Loudness range (LU)
+SILENCE_THRESHOLD = "-50dB"
+SILENCE_MIN_DURATION = "2"  # 超过 2 秒的静音才裁剪
+SILENCE_KEEP_DURATION = "0.5"  # 裁剪后保留 0.5 秒停顿，避免语句粘连
+SILENCE_SPLIT_DURATION = "0.8"  # 按时长分批时，可作为切分点的最短停顿
 
 # Video Conversion
-VIDEO_CRF_DEFAULT = "28"  # Balanced compression
-VIDEO_PRESET_DEFAULT = "fast"  # Good speed/size balance
+# 编码器档位 (各编码器的 CRF / preset 见 media_process/encoders.py)
+VIDEO_QUALITY_DEFAULT = "standard"  # Balanced compression (libx264 CRF 28)
+VIDEO_SPEED_DEFAULT = "fast"  # Good speed/size balance
 VIDEO_AUDIO_BITRATE = "128k"
+RESUMABLE_SEGMENT_SECONDS = 300  # 可恢复模式的片段时长，中断最多损失一个片段
+CALIBRATION_SECONDS = 5  # `calibrate` 每次测量的合成片段长度
+
+# Catalog Artifacts (与转码同一次解码生成)
+THUMBNAIL_SPRITE_INTERVAL = 10  # 每 10 秒取一帧
+THUMBNAIL_SPRITE_TILE = "5x5"  # 每张雪碧图 5x5 = 25 帧
+THUMBNAIL_SPRITE_WIDTH = 160
+THUMBNAIL_PREVIEW_DURATION = 10  # 预览片段秒数
+THUMBNAIL_PREVIEW_HEIGHT = 360
+THUMBNAIL_PREVIEW_CRF = "30"  # 预览片段只求小，画质要求低
+THUMBNAIL_PREVIEW_PRESET = "veryfast"
+THUMBNAIL_POSTER_POSITION = 0.1  # 封面取自 10% 处
+
+# Streaming Package (HLS / DASH)
+STREAMING_SEGMENT_DURATION = 6  # 分片秒数 (关键帧间隔)
+STREAMING_SEGMENT_TYPE = "fmp4"  # "fmp4" 或 "mpegts" (仅 HLS)
+
+# Concat (merge / audio)
+CONCAT_MAX_FILES = 1000  # 单次 concat 的最大片段数，超过则分层合并
+CONCAT_FD_RESERVE = 64  # 为 ffmpeg 自身保留的文件描述符
+# merge 分段输出: segment muxer 在切点之后的第一个关键帧处切开，切点按上限打折提前
+MERGE_SPLIT_MARGIN = 0.97
+
+# Interlace Detection (compatibility_mode 的去隔行)
+IDET_SAMPLES = 3  # 在片中均匀取几段做 idet
+IDET_SAMPLE_FRAMES = 200  # 每段分析的帧数
+IDET_INTERLACED_RATIO = 0.25  # TFF+BFF 占比超过此值判为隔行
+IDET_TELECINE_RATIO = 0.15  # 重复场占比超过此值判为 telecine (3:2 pulldown)
+
+# Auto Crop (cropdetect 去黑边)
+CROP_SAMPLES = 5  # 在片中均匀取几段做 cropdetect (暗场会误判，多取几段)
+CROP_SAMPLE_FRAMES = 60  # 每段分析的帧数
+CROP_CONSENSUS_RATIO = 0.5  # 最常见的矩形至少占这么多帧才采用，否则不裁
+CROP_MIN_RATIO = 0.02  # 裁掉的面积少于此比例时不裁 (省不了多少，还多一个滤镜)
+
+# Cut (无损裁剪)
+KEYFRAME_SCAN_SECONDS = 30  # 关键帧索引: 每个切点前后扫描的范围 (只读包，不解码)
+SMART_CUT_CRF = "18"  # smart cut 重编码首尾不完整 GOP 的质量 (接近视觉无损)
+
+# Auto Chapters (场景检测)
+SCENE_THRESHOLD = 0.4  # scene 分数阈值 (0~1)，越大切点越少
+SCENE_ANALYSIS_WIDTH = 160  # 检测时缩小到的宽度
+CHAPTER_MIN_SECONDS = 60  # 每章最短时长
+
+# I/O Scheduling (merge / subtitle / chapter 的 stream copy)
+IO_CONCURRENCY_HDD = 1  # 机械盘: 并发只会增加寻道
+IO_CONCURRENCY_SSD = 4
+IO_CONCURRENCY_UNKNOWN = 2  # 无法判断磁盘类型时 (非 Linux)
+
+# Metrics (Prometheus, run --metrics-file / --metrics-port)
+METRICS_FLUSH_SECONDS = 15  # textfile 的刷新间隔 (node_exporter 每次 scrape 读最新文件)
+METRICS_HOST = "127.0.0.1"  # /metrics 只监听本机 (需要远程抓取时经由反向代理)
+
+# Scratch Staging (convert: NAS 输入先复制到本地盘)
+STAGING_BUDGET_GB = 50  # 本地暂存区占用上限 (输入副本 + 待搬运的输出)
+STAGING_PREFETCH = 2  # 当前文件编码时提前复制的后续输入数
 
 # Timelapse
-TIMELAPSE_CRF = "24"  # Higher quality for timelapse
-TIMELAPSE_PRESET = "fast"
+TIMELAPSE_QUALITY = "high"  # Higher quality for timelapse (libx264 CRF 24)
+TIMELAPSE_HW_QUALITY = "standard"  # VideoToolbox default stays at -q:v 50
+TIMELAPSE_SPEED = "fast"
 TIMELAPSE_FRAMERATE = "30"
 DEFAULT_SPEED_RATIO = 20
+
+# Motion-Adaptive Timelapse (静止片段加速更多)
+TIMELAPSE_ADAPTIVE_MAX_FACTOR = 8  # 静止处最高倍速 = speed_ratio * 8
+MOTION_ANALYSIS_FPS = 4  # 运动分析的采样帧率
+MOTION_ANALYSIS_WIDTH = 64  # 分析用的缩小灰度帧 (64x36)
+MOTION_ANALYSIS_HEIGHT = 36
+MOTION_SMOOTH_SECONDS = 2  # 运动分数的平滑窗口
+MOTION_STATIC_SCORE = 1.0  # 相邻帧平均灰度差低于此值视为静止
+MOTION_ACTIVE_SCORE = 6.0  # 高于此值视为正常运动 (使用 speed_ratio)
@@ -14,3 +14,6 @@ VIDEO_EXTENSIONS = {
     ".m4v",
     ".vob",
 }
+
+# Sidecar subtitles (same stem as the video), in lookup order
+SUBTITLE_EXTENSIONS = (".srt", ".ass", ".vtt")
@@ -2,7 +2,10 @@ import os
 from pathlib import Path
 
 from media_processor.constant.constant import OUTPUT_DIR
+from media_processor.constant.extensions import VIDEO_EXTENSIONS
 
+from media_processor.runner import registry
+from media_processor.service.common import io_scheduler, probe
 from media_processor.service.media_process import chapter_processor
 
 # --- ⚙️ 任务配置区域 (TaskList) ---
@@ -16,12 +19,142 @@ TASKS = []
 # --------------------
 
 
-def run(tasks, output_dir=None):
+def output_path_for(source_path, output_root=None):
+    """Returns the output of a chapter task (原文件名_chapters.mp4)."""
+    output_filename = f"{source_path.stem}_chapters{source_path.suffix}"
+    if output_root:
+        return output_root / output_filename
+    return source_path.parent / output_filename
+
+
+def discover_videos(input_dirs, output_root=None):
+    """Walks the input directories for videos to get automatic chapters.
+
+    Returns:
+        list[tuple[Path, Path]]: (video, output) pairs; outputs mirror the input tree
+            under `output_root`, or sit next to the source.
+    """
+    pairs = []
+    for root_dir in input_dirs:
+        root_path = Path(root_dir).resolve()
+        if not root_path.exists():
+            print(f"⚠️  Directory not found: {root_dir}")
+            continue
+
+        for current_root, dirs, files in os.walk(root_path):
+            current_path = Path(current_root)
+            if output_root and (
+                output_root in current_path.parents or current_path == output_root
+            ):
+                continue
+            for f in sorted(files):
+                source_path = current_path / f
+                # 之前的产物 (_chapters) 不再处理
+                if (
+                    source_path.suffix.lower() not in VIDEO_EXTENSIONS
+                    or source_path.stem.endswith("_chapters")
+                ):
+                    continue
+                target_root = None
+                if output_root:
+                    target_root = output_root / current_path.relative_to(root_path)
+                pairs.append((source_path, output_path_for(source_path, target_root)))
+    return pairs
+
+
+def plan(tasks, output_dir=None, input_dirs=None, auto_chapters=None, **_options):
+    """Lists the chapter jobs (nothing is muxed).
+
+    Returns:
+        list[dict]: One job per configured file, then one per video found in
+            `input_dirs` (automatic chapters).
+    """
+    output_root = Path(output_dir).resolve() if output_dir else None
+    jobs = []
+    for task in tasks:
+        source_path = Path(task["file"])
+        output_path = output_path_for(source_path, output_root)
+        skip = None if source_path.exists() else "source not found"
+        if not skip and not task.get("chapters") and not auto_chapters:
+            skip = "no chapters"
+        kwargs = {
+            "video_path": str(source_path),
+            "output_path": str(output_path),
+            "chapters": task.get("chapters"),
+            "auto_chapters": auto_chapters,
+        }
+        jobs.append(
+            registry.make_job("chapter", source_path, [output_path], skip, kwargs)
+        )
+
+    if input_dirs and not auto_chapters:
+        print("⚠️  input_dirs needs auto_chapters (there are no chapter lists for them)")
+        return jobs
+
+    for source_path, output_path in discover_videos(input_dirs or [], output_root):
+        skip = "exists" if output_path.exists() else None
+        kwargs = {
+            "video_path": str(source_path),
+            "output_path": str(output_path),
+            "chapters": None,
+            "auto_chapters": auto_chapters,
+        }
+        jobs.append(
+            registry.make_job("chapter", source_path, [output_path], skip, kwargs)
+        )
+    return jobs
+
+
+def describe_jobs(jobs):
+    """Adds ffmpeg argv and media duration to planned jobs."""
+    for job in jobs:
+        if job["skip"]:
+            continue
+        input_file = Path(job["kwargs"]["video_path"]).resolve()
+        job["argv"] = [
+            chapter_processor.build_command(
+                input_file,
+                chapter_processor.metadata_path_for(input_file),
+                Path(job["kwargs"]["output_path"]).resolve(),
+            )
+        ]
+        job["media_duration"] = probe.probe_media(input_file).get("duration", 0.0)
+        job["estimated_seconds"] = None
+    return jobs
+
+
+def execute_job(job):
+    """Runs one planned job (see `plan`)."""
+    Path(job["kwargs"]["output_path"]).parent.mkdir(parents=True, exist_ok=True)
+    chapter_processor.inject_chapters(**job["kwargs"])
+
+
+def io_paths(job):
+    """Files a job reads and writes (for per-device I/O scheduling)."""
+    return [Path(job["kwargs"]["video_path"])], [Path(job["kwargs"]["output_path"])]
+
+
+def run(
+    tasks,
+    output_dir=None,
+    input_dirs=None,
+    auto_chapters=None,
+    jobs=1,
+    io_concurrency=None,
+):
     """Executes the chapter injection task.
 
     Args:
-        tasks (list): List of task dictionaries.
+        tasks (list): List of task dictionaries. Entries without "chapters" use
+            `auto_chapters`.
         output_dir (str, optional): Output directory. If None, saves next to source.
+        input_dirs (list[str], optional): Folders whose videos all get automatic
+            chapters (needs `auto_chapters`).
+        auto_chapters (bool | dict, optional): Detect chapters from scene cuts:
+            true, or {"threshold": 0.4, "min_length": 60}.
+        jobs (int): Number of videos analysed / muxed at the same time.
+        io_concurrency (int | dict, optional): Jobs per disk at the same time
+            (default: 1 on spinning disks, 4 on SSDs; see `io_scheduler.run_jobs`).
     """
     print(f"=== Starting Chapter Injection ===")
     if output_dir:
@@ -32,25 +165,24 @@ def run(tasks, output_dir=None):
         output_root = None
         print(f"Output Dir: [Same as Source]\n")
 
-    for task in tasks:
-        source_path = Path(task["file"])
-        chapters_data = task["chapters"]
-
-        if not source_path.exists():
-            print(f"⚠️  Source file not found: {source_path}")
-            continue
-
-        # 自动生成输出文件名 (原文件名_chapters.mp4)
-        output_filename = f"{source_path.stem}_chapters{source_path.suffix}"
-        if output_root:
-            output_path = output_root / output_filename
-        else:
-            output_path = source_path.parent / output_filename
-
-        # 调用处理器
-        chapter_processor.inject_chapters(
-            video_path=source_path, output_path=output_path, chapters=chapters_data
-        )
+    if auto_chapters:
+        print(f"Auto Chapters: Enabled (Parallel Jobs: {jobs})\n")
+
+    # 自动生成输出文件名 (原文件名_chapters.mp4)
+    planned = plan(tasks, output_dir, input_dirs, auto_chapters)
+    for job in planned:
+        if job["skip"] == "source not found":
+            print(f"⚠️  Source file not found: {job['input']}")
+        elif job["skip"]:
+            print(f"⏭️  Skipping ({job['skip']}): {job['input']}")
+
+    # 场景检测 (只解码关键帧) 与 stream copy 都很轻，多个文件并发处理，
+    # 同时按磁盘限制并发 (机械盘上不互相抢寻道)
+    runnable = [j for j in planned if not j["skip"]]
+    devices = io_scheduler.run_jobs(
+        runnable, execute_job, io_paths, io_concurrency, max_jobs=max(1, jobs)
+    )
+    io_scheduler.print_report(devices)
 
     print("\n🎉 All Tasks Completed.")
 
@@ -4,7 +4,9 @@ from pathlib import Path
 from media_processor.constant.constant import INPUT_DIR, OUTPUT_DIR
 from media_processor.constant.constant import INPUT_DIR, OUTPUT_DIR
 from media_processor.constant.extensions import VIDEO_EXTENSIONS
-from media_processor.service.audio_abstracter import audio_processor
+from media_processor.runner import registry
+from media_processor.service.common import dedup, metrics, probe, profiler
+from media_processor.service.audio_abstracter import audio_processor, loudness
 
 
 # --------------------
@@ -29,20 +31,17 @@ def is_video_folder(folder_path):
     return False
 
 
-def run(input_dirs, output_dir, batch_size=0):
-    """Executes the batch audio extraction task.
+def discover_folders(input_dirs, output_root):
+    """Walks the input directories for folders containing videos.
 
     Args:
         input_dirs (list[str]): List of input directories.
-        output_dir (str): Output directory.
-        batch_size (int): Batch size for merging.
-    """
-    print(f"=== Starting Audio Extraction Batch ===")
-    print(f"Output Root: {output_dir}")
-    print(f"Batch Size:  {'All in one' if batch_size == 0 else batch_size}")
+        output_root (Path): Output root directory (mirrors the input tree).
 
-    output_root = Path(output_dir)
-    tasks_found = 0
+    Returns:
+        list[tuple[Path, Path]]: (video folder, target output directory).
+    """
+    folders = []
 
     for root_dir in input_dirs:
         root_path = Path(root_dir).resolve()
@@ -60,8 +59,6 @@ def run(input_dirs, output_dir, batch_size=0):
                 if output_root in current_path.parents or current_path == output_root:
                     continue
 
-                tasks_found += 1
-
                 # 计算相对路径
                 try:
                     relative_path = current_path.relative_to(root_path)
@@ -70,14 +67,205 @@ def run(input_dirs, output_dir, batch_size=0):
                     relative_path = Path(current_path.name)
 
                 # 拼接输出路径
-                target_output_dir = output_root / relative_path
+                folders.append((current_path, output_root / relative_path))
+
+    return folders
+
 
-                # 调用核心处理函数
-                audio_processor.process_folder(
-                    input_dir=current_path,
-                    output_root=target_output_dir,
-                    batch_size=batch_size,
+def _planned_batches(input_dir, target_dir, batch_size, batch_minutes, split_at_silence):
+    """Predicts a folder's batches: (videos, their temp WAVs, batches).
+
+    Silence cut points are only known for sources analysed by an earlier run (cache).
+    """
+    videos = audio_processor.list_videos(input_dir)
+    temp_dir = target_dir / "temp_wav_extracted"
+    temp_audios = [temp_dir / f"{v.stem}.wav" for v in videos]
+    cut_points = {}
+    if split_at_silence:
+        cut_points = {v: loudness.cached_silences(v) for v in videos}
+    batches = audio_processor.plan_batches(
+        videos, temp_audios, batch_size, batch_minutes, cut_points
+    )
+    return videos, temp_audios, batches
+
+
+def plan(
+    input_dirs,
+    output_dir,
+    batch_size=0,
+    normalize_loudness=False,
+    trim_silence=False,
+    batch_minutes=0,
+    split_at_silence=False,
+    audio_codec=None,
+    jobs=None,
+    **_options,
+):
+    """Lists the audio jobs (nothing is extracted; with batch_minutes, sources are probed).
+
+    Returns:
+        list[dict]: One job per video folder; outputs are the audio files of its
+            batches.
+    """
+    planned = []
+    for current_path, target_output_dir in discover_folders(
+        input_dirs, Path(output_dir)
+    ):
+        target_dir = audio_processor.target_dir_for(current_path, target_output_dir)
+        _, _, batches = _planned_batches(
+            current_path, target_dir, batch_size, batch_minutes, split_at_silence
+        )
+        outputs = [
+            target_dir / audio_processor.output_name_for(b, audio_codec)
+            for b in batches
+        ]
+        skip = "exists" if all(o.exists() for o in outputs) else None
+        kwargs = {
+            "input_dir": str(current_path),
+            "output_root": str(target_output_dir),
+            "batch_size": batch_size,
+            "normalize_loudness": normalize_loudness,
+            "trim_silence": trim_silence,
+            "batch_minutes": batch_minutes,
+            "split_at_silence": split_at_silence,
+            "audio_codec": audio_codec,
+            "jobs": jobs,
+        }
+        planned.append(registry.make_job("audio", current_path, outputs, skip, kwargs))
+    return planned
+
+
+def describe_jobs(jobs):
+    """Adds ffmpeg argv (extract + merge) and total media duration to planned jobs.
+
+    The loudnorm values are measured during the run, so the planned merge commands
+    only carry the silence-trimming filter.
+    """
+    for job in jobs:
+        if job["skip"]:
+            continue
+        kwargs = job["kwargs"]
+        target_dir = audio_processor.target_dir_for(
+            kwargs["input_dir"], kwargs["output_root"]
+        )
+        videos, temp_audios, batches = _planned_batches(
+            kwargs["input_dir"],
+            target_dir,
+            kwargs["batch_size"],
+            kwargs.get("batch_minutes", 0),
+            kwargs.get("split_at_silence", False),
+        )
+
+        argv = [
+            audio_processor.full_command(audio_processor.build_extract_command(v, t))
+            for v, t in zip(videos, temp_audios)
+        ]
+        audio_filter = loudness.build_audio_filters(None, kwargs["trim_silence"])
+        audio_codec = kwargs.get("audio_codec")
+        for batch in batches:
+            output_name = audio_processor.output_name_for(batch, audio_codec)
+            argv.append(
+                audio_processor.full_command(
+                    audio_processor.build_merge_command(
+                        target_dir / output_name, audio_filter, audio_codec
+                    )
                 )
+            )
+        job["argv"] = argv
+        job["media_duration"] = sum(
+            probe.probe_media(v).get("duration", 0.0) for v in videos
+        )
+        job["estimated_seconds"] = None
+    return jobs
+
+
+def execute_job(job):
+    """Runs one planned job (see `plan`)."""
+    with profiler.span("folder", folder=Path(job["input"]).name):
+        audio_processor.process_folder(**job["kwargs"])
+
+
+def run(
+    input_dirs,
+    output_dir,
+    batch_size=0,
+    normalize_loudness=False,
+    trim_silence=False,
+    batch_minutes=0,
+    split_at_silence=False,
+    dedup_policy="off",
+    audio_codec=None,
+    jobs=None,
+):
+    """Executes the batch audio extraction task.
+
+    Args:
+        input_dirs (list[str]): List of input directories.
+        output_dir (str): Output directory.
+        batch_size (int): Batch size for merging.
+        normalize_loudness (bool): Two-pass EBU R128 loudness normalization.
+        trim_silence (bool): Remove long silent gaps.
+        batch_minutes (float): Target duration per MP3 (overrides batch_size).
+        split_at_silence (bool): With batch_minutes, cut inside clips at pauses.
+        dedup_policy (str): "off", "skip" or "link". Merged outputs can't be
+            linked per source, so both "skip" and "link" leave duplicates out.
+        audio_codec (str, optional): "mp3" (default), "opus" (.opus) or "aac" (.m4a).
+        jobs (int, optional): Batches of a folder encoded at the same time
+            (default: CPU count; the encoders are single-threaded).
+    """
+    print(f"=== Starting Audio Extraction Batch ===")
+    print(f"Output Root: {output_dir}")
+    if batch_minutes:
+        print(
+            f"Batch Duration: ~{batch_minutes} min"
+            f"{' (split at silence)' if split_at_silence else ''}"
+        )
+    else:
+        print(f"Batch Size:  {'All in one' if batch_size == 0 else batch_size}")
+    if normalize_loudness:
+        print(f"Loudness Normalization: Enabled (EBU R128)")
+    if trim_silence:
+        print(f"Silence Trimming: Enabled")
+    if dedup_policy != "off":
+        print(f"Dedup: {dedup_policy}")
+    audio_processor.codec_spec(audio_codec)  # 未知编码在开始前报错
+    print(f"Codec: {audio_codec or 'mp3'} | Encode Jobs: {jobs or os.cpu_count()}")
+
+    output_root = Path(output_dir)
+
+    with profiler.span("walk"):
+        folders = discover_folders(input_dirs, output_root)
+
+    tasks_found = len(folders)
+
+    # 内容去重: 重复的视频不再抽取音频
+    skip_files = set()
+    if dedup_policy != "off":
+        videos = sorted(
+            p
+            for folder, _ in folders
+            for p in folder.iterdir()
+            if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
+        )
+        with profiler.span("dedup"):
+            skip_files = set(dedup.build_index(videos).duplicates)
+
+    metrics.jobs_queued(len(folders))
+    for current_path, target_output_dir in folders:
+        # 调用核心处理函数
+        with profiler.span("folder", folder=current_path.name), metrics.job():
+            audio_processor.process_folder(
+                input_dir=current_path,
+                output_root=target_output_dir,
+                batch_size=batch_size,
+                normalize_loudness=normalize_loudness,
+                trim_silence=trim_silence,
+                skip_files=skip_files,
+                batch_minutes=batch_minutes,
+                split_at_silence=split_at_silence,
+                audio_codec=audio_codec,
+                jobs=jobs,
+            )
 
     if tasks_found == 0:
         print("No video folders found.")
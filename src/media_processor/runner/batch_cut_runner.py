@@ -0,0 +1,169 @@
+import os
+import re
+from pathlib import Path
+
+from media_processor.constant.extensions import VIDEO_EXTENSIONS
+from media_processor.runner import registry
+from media_processor.service.common import io_scheduler, profiler
+from media_processor.service.media_process import cut_processor
+
+# 之前的产物 (原文件名_cut01.mp4) 不再作为输入
+CUT_OUTPUT_RE = re.compile(r"_cut\d{2}$")
+
+
+def discover_videos(input_dirs, output_root=None):
+    """Walks the input directories for videos to cut with the shared `ranges`.
+
+    Returns:
+        list[tuple[Path, Path | None]]: (video, output folder) pairs; output folders
+            mirror the input tree under `output_root` (None: next to the source).
+    """
+    pairs = []
+    for root_dir in input_dirs:
+        root_path = Path(root_dir).resolve()
+        if not root_path.exists():
+            print(f"⚠️  Directory not found: {root_dir}")
+            continue
+
+        for current_root, dirs, files in os.walk(root_path):
+            current_path = Path(current_root)
+            if output_root and (
+                output_root in current_path.parents or current_path == output_root
+            ):
+                continue
+            for f in sorted(files):
+                source_path = current_path / f
+                if source_path.suffix.lower() not in VIDEO_EXTENSIONS or (
+                    CUT_OUTPUT_RE.search(source_path.stem)
+                ):
+                    continue
+                target_root = None
+                if output_root:
+                    target_root = output_root / current_path.relative_to(root_path)
+                pairs.append((source_path, target_root))
+    return pairs
+
+
+def _make_job(source_path, ranges, target_root, smart_cut):
+    outputs = [
+        cut_processor.output_path_for(source_path, i, target_root)
+        for i in range(1, len(ranges) + 1)
+    ]
+    skip = None
+    if not source_path.exists():
+        skip = "source not found"
+    elif not ranges:
+        skip = "no ranges"
+    elif all(o.exists() for o in outputs):
+        skip = "exists"
+    kwargs = {
+        "video_path": str(source_path),
+        "ranges": ranges,
+        "output_paths": [str(o) for o in outputs],
+        "smart_cut": smart_cut,
+    }
+    return registry.make_job("cut", source_path, outputs, skip, kwargs)
+
+
+def plan(
+    tasks=None,
+    output_dir=None,
+    input_dirs=None,
+    ranges=None,
+    smart_cut=False,
+    **_options,
+):
+    """Lists the cut jobs (nothing is read beyond the directory walk).
+
+    Returns:
+        list[dict]: One job per configured file, then one per video found in
+            `input_dirs` (cut with the shared `ranges`).
+    """
+    output_root = Path(output_dir).resolve() if output_dir else None
+    jobs = []
+    for task in tasks or []:
+        source_path = Path(task["file"])
+        jobs.append(
+            _make_job(source_path, task.get("ranges") or [], output_root, smart_cut)
+        )
+
+    if input_dirs and not ranges:
+        print("⚠️  input_dirs needs ranges (the time ranges cut from every video)")
+        return jobs
+
+    for source_path, target_root in discover_videos(input_dirs or [], output_root):
+        jobs.append(_make_job(source_path, ranges, target_root, smart_cut))
+    return jobs
+
+
+def describe_jobs(jobs):
+    """Adds ffmpeg argv (start snapped via the keyframe index) and cut duration."""
+    for job in jobs:
+        if job["skip"]:
+            continue
+        kwargs = job["kwargs"]
+        job["argv"] = cut_processor.build_commands(
+            kwargs["video_path"],
+            kwargs["ranges"],
+            kwargs["output_paths"],
+            kwargs["smart_cut"],
+        )
+        ranges = cut_processor.normalize_ranges(kwargs["ranges"])
+        # 到结尾的区间长度未知 (不为了 plan 去 probe)
+        job["media_duration"] = sum(end - start for start, end in ranges if end)
+        job["estimated_seconds"] = None
+    return jobs
+
+
+def execute_job(job):
+    """Runs one planned job (see `plan`)."""
+    with profiler.span("file", file=Path(job["input"]).name):
+        cut_processor.cut_file(**job["kwargs"])
+
+
+def io_paths(job):
+    """Files a job reads and writes (for per-device I/O scheduling)."""
+    return [Path(job["kwargs"]["video_path"])], [
+        Path(p) for p in job["kwargs"]["output_paths"]
+    ]
+
+
+def run(
+    tasks=None,
+    output_dir=None,
+    input_dirs=None,
+    ranges=None,
+    smart_cut=False,
+    io_concurrency=None,
+):
+    """Executes the cut task: extracts time ranges without re-encoding.
+
+    Args:
+        tasks (list): [{"file": path, "ranges": [[start, end], ...]}]. Times are
+            seconds or "HH:MM:SS(.mmm)"; an end of null cuts to the end of the file.
+        output_dir (str, optional): Output directory. If None, saves next to source
+            (原文件名_cut01.mp4, _cut02, ...).
+        input_dirs (list[str], optional): Folders whose videos are all cut with
+            `ranges`.
+        ranges (list, optional): Ranges applied to every video in `input_dirs`.
+        smart_cut (bool): Frame-accurate cuts: only the partial GOPs at the edges are
+            re-encoded (H.264 / HEVC). Default: the start snaps to the previous
+            keyframe and everything is stream-copied.
+        io_concurrency (int | dict, optional): Jobs per disk at the same time
+            (default: 1 on spinning disks, 4 on SSDs; see `io_scheduler.run_jobs`).
+    """
+    print(f"=== Starting Cut ===")
+    print(f"Output Dir: {output_dir or '[Same as Source]'}")
+    print(f"Mode: {'Smart Cut (re-encode edges)' if smart_cut else 'Keyframe Snap'}\n")
+
+    with profiler.span("walk"):
+        planned = plan(tasks, output_dir, input_dirs, ranges, smart_cut)
+    for job in planned:
+        if job["skip"]:
+            print(f"⏭️  Skipping ({job['skip']}): {job['input']}")
+
+    runnable = [j for j in planned if not j["skip"]]
+    devices = io_scheduler.run_jobs(runnable, execute_job, io_paths, io_concurrency)
+    io_scheduler.print_report(devices)
+
+    print("\n🎉 All Cut Tasks Completed.")
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 from media_processor.constant.extensions import VIDEO_EXTENSIONS
+from media_processor.runner import registry
+from media_processor.service.common import io_scheduler, probe, profiler
 from media_processor.service.media_process import merge_processor
 
 
@@ -20,18 +22,17 @@ def is_video_folder(folder_path):
     return False
 
 
-def run(input_dirs, output_dir):
-    """Executes the batch video merge task.
+def discover_folders(input_dirs, output_root):
+    """Walks the input directories for folders containing videos.
 
     Args:
         input_dirs (list[str]): List of input directories.
-        output_dir (str): Output directory.
-    """
-    print(f"=== Starting Batch Video Merge ===")
-    print(f"Output: {output_dir}\n")
+        output_root (Path): Output directory (excluded from the walk).
 
-    output_root = Path(output_dir)
-    tasks_found = 0
+    Returns:
+        list[Path]: Video folders, in walk order.
+    """
+    folders = []
 
     for root_dir in input_dirs:
         root_path = Path(root_dir).resolve()
@@ -49,17 +50,148 @@ def run(input_dirs, output_dir):
                 if output_root in current_path.parents or current_path == output_root:
                     continue
 
-                tasks_found += 1
+                folders.append(current_path)
+
+    return folders
+
+
+def plan(
+    input_dirs, output_dir, max_part_size_mb=None, max_part_duration=None, **_options
+):
+    """Lists the merge jobs (discovery only, nothing is merged).
+
+    Returns:
+        list[dict]: One job per video folder. Split merges list the part pattern
+            (`<folder>_part%03d.mp4`) as their output. Folders with the same name
+            (`A/Trip`, `B/Trip`) map to the same output; all but the first are
+            skipped.
+    """
+    output_root = Path(output_dir)
+    split = {
+        k: v
+        for k, v in (
+            ("max_part_size_mb", max_part_size_mb),
+            ("max_part_duration", max_part_duration),
+        )
+        if v
+    }
+    jobs = []
+    owners = {}
+    for folder in discover_folders(input_dirs, output_root):
+        output_path = merge_processor.output_path_for(folder, output_root)
+        # 输出只用文件夹名: 同名文件夹会写同一个文件 (分段模式还会先删掉对方的分段)
+        owner = owners.setdefault(output_path, folder)
+        skip = f"same output name as {owner}" if owner != folder else None
+        if split:
+            output_path = merge_processor.part_path_for(output_path)
+        kwargs = {"input_dir": str(folder), "output_root": str(output_root), **split}
+        jobs.append(
+            registry.make_job("merge", folder, [output_path], skip, kwargs=kwargs)
+        )
+    return jobs
+
+
+def _merged_path(job):
+    """The single-file output of a job (parts are named after it)."""
+    return merge_processor.output_path_for(job["input"], job["kwargs"]["output_root"])
+
+
+def describe_jobs(jobs):
+    """Adds ffmpeg argv and total media duration to planned jobs."""
+    for job in jobs:
+        if job["skip"]:
+            continue
+        output_path = _merged_path(job)
+        videos = [
+            v
+            for v in merge_processor.list_videos(job["input"])
+            if v.resolve() != output_path.resolve()
+        ]
+        split_times = merge_processor.split_times_for(
+            videos,
+            job["kwargs"].get("max_part_size_mb"),
+            job["kwargs"].get("max_part_duration"),
+        )
+        job["argv"] = [
+            merge_processor.full_command(
+                merge_processor.build_command(output_path, split_times)
+            )
+        ]
+        job["media_duration"] = sum(
+            probe.probe_media(v).get("duration", 0.0) for v in videos
+        )
+        job["estimated_seconds"] = None
+    return jobs
+
+
+def execute_job(job):
+    """Runs one planned job (see `plan`).
+
+    Returns:
+        bool | None: Whether the merge succeeded (see `merge_processor.process_folder`).
+    """
+    with profiler.span("folder", folder=Path(job["input"]).name):
+        return merge_processor.process_folder(**job["kwargs"])
+
+
+def io_paths(job):
+    """Files a job reads and writes (for per-device I/O scheduling)."""
+    output_path = _merged_path(job)
+    reads = [
+        v
+        for v in merge_processor.list_videos(job["input"])
+        if v.resolve() != output_path.resolve()
+    ]
+    if any(k in job["kwargs"] for k in ("max_part_size_mb", "max_part_duration")):
+        # 分段输出: 统计整个输出目录 (只含这个文件夹的合并结果)；
+        # 目录总是存在，成功与否看 execute_job 的返回值
+        return reads, [output_path.parent]
+    return reads, [output_path]
+
+
+def run(
+    input_dirs,
+    output_dir,
+    io_concurrency=None,
+    max_part_size_mb=None,
+    max_part_duration=None,
+):
+    """Executes the batch video merge task.
+
+    Args:
+        input_dirs (list[str]): List of input directories.
+        output_dir (str): Output directory.
+        io_concurrency (int | dict, optional): Merges per disk at the same time
+            (default: 1 on spinning disks, 4 on SSDs; see `io_scheduler.run_jobs`).
+        max_part_size_mb (float, optional): Write `<folder>_part001.mp4`, ... of at
+            most this size instead of one file, from the same stream-copy pass.
+        max_part_duration (float, optional): Same, with a duration limit in seconds.
+    """
+    print(f"=== Starting Batch Video Merge ===")
+    print(f"Output: {output_dir}")
+    if max_part_size_mb or max_part_duration:
+        limits = []
+        if max_part_size_mb:
+            limits.append(f"{max_part_size_mb} MB")
+        if max_part_duration:
+            limits.append(f"{max_part_duration}s")
+        print(f"Split: parts of at most {' / '.join(limits)}")
+    print()
+
+    with profiler.span("walk"):
+        jobs = plan(input_dirs, output_dir, max_part_size_mb, max_part_duration)
 
-                # Determine relative path for mirroring structure if needed,
-                # but merge_processor.process_folder creates a folder named after the leaf folder.
-                # Let's delegate simply.
+    for job in jobs:
+        if job["skip"]:
+            print(f"⚠️  Skipping ({job['skip']}): {job['input']}")
+    runnable = [job for job in jobs if not job["skip"]]
 
-                merge_processor.process_folder(
-                    input_dir=current_path, output_root=output_root
-                )
+    # merge_processor.process_folder creates a folder named after the leaf folder.
+    # 同一磁盘上的合并按设备并发上限排队，不同磁盘同时进行
+    devices = io_scheduler.run_jobs(runnable, execute_job, io_paths, io_concurrency)
+    io_scheduler.print_report(devices)
 
-    if tasks_found == 0:
+    if not jobs:
         print("No video folders found.")
     else:
         print(f"\n🎉 All Merge Tasks Completed.")
@@ -1,8 +1,27 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from media_processor.constant.constant import INPUT_DIR, OUTPUT_DIR
+from media_processor.constant.constant import (
+    INPUT_DIR,
+    OUTPUT_DIR,
+    STAGING_BUDGET_GB,
+    STAGING_PREFETCH,
+    VIDEO_QUALITY_DEFAULT,
+    VIDEO_SPEED_DEFAULT,
+)
 from media_processor.constant.extensions import VIDEO_EXTENSIONS
+from media_processor.runner import registry
+from media_processor.service.common import (
+    dedup,
+    metrics,
+    perf_history,
+    probe,
+    profiler,
+    staging,
+)
+from media_processor.service.media_process import resumable
+from media_processor.service.media_process import streaming as packaging
 from media_processor.service.media_process import video_processor
 from media_processor.service.media_process.video_processor import VideoResolution
 
@@ -30,46 +49,94 @@ def is_video_folder(folder_path):
     return False
 
 
-def run(
+def parse_resolution(value):
+    """Maps a config string ("480p", "720p", "1080p") to VideoResolution.
+
+    Unknown values fall back to 1080p (the historical default).
+    """
+    try:
+        return VideoResolution(value)
+    except ValueError:
+        return VideoResolution.P1080
+
+
+def resolve_resolutions(target_resolution="1080p", resolutions=None):
+    """Returns the renditions to encode, main resolution first.
+
+    Args:
+        target_resolution (str): Single resolution ("1080p", "720p", "480p").
+        resolutions (list[str], optional): Rendition ladder, overrides `target_resolution`.
+
+    Returns:
+        list[VideoResolution]: De-duplicated, in config order.
+    """
+    if resolutions:
+        resolution_enums = [parse_resolution(r) for r in resolutions]
+        return list(dict.fromkeys(resolution_enums))  # 去重保序
+    return [parse_resolution(target_resolution)]
+
+
+def print_batch_eta(jobs, settings, test_mode):
+    """Prints the estimated batch duration based on performance history.
+
+    Args:
+        jobs (list[tuple[Path, dict]]): (input, {resolution: output}) pairs.
+        settings (dict): Result of `video_processor.describe_settings`.
+        test_mode (bool): Whether only the first 180s are encoded.
+    """
+    pending = [
+        v for v, outputs in jobs if not all(o.exists() for o in outputs.values())
+    ]
+    if not pending:
+        return
+
+    estimates = []
+    total_media = 0.0
+    for v_path in pending:
+        info = probe.probe_media(v_path)
+        media_duration = info.get("duration", 0.0)
+        if test_mode:
+            media_duration = min(media_duration, 180)
+        total_media += media_duration
+        estimates.append((info, settings, media_duration))
+
+    eta, unknown = perf_history.estimate_batch(estimates)
+    print(
+        f"⏳ Pending: {len(pending)} files | Media: {perf_history.format_eta(total_media)}"
+    )
+    if unknown == len(pending):
+        print("⏳ ETA: unknown (no matching performance history yet)")
+    elif unknown:
+        print(
+            f"⏳ ETA: ~{perf_history.format_eta(eta)} (+ {unknown} files without history)"
+        )
+    else:
+        print(f"⏳ ETA: ~{perf_history.format_eta(eta)}")
+
+
+def discover_jobs(
     input_dirs,
-    output_dir,
+    output_root,
+    resolution_enums,
     use_gpu=False,
-    target_resolution="1080p",
-    delete_source=False,
     use_suffix=False,
-    compatibility_mode=False,
-    embed_subtitles=False,
-    remove_subtitle=False,
-    test_mode=False,
+    streaming=None,
 ):
-    """Executes the batch media conversion task.
+    """Walks the input directories and builds the conversion job list.
 
     Args:
         input_dirs (list[str]): List of input directories.
-        output_dir (str): Output directory.
-        use_gpu (bool): Whether to use GPU acceleration.
-        target_resolution (str): "1080p" or "720p".
-        delete_source (bool): Whether to delete source files.
-        use_suffix (bool): Whether to add suffix to output filename.
-        compatibility_mode (bool): Whether to enable compatibility mode.
-        embed_subtitles (bool): Whether to embed external subtitles if found.
-    """
-    if target_resolution == "720p":
-        resolution_enum = VideoResolution.P720
-    else:
-        resolution_enum = VideoResolution.P1080
-
-    print(f"=== Starting Batch Processing ===")
-    print(f"Mode: {'GPU' if use_gpu else 'CPU'}")
-    print(f"Output Root: {output_dir}")
-    print(f"Resolution: {target_resolution}")
-    if compatibility_mode:
-        print(f"Compatibility Mode: Enabled")
-    if embed_subtitles:
-        print(f"Subtitle Embedding: Enabled")
+        output_root (Path): Output root directory (mirrors the input tree).
+        resolution_enums (list[VideoResolution]): Renditions per source.
+        use_gpu (bool): Only affects the `_GPU`/`_CPU` file name suffix.
+        use_suffix (bool): Whether to add suffixes to output file names.
+        streaming (bool | str | dict): Outputs are package directories instead of MP4s.
 
-    output_root = Path(output_dir)
-    tasks_found = 0
+    Returns:
+        list[tuple[Path, dict[VideoResolution, Path]]]: (input, {resolution: output}).
+    """
+    stream_options = packaging.normalize_options(streaming)
+    jobs = []
 
     for root_dir in input_dirs:
         root_path = Path(root_dir).resolve()
@@ -105,31 +172,409 @@ def run(
 
             target_output_dir = output_root / relative_path
 
-            # 处理该目录下的每个视频
             for v_path in video_files:
-                tasks_found += 1
-
-                # 构造输出文件名: OriginalName_Resolution_Mode.mp4
-                mode_suffix = "_GPU" if use_gpu else "_CPU"
-                resolution_suffix = f"_{resolution_enum.value}"
-                if not use_suffix:
-                    mode_suffix = ""
-                    resolution_suffix = ""
-                output_filename = f"{v_path.stem}{resolution_suffix}{mode_suffix}.mp4"
-                final_output_path = target_output_dir / output_filename
-
-                video_processor.process_video(
-                    input_path=v_path,
-                    output_path=final_output_path,
-                    use_gpu=use_gpu,
-                    resolution=resolution_enum,
-                    delete_source=delete_source,
-                    compatibility_mode=compatibility_mode,
-                    embed_subtitles=embed_subtitles,
-                    remove_subtitle=remove_subtitle,
-                    test_mode=test_mode,
+                outputs = {}
+                for resolution_enum in resolution_enums:
+                    # 构造输出文件名: OriginalName_Resolution_Mode.mp4
+                    mode_suffix = "_GPU" if use_gpu else "_CPU"
+                    resolution_suffix = f"_{resolution_enum.value}"
+                    if not use_suffix:
+                        mode_suffix = ""
+                        if len(resolution_enums) == 1:
+                            resolution_suffix = ""
+                    output_filename = (
+                        f"{v_path.stem}{resolution_suffix}{mode_suffix}.mp4"
+                    )
+                    output_path = target_output_dir / output_filename
+                    if stream_options:
+                        # 流媒体包是目录: OriginalName_Resolution/
+                        output_path = packaging.package_dir_for(output_path)
+                    outputs[resolution_enum] = output_path
+                jobs.append((v_path, outputs))
+
+    return jobs
+
+
+# 透传给 process_video 的选项 (plan 中每个 job 的 kwargs)
+PROCESS_OPTIONS = (
+    "delete_source",
+    "compatibility_mode",
+    "embed_subtitles",
+    "remove_subtitle",
+    "test_mode",
+    "reuse_cache",
+    "thumbnails",
+    "encoder",
+    "quality",
+    "speed",
+    "auto_tune",
+    "resumable_mode",
+    "auto_crop",
+)
+
+
+def plan(
+    input_dirs,
+    output_dir,
+    use_gpu=False,
+    target_resolution="1080p",
+    use_suffix=False,
+    resolutions=None,
+    streaming=None,
+    jobs=1,
+    **options,
+):
+    """Lists the conversion jobs (discovery only, nothing is encoded).
+
+    Takes the same arguments as `run`. Dedup is not applied (it needs content hashes).
+    Plan files run their jobs one at a time, so `jobs` and the scratch staging options
+    are not recorded (use shards).
+
+    Returns:
+        list[dict]: One job per source (see `registry.make_job`); `kwargs` holds the
+            `process_video` arguments for `execute_job`.
+    """
+    resolution_enums = resolve_resolutions(target_resolution, resolutions)
+    jobs = []
+    for v_path, outputs in discover_jobs(
+        input_dirs, Path(output_dir), resolution_enums, use_gpu, use_suffix, streaming
+    ):
+        pending = {r: o for r, o in outputs.items() if not o.exists()}
+        if not pending:
+            jobs.append(registry.make_job("convert", v_path, outputs.values(), "exists"))
+            continue
+
+        main_resolution = next(iter(pending))
+        kwargs = {
+            "input_path": str(v_path),
+            "output_path": str(pending.pop(main_resolution)),
+            "resolution": main_resolution.value,
+            "extra_renditions": {r.value: str(o) for r, o in pending.items()},
+            "use_gpu": use_gpu,
+            "streaming": streaming,
+        }
+        kwargs.update({k: options[k] for k in PROCESS_OPTIONS if k in options})
+        jobs.append(
+            registry.make_job("convert", v_path, outputs.values(), kwargs=kwargs)
+        )
+    return jobs
+
+
+def _process_kwargs(job):
+    """Turns a planned job's JSON kwargs back into `process_video` arguments."""
+    kwargs = dict(job["kwargs"])
+    kwargs["resolution"] = VideoResolution(kwargs["resolution"])
+    kwargs["extra_renditions"] = {
+        VideoResolution(r): Path(o) for r, o in kwargs["extra_renditions"].items()
+    }
+    return kwargs
+
+
+def describe_jobs(jobs):
+    """Adds ffmpeg argv and estimated cost (performance history) to planned jobs.
+
+    The resolved encoder, tuning and detection results are stored in `resolved`
+    and reused by `execute_job`. Interlace / black bar detection is not run here;
+    jobs whose argv may still change list the pending detections in
+    `not_yet_detected`.
+    """
+    records = perf_history.load_records()
+    for job in jobs:
+        if job["skip"]:
+            continue
+        kwargs = _process_kwargs(job)
+        spec = video_processor.build_command(
+            kwargs["input_path"],
+            kwargs["output_path"],
+            kwargs["use_gpu"],
+            kwargs["resolution"],
+            kwargs.get("compatibility_mode", False),
+            kwargs.get("test_mode", False),
+            kwargs.get("thumbnails"),
+            kwargs["extra_renditions"],
+            kwargs.get("streaming"),
+            kwargs.get("encoder"),
+            kwargs.get("quality"),
+            kwargs.get("speed"),
+            kwargs.get("auto_tune", False),
+            auto_crop=kwargs.get("auto_crop", False),
+            detect=False,
+        )
+        job["argv"] = [video_processor.full_command(spec["cmd"])]
+        # 执行时复用 (编码器回退、auto_tune 线程取决于执行的机器)
+        job["resolved"] = video_processor.resolved_settings(spec)
+        if spec["undetected"]:
+            # plan 不采样输入: 这些滤镜在真正编码时才确定
+            job["not_yet_detected"] = spec["undetected"]
+
+        info = probe.probe_media(kwargs["input_path"])
+        media_duration = info.get("duration", 0.0)
+        if kwargs.get("test_mode"):
+            media_duration = min(media_duration, 180)
+        settings = video_processor.describe_settings(
+            kwargs["use_gpu"],
+            kwargs["resolution"],
+            kwargs.get("compatibility_mode", False),
+            kwargs.get("thumbnails"),
+            list(kwargs["extra_renditions"]),
+            kwargs.get("streaming"),
+            kwargs.get("encoder"),
+            kwargs.get("quality"),
+            kwargs.get("speed"),
+            spec["field_order"],
+            spec["crop"],
+        )
+        speed = perf_history.estimate_speed(records, info, settings)
+        job["media_duration"] = media_duration
+        job["estimated_seconds"] = (
+            round(media_duration / speed, 1) if speed and media_duration else None
+        )
+    return jobs
+
+
+def execute_job(job):
+    """Runs one planned job with the settings pinned by `describe_jobs`."""
+    with profiler.span("file", file=Path(job["input"]).name):
+        video_processor.process_video(
+            **_process_kwargs(job), resolved=job.get("resolved")
+        )
+
+
+def run(
+    input_dirs,
+    output_dir,
+    use_gpu=False,
+    target_resolution="1080p",
+    delete_source=False,
+    use_suffix=False,
+    compatibility_mode=False,
+    embed_subtitles=False,
+    remove_subtitle=False,
+    test_mode=False,
+    dedup_policy="off",
+    reuse_cache=False,
+    thumbnails=None,
+    resolutions=None,
+    streaming=None,
+    encoder=None,
+    quality=None,
+    speed=None,
+    auto_tune=False,
+    jobs=1,
+    resumable_mode=False,
+    scratch_dir=None,
+    scratch_gb=None,
+    prefetch=None,
+    auto_crop=False,
+):
+    """Executes the batch media conversion task.
+
+    Args:
+        input_dirs (list[str]): List of input directories.
+        output_dir (str): Output directory.
+        use_gpu (bool): Whether to use GPU acceleration.
+        target_resolution (str): "1080p", "720p" or "480p".
+        delete_source (bool): Whether to delete source files.
+        use_suffix (bool): Whether to add suffix to output filename.
+        compatibility_mode (bool): Whether to enable compatibility mode.
+        embed_subtitles (bool): Whether to embed external subtitles if found.
+        dedup_policy (str): "off", "skip" or "link" for inputs with identical content.
+        reuse_cache (bool): Reuse cached outputs of identical earlier transcodes.
+        thumbnails (bool | dict): Poster / sprite sheet / preview options.
+        resolutions (list[str], optional): Rendition ladder (e.g. ["1080p", "720p"]),
+            encoded from a single decode. Overrides `target_resolution`.
+        streaming (bool | str | dict): Write HLS/DASH package directories instead of MP4s.
+        encoder (str, optional): Encoder or codec family (e.g. "libx265", "av1");
+            falls back automatically if the local ffmpeg lacks it.
+        quality (str, optional): "high", "standard" (default) or "compact".
+        speed (str, optional): "fast" (default), "medium" or "slow".
+        auto_tune (bool): Pick libx264 threads / preset per file from the core count,
+            encoded resolution and `jobs` (calibrated values if `calibrate` was run).
+        jobs (int): Number of files encoded at the same time.
+        resumable_mode (bool): Encode in checkpointed segments; an interrupted encode
+            continues from the last complete segment on the next run.
+        scratch_dir (str, optional): Local directory to stage inputs and outputs in
+            (for sources on a network mount): upcoming inputs are copied ahead, outputs
+            are written locally and moved to `output_dir` in the background.
+        scratch_gb (float, optional): Scratch space budget in GB.
+        prefetch (int, optional): Inputs copied ahead while the current file encodes.
+        auto_crop (bool): Detect black bars (cropdetect on a few sampled segments,
+            cached per file) and crop them before scaling.
+    """
+    resolution_enums = resolve_resolutions(target_resolution, resolutions)
+
+    # 多档位时文件名必须带分辨率后缀，否则会互相覆盖
+    if len(resolution_enums) > 1 and not use_suffix:
+        print("ℹ️  Multiple resolutions: forcing resolution suffix in file names")
+
+    print(f"=== Starting Batch Processing ===")
+    print(f"Mode: {'GPU' if use_gpu else 'CPU'}")
+    print(f"Output Root: {output_dir}")
+    print(f"Resolution: {', '.join(r.value for r in resolution_enums)}")
+    if compatibility_mode:
+        print(f"Compatibility Mode: Enabled")
+    if embed_subtitles:
+        print(f"Subtitle Embedding: Enabled")
+    if dedup_policy != "off":
+        print(f"Dedup: {dedup_policy}")
+    if reuse_cache:
+        print(f"Artifact Cache: Enabled")
+    if thumbnails:
+        print(f"Thumbnails: Enabled")
+    if auto_crop:
+        print(f"Auto Crop: Enabled")
+    if resumable_mode:
+        print(f"Resumable: Enabled")
+    if scratch_dir:
+        print(
+            f"Scratch: {scratch_dir} ({scratch_gb or STAGING_BUDGET_GB} GB, "
+            f"prefetch {prefetch or STAGING_PREFETCH})"
+        )
+    if jobs > 1 or auto_tune:
+        print(f"Parallel Jobs: {jobs}{' (auto-tuned threads)' if auto_tune else ''}")
+    stream_options = packaging.normalize_options(streaming)
+    if stream_options:
+        print(f"Streaming Package: {stream_options['format'].upper()}")
+
+    output_root = Path(output_dir)
+
+    with profiler.span("walk"):
+        file_jobs = discover_jobs(
+            input_dirs, output_root, resolution_enums, use_gpu, use_suffix, streaming
+        )
+
+    tasks_found = len(file_jobs)
+
+    # 内容去重: 重复的输入只编码一次
+    duplicate_jobs = []
+    if dedup_policy != "off":
+        with profiler.span("dedup"):
+            index = dedup.build_index([v for v, _ in file_jobs])
+        duplicate_jobs = [(v, out) for v, out in file_jobs if index.is_duplicate(v)]
+        file_jobs = [(v, out) for v, out in file_jobs if not index.is_duplicate(v)]
+        canonical_outputs = {v: out for v, out in file_jobs}
+
+    settings = video_processor.describe_settings(
+        use_gpu,
+        resolution_enums[0],
+        compatibility_mode,
+        thumbnails,
+        resolution_enums[1:],
+        streaming,
+        encoder,
+        quality,
+        speed,
+    )
+    print(
+        f"Encoder: {settings['encoder']} "
+        f"(quality: {quality or VIDEO_QUALITY_DEFAULT}, speed: {speed or VIDEO_SPEED_DEFAULT})"
+    )
+    print_batch_eta(file_jobs, settings, test_mode)
+
+    def encode(input_path, pending, remove_source, remove_sub):
+        main_resolution = next(iter(pending))
+        video_processor.process_video(
+            input_path=input_path,
+            output_path=pending.pop(main_resolution),
+            extra_renditions=pending,
+            use_gpu=use_gpu,
+            resolution=main_resolution,
+            delete_source=remove_source,
+            compatibility_mode=compatibility_mode,
+            embed_subtitles=embed_subtitles,
+            remove_subtitle=remove_sub,
+            test_mode=test_mode,
+            reuse_cache=reuse_cache,
+            thumbnails=thumbnails,
+            streaming=streaming,
+            encoder=encoder,
+            quality=quality,
+            speed=speed,
+            auto_tune=auto_tune,
+            parallel_jobs=jobs,
+            resumable_mode=resumable_mode,
+            auto_crop=auto_crop,
+        )
+
+    def convert(v_path, pending):
+        expected = list(pending.values())
+        with profiler.span("file", file=v_path.name), metrics.job() as tracked:
+            local_input = stager.acquire(v_path) if stager else None
+            if local_input is None:
+                encode(v_path, pending, delete_source, remove_subtitle)
+                tracked["success"] = all(o.exists() for o in expected)
+                return
+
+            # 本地读写；源文件 / 字幕要等输出搬运到 output_dir 之后才删除
+            main_output = next(iter(pending.values()))
+            local_dir = stager.output_dir_for(main_output)
+            local_pending = {r: local_dir / o.name for r, o in pending.items()}
+            subs = [] if stream_options else staging.sidecars(v_path)
+            local_main = next(iter(local_pending.values()))
+            keep = [resumable.job_dir_for(local_main).name] if resumable_mode else []
+            success = False
+            try:
+                encode(local_input, dict(local_pending), False, False)
+                success = all(o.exists() for o in local_pending.values())
+            finally:
+                tracked["success"] = success
+                stager.finish(
+                    v_path,
+                    local_dir,
+                    main_output.parent,
+                    success,
+                    keep,
+                    lambda: video_processor.cleanup_sources(
+                        v_path,
+                        main_output,
+                        subs[0] if subs else None,
+                        delete_source,
+                        remove_subtitle,
+                    ),
                 )
 
+    queued = []
+    for v_path, outputs in file_jobs:
+        pending = {r: o for r, o in outputs.items() if not o.exists()}
+        if not pending:
+            for o in outputs.values():
+                print(f"⏭️  Skipping (Exists): {o.name}")
+            continue
+        queued.append((v_path, pending))
+
+    stager = None
+    if scratch_dir and queued:
+        stager = staging.Stager(
+            scratch_dir,
+            (scratch_gb or STAGING_BUDGET_GB) * 1024**3,
+            prefetch or STAGING_PREFETCH,
+        )
+        stager.schedule(v for v, _ in queued)
+
+    # 处理每个视频 (所有档位一次解码、一个 ffmpeg 进程)
+    # jobs > 1: 多个文件同时编码 (每个 ffmpeg 各占一部分核心，见 auto_tune)
+    metrics.jobs_queued(len(queued))
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = [pool.submit(convert, v, pending) for v, pending in queued]
+            for future in futures:
+                future.result()
+    finally:
+        if stager:
+            # 等待输出搬运完成 (dedup link 需要正式输出已存在)
+            stager.close()
+
+    # 重复文件: 链接/复制已编码的结果到各自的预期输出路径
+    if dedup_policy == "link":
+        for v_path, outputs in duplicate_jobs:
+            canonical = canonical_outputs[index.duplicates[v_path]]
+            linked = all(
+                dedup.link_or_copy(canonical[res], out) for res, out in outputs.items()
+            )
+            if linked and delete_source and v_path.exists():
+                print(f"🗑️ Deleting source: {v_path}")
+                os.remove(v_path)
+
     if tasks_found == 0:
         print("No video folders found to process.")
     else:
@@ -1,48 +1,111 @@
 from pathlib import Path
 from media_processor.constant import extensions
+from media_processor.runner import registry
+from media_processor.service.common import io_scheduler, probe, profiler
 from media_processor.service.media_process import subtitle_processor
 
 
-def run(input_dirs, output_dir, remove_subtitle=True):
-    """
-    Run subtitle embedding in batch.
-    """
-    print(f"📂 Scanning directories: {input_dirs}")
-    print(f"💾 Output directory: {output_dir}")
+def find_videos(input_dir):
+    """Recursively lists the video files under a directory."""
+    all_files = input_dir.rglob("*")
+    return [
+        f
+        for f in all_files
+        if f.is_file() and f.suffix.lower() in extensions.VIDEO_EXTENSIONS
+    ]
+
+
+def output_path_for(video_path, input_dir, output_dir):
+    """Returns the output of a video (the video itself in in-place mode)."""
+    if output_dir:
+        # Normal mode: Output to separate directory
+        rel_path = video_path.relative_to(input_dir)
+        output_path = Path(output_dir) / rel_path
+        # Best practice for mov_text
+        return output_path.with_suffix(".mp4")
+    # In-place mode: Output to same file (will use temp file mechanism)
+    return video_path
 
+
+def plan(input_dirs, output_dir=None, remove_subtitle=True, **_options):
+    """Lists the subtitle jobs (discovery only, nothing is muxed).
+
+    Returns:
+        list[dict]: One job per video file.
+    """
+    jobs = []
     for input_dir_str in input_dirs:
         input_dir = Path(input_dir_str)
         if not input_dir.exists():
             print(f"⚠️ Directory not found: {input_dir}")
             continue
+        for video_path in find_videos(input_dir):
+            output_path = output_path_for(video_path, input_dir, output_dir)
+            skip = None
+            if not subtitle_processor.find_subtitle(video_path.resolve()):
+                skip = "no subtitle"
+            elif output_path != video_path and output_path.exists():
+                skip = "exists"
+            kwargs = {
+                "input_path": str(video_path),
+                "output_path": str(output_path),
+                "remove_subtitle": remove_subtitle,
+            }
+            jobs.append(
+                registry.make_job("subtitle", video_path, [output_path], skip, kwargs)
+            )
+    return jobs
+
+
+def describe_jobs(jobs):
+    """Adds ffmpeg argv and media duration to planned jobs."""
+    for job in jobs:
+        if job["skip"]:
+            continue
+        input_path = Path(job["kwargs"]["input_path"]).resolve()
+        cmd, _ = subtitle_processor.build_command(
+            input_path,
+            Path(job["kwargs"]["output_path"]).resolve(),
+            subtitle_processor.find_subtitle(input_path),
+        )
+        job["argv"] = [subtitle_processor.full_command(cmd)]
+        job["media_duration"] = probe.probe_media(input_path).get("duration", 0.0)
+        job["estimated_seconds"] = None
+    return jobs
+
+
+def execute_job(job):
+    """Runs one planned job (see `plan`)."""
+    with profiler.span("file", file=Path(job["input"]).name):
+        subtitle_processor.process_subtitle_embedding(**job["kwargs"])
+
+
+def io_paths(job):
+    """Files a job reads and writes (for per-device I/O scheduling)."""
+    input_path = Path(job["kwargs"]["input_path"]).resolve()
+    reads = [input_path, subtitle_processor.find_subtitle(input_path)]
+    return [p for p in reads if p], [Path(job["kwargs"]["output_path"])]
+
+
+def run(input_dirs, output_dir, remove_subtitle=True, io_concurrency=None):
+    """
+    Run subtitle embedding in batch.
+
+    Files on different disks are muxed at the same time; each disk runs at most
+    `io_concurrency` jobs (default: 1 on spinning disks, 4 on SSDs).
+    """
+    print(f"📂 Scanning directories: {input_dirs}")
+    print(f"💾 Output directory: {output_dir}")
+
+    # Recursively find all video files
+    with profiler.span("walk"):
+        jobs = plan(input_dirs, output_dir, remove_subtitle)
+
+    print(f"🔎 Found {len(jobs)} video files")
+    for job in jobs:
+        if job["skip"]:
+            print(f"⏭️  Skipping ({job['skip']}): {Path(job['input']).name}")
 
-        # Recursively find all video files
-        all_files = input_dir.rglob("*")
-        video_files = [
-            f
-            for f in all_files
-            if f.is_file() and f.suffix.lower() in extensions.VIDEO_EXTENSIONS
-        ]
-
-        print(f"🔎 Found {len(video_files)} video files in {input_dir}")
-
-        for video_path in video_files:
-            # Calculate output path
-            if output_dir:
-                # Normal mode: Output to separate directory
-                rel_path = video_path.relative_to(input_dir)
-                output_path = Path(output_dir) / rel_path
-                # Best practice for mov_text
-                output_path = output_path.with_suffix(".mp4")
-            else:
-                # In-place mode: Output to same file (will use temp file mechanism)
-                output_path = video_path
-
-            try:
-                subtitle_processor.process_subtitle_embedding(
-                    input_path=video_path,
-                    output_path=output_path,
-                    remove_subtitle=remove_subtitle,
-                )
-            except Exception as e:
-                print(f"❌ Error processing {video_path}: {e}")
+    runnable = [job for job in jobs if not job["skip"]]
+    devices = io_scheduler.run_jobs(runnable, execute_job, io_paths, io_concurrency)
+    io_scheduler.print_report(devices)
@@ -2,18 +2,24 @@ import os
 from pathlib import Path
 
 from media_processor.constant.extensions import VIDEO_EXTENSIONS
-from media_processor.constant.constant import DEFAULT_SPEED_RATIO
+from media_processor.constant.constant import (
+    DEFAULT_SPEED_RATIO,
+    TIMELAPSE_ADAPTIVE_MAX_FACTOR,
+)
+from media_processor.runner import registry
+from media_processor.service.common import dedup, metrics, probe, profiler
 from media_processor.service.media_process import timelapse_processor
 
 
 # --------------------
 
 
-def is_video_folder(folder_path):
+def is_video_folder(folder_path, speed_ratio=DEFAULT_SPEED_RATIO):
     """Checks if the folder contains video files.
 
     Args:
         folder_path (Path): Path to the folder.
+        speed_ratio (int): Speed multiplier (to recognise existing results).
 
     Returns:
         bool: True if video files are found, False otherwise.
@@ -23,29 +29,25 @@ def is_video_folder(folder_path):
         for item in folder_path.iterdir():
             if item.is_file() and item.suffix.lower() in extensions:
                 # 排除已经是 Timelapse 的结果文件
-                if f"_{SPEED_RATIO}x" not in item.name:
+                if f"_{speed_ratio}x" not in item.name:
                     return True
     except PermissionError:
         pass
     return False
 
 
-def run(input_dirs, output_dir, speed_ratio=DEFAULT_SPEED_RATIO, use_gpu=True):
-    """Executes the timelapse batch processing task.
+def discover_folders(input_dirs, output_root, speed_ratio=DEFAULT_SPEED_RATIO):
+    """Walks the input directories for folders containing source videos.
 
     Args:
         input_dirs (list[str]): List of input directories.
-        output_dir (str): Output directory.
-        speed_ratio (int): Speed multiplier.
-        use_gpu (bool): Whether to use GPU acceleration.
-    """
-    print(f"=== Starting Timelapse Batch Processing ===")
-    print(f"Speed: {speed_ratio}x")
-    print(f"Mode:  {'GPU' if use_gpu else 'CPU'}")
-    print(f"Output:{output_dir}\n")
+        output_root (Path): Output directory (excluded from the walk).
+        speed_ratio (int): Speed multiplier (to recognise existing results).
 
-    output_root = Path(output_dir)
-    tasks_found = 0
+    Returns:
+        list[Path]: Video folders, in walk order.
+    """
+    folders = []
 
     for root_dir in input_dirs:
         root_path = Path(root_dir).resolve()
@@ -57,18 +59,171 @@ def run(input_dirs, output_dir, speed_ratio=DEFAULT_SPEED_RATIO, use_gpu=True):
             current_path = Path(current_root)
 
             # 只有当它是包含视频的文件夹，且不是输出目录本身时才处理
-            if is_video_folder(current_path):
+            if is_video_folder(current_path, speed_ratio):
                 if output_root in current_path.parents or current_path == output_root:
                     continue
+                folders.append(current_path)
+
+    return folders
 
-                tasks_found += 1
 
-                timelapse_processor.process_folder(
-                    input_dir=current_path,
-                    output_root=output_root,
-                    speed_ratio=speed_ratio,
-                    use_gpu=use_gpu,
-                )
+def plan(
+    input_dirs,
+    output_dir,
+    speed_ratio=DEFAULT_SPEED_RATIO,
+    use_gpu=True,
+    encoder=None,
+    quality=None,
+    speed=None,
+    adaptive=False,
+    max_speed_ratio=None,
+    **_options,
+):
+    """Lists the timelapse jobs (discovery only, nothing is encoded).
+
+    Returns:
+        list[dict]: One job per source video.
+    """
+    output_root = Path(output_dir)
+    jobs = []
+    for folder in discover_folders(input_dirs, output_root, speed_ratio):
+        for v in sorted(folder.iterdir()):
+            if v.suffix.lower() not in VIDEO_EXTENSIONS:
+                continue
+            # 之前的产物不再处理
+            if f"_{speed_ratio}x" in v.name:
+                continue
+            output_file = timelapse_processor.output_path_for(
+                v, output_root, speed_ratio
+            )
+            skip = "exists" if output_file.exists() else None
+            kwargs = {
+                "video_path": str(v),
+                "output_path": str(output_file),
+                "speed_ratio": speed_ratio,
+                "use_gpu": use_gpu,
+                "encoder": encoder,
+                "quality": quality,
+                "speed": speed,
+                "adaptive": adaptive,
+                "max_speed_ratio": max_speed_ratio,
+            }
+            jobs.append(
+                registry.make_job("timelapse", v, [output_file], skip, kwargs)
+            )
+    return jobs
+
+
+def describe_jobs(jobs):
+    """Adds ffmpeg argv and media duration to planned jobs."""
+    for job in jobs:
+        if job["skip"]:
+            continue
+        job["argv"] = [
+            timelapse_processor.full_command(
+                timelapse_processor.build_command(**job["kwargs"])
+            )
+        ]
+        job["media_duration"] = probe.probe_media(job["input"]).get("duration", 0.0)
+        job["estimated_seconds"] = None
+    return jobs
+
+
+def execute_job(job):
+    """Runs one planned job (see `plan`)."""
+    output_file = Path(job["kwargs"]["output_path"])
+    if output_file.exists():
+        print(f"  ⏭️  Skipping (Exists): {output_file.name}")
+        return
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    print(f"  🎬 {Path(job['input']).name} -> {output_file.name}")
+    with profiler.span("file", file=Path(job["input"]).name):
+        timelapse_processor.create_timelapse(**job["kwargs"])
+
+
+def run(
+    input_dirs,
+    output_dir,
+    speed_ratio=DEFAULT_SPEED_RATIO,
+    use_gpu=True,
+    encoder=None,
+    quality=None,
+    speed=None,
+    dedup_policy="off",
+    adaptive=False,
+    max_speed_ratio=None,
+):
+    """Executes the timelapse batch processing task.
+
+    Args:
+        input_dirs (list[str]): List of input directories.
+        output_dir (str): Output directory.
+        speed_ratio (int): Speed multiplier.
+        use_gpu (bool): Prefer a hardware encoder (falls back to CPU if unavailable).
+        encoder (str, optional): Encoder or codec family (e.g. "libx265", "av1").
+        quality (str, optional): "high" (default), "standard" or "compact".
+        speed (str, optional): "fast" (default), "medium" or "slow".
+        dedup_policy (str): "off", "skip" or "link" for inputs with identical content.
+        adaptive (bool): Speed up static stretches (parked, red lights) more, based on
+            a frame-difference analysis (needs numpy).
+        max_speed_ratio (int, optional): Speed-up of static stretches
+            (default: 8x `speed_ratio`).
+    """
+    print(f"=== Starting Timelapse Batch Processing ===")
+    print(f"Speed: {speed_ratio}x")
+    print(f"Mode:  {'GPU' if use_gpu else 'CPU'}")
+    if encoder:
+        print(f"Encoder: {encoder}")
+    if adaptive:
+        top_ratio = max_speed_ratio or speed_ratio * TIMELAPSE_ADAPTIVE_MAX_FACTOR
+        print(f"Adaptive: up to {top_ratio}x when static")
+    print(f"Output:{output_dir}\n")
+
+    output_root = Path(output_dir)
+
+    with profiler.span("walk"):
+        folders = discover_folders(input_dirs, output_root, speed_ratio)
+
+    tasks_found = len(folders)
+
+    # 内容去重: 跨文件夹的重复素材只处理一次
+    skip_files = set()
+    if dedup_policy != "off":
+        videos = sorted(
+            p
+            for folder in folders
+            for p in folder.iterdir()
+            if p.is_file()
+            and p.suffix.lower() in VIDEO_EXTENSIONS
+            and f"_{speed_ratio}x" not in p.name
+        )
+        with profiler.span("dedup"):
+            index = dedup.build_index(videos)
+        skip_files = set(index.duplicates)
+
+    metrics.jobs_queued(len(folders))
+    for folder in folders:
+        with profiler.span("folder", folder=folder.name), metrics.job():
+            timelapse_processor.process_folder(
+                input_dir=folder,
+                output_root=output_root,
+                speed_ratio=speed_ratio,
+                use_gpu=use_gpu,
+                skip_files=skip_files,
+                encoder=encoder,
+                quality=quality,
+                speed=speed,
+                adaptive=adaptive,
+                max_speed_ratio=max_speed_ratio,
+            )
+
+    # 重复文件: 链接/复制已生成的结果
+    if dedup_policy == "link":
+        for dup, canonical in index.duplicates.items():
+            dedup.link_or_copy(
+                timelapse_processor.output_path_for(canonical, output_root, speed_ratio),
+                timelapse_processor.output_path_for(dup, output_root, speed_ratio),
+            )
 
     if tasks_found == 0:
         print("No video folders found.")
@@ -0,0 +1,159 @@
+import datetime
+import json
+import socket
+from pathlib import Path
+
+from media_processor.runner import registry
+
+"""
+Plan File:
+`plan --output plan.json` 把一次配置展开成完整的 job 列表 (输入、输出、ffmpeg argv、
+预估耗时、跳过原因)，`run --plan plan.json` 按这个列表执行，不再重新扫描目录
+(编码器回退、auto_tune 线程、检测结果用计划时的值，各机器执行的命令一致)。
+
+大批量任务可以先审阅，再用 `--shards N` 按预估耗时均衡切分 (贪心 LPT)，
+每台机器执行 `run --plan plan.json --shard K`。
+"""
+
+PLAN_VERSION = 1
+
+
+def job_cost(job):
+    """Cost used for shard balancing: estimated seconds, else media duration, else 1."""
+    return job.get("estimated_seconds") or job.get("media_duration") or 1.0
+
+
+def assign_shards(jobs, shards):
+    """Spreads runnable jobs over shards, longest job first onto the lightest shard.
+
+    Args:
+        jobs (list[dict]): Planned jobs (modified in place: adds "shard").
+        shards (int): Number of shards (machines).
+
+    Returns:
+        list[float]: Total cost per shard.
+    """
+    loads = [0.0] * max(1, shards)
+    for job in sorted(
+        (j for j in jobs if not j["skip"]), key=job_cost, reverse=True
+    ):
+        shard = loads.index(min(loads))
+        job["shard"] = shard
+        loads[shard] += job_cost(job)
+    for job in jobs:
+        if job["skip"]:
+            job["shard"] = None
+    return loads
+
+
+def build_plan(task_type, params, shards=1):
+    """Plans a validated configuration with full commands and cost estimates.
+
+    Args:
+        task_type (str): Registered task name.
+        params (dict): Loaded configuration.
+        shards (int): Number of shards to split the runnable jobs into.
+
+    Returns:
+        dict: JSON-serialisable plan.
+    """
+    runner = registry.load_runner(task_type)
+    jobs = runner.describe_jobs(runner.plan(**registry.build_kwargs(task_type, params)))
+    loads = assign_shards(jobs, shards)
+    return {
+        "version": PLAN_VERSION,
+        "task": task_type,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": socket.gethostname(),
+        "params": params,
+        "shards": len(loads),
+        "shard_costs": [round(load, 1) for load in loads],
+        "jobs": jobs,
+    }
+
+
+def write_plan(plan, path):
+    """Writes a plan as JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+
+
+def load_plan(path):
+    """Reads a plan file.
+
+    Raises:
+        ValueError: If the file is not a plan of a supported version.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION or plan.get("task") not in registry.TASKS:
+        raise ValueError(f"Not a valid plan file: {path}")
+    return plan
+
+
+def check_shard(plan, shard):
+    """Validates a `--shard` index against the plan.
+
+    Raises:
+        ValueError: If the shard is outside `0 .. shards - 1`.
+    """
+    if shard is not None and not 0 <= shard < plan["shards"]:
+        raise ValueError(
+            f"Shard {shard} out of range (plan has {plan['shards']} shards: "
+            f"0-{plan['shards'] - 1})"
+        )
+
+
+def select_jobs(plan, shard=None):
+    """Returns the runnable jobs of a plan (optionally of one shard).
+
+    Raises:
+        ValueError: If the shard is out of range (see `check_shard`).
+    """
+    check_shard(plan, shard)
+    return [
+        job
+        for job in plan["jobs"]
+        if not job["skip"] and (shard is None or job.get("shard") == shard)
+    ]
+
+
+def execute_plan(plan, shard=None):
+    """Executes the planned jobs in order.
+
+    Runners that record the settings resolved at plan time (convert: encoder,
+    auto_tune threads, detection results) reuse them, so every shard runs the
+    argv of the plan regardless of the executing host.
+
+    Args:
+        plan (dict): Result of `load_plan`.
+        shard (int, optional): Only run the jobs assigned to this shard.
+    """
+    runner = registry.load_runner(plan["task"])
+    jobs = select_jobs(plan, shard)
+    scope = f"shard {shard}/{plan['shards']}" if shard is not None else "all shards"
+    print(f"📋 Executing plan: {plan['task'].upper()} ({len(jobs)} jobs, {scope})")
+
+    # stream copy 任务 (merge / subtitle / chapter): 按磁盘并发执行
+    if hasattr(runner, "io_paths"):
+        from media_processor.service.common import io_scheduler
+
+        devices = io_scheduler.run_jobs(
+            jobs,
+            runner.execute_job,
+            runner.io_paths,
+            plan["params"].get("io_concurrency"),
+        )
+        io_scheduler.print_report(devices)
+        return
+
+    from media_processor.service.common import metrics
+
+    metrics.jobs_queued(len(jobs))
+    for i, job in enumerate(jobs, 1):
+        print(f"\n[{i}/{len(jobs)}] {job['input']}")
+        with metrics.job() as tracked:
+            runner.execute_job(job)
+            tracked["success"] = all(Path(o).exists() for o in job["outputs"])
@@ -0,0 +1,179 @@
+import importlib
+
+"""
+Task Registry:
+task 名 -> runner 模块 + 参数映射。
+runner 模块只在被选中时才 import (importlib)，启动时不再加载所有 runner / processor，
+cron / watch 场景下 "没事可做" 的调用也能很快结束。
+
+每个 runner 模块提供:
+- run(**kwargs):  执行任务
+- plan(**kwargs): 只做发现 (目录遍历 + 存在性检查)，返回将要执行的 job 列表
+- describe_jobs(jobs): 为 job 补充完整的 ffmpeg argv 与预估耗时 (plan --output)
+- execute_job(job): 执行单个 job (run --plan)，plan 文件可审阅、分片后分发到不同机器
+"""
+
+# run() 参数名 -> (params.json 中的键, 默认值)
+TASKS = {
+    "audio": {
+        "module": "media_processor.runner.batch_audio_runner",
+        "requires_output_dir": True,
+        "params": {
+            "input_dirs": ("input_dirs", []),
+            "output_dir": ("output_dir", None),
+            "batch_size": ("batch_size", 0),
+            "normalize_loudness": ("normalize_loudness", False),
+            "trim_silence": ("trim_silence", False),
+            "batch_minutes": ("batch_minutes", 0),
+            "split_at_silence": ("split_at_silence", False),
+            "dedup_policy": ("dedup", "off"),
+            "audio_codec": ("audio_codec", "mp3"),
+            "jobs": ("jobs", None),
+        },
+    },
+    "convert": {
+        "module": "media_processor.runner.batch_runner_media_converter",
+        "requires_output_dir": True,
+        "params": {
+            "input_dirs": ("input_dirs", []),
+            "output_dir": ("output_dir", None),
+            "use_gpu": ("use_gpu", False),
+            "target_resolution": ("resolution", "1080p"),
+            "delete_source": ("delete_source", False),
+            "use_suffix": ("use_suffix", False),
+            "compatibility_mode": ("compatibility_mode", False),
+            "embed_subtitles": ("embed_subtitles", False),
+            "remove_subtitle": ("remove_subtitle", False),
+            "test_mode": ("test", False),
+            "dedup_policy": ("dedup", "off"),
+            "reuse_cache": ("reuse_cache", False),
+            "thumbnails": ("thumbnails", None),
+            "resolutions": ("resolutions", None),
+            "streaming": ("streaming", None),
+            "encoder": ("encoder", None),
+            "quality": ("quality", None),
+            "speed": ("speed", None),
+            "auto_tune": ("auto_tune", False),
+            "jobs": ("jobs", 1),
+            "resumable_mode": ("resumable", False),
+            "scratch_dir": ("scratch_dir", None),
+            "scratch_gb": ("scratch_gb", None),
+            "prefetch": ("prefetch", None),
+            "auto_crop": ("auto_crop", False),
+        },
+    },
+    "timelapse": {
+        "module": "media_processor.runner.batch_timelapse",
+        "requires_output_dir": True,
+        "params": {
+            "input_dirs": ("input_dirs", []),
+            "output_dir": ("output_dir", None),
+            "speed_ratio": ("speed_ratio", 20),
+            "use_gpu": ("use_gpu", True),
+            "encoder": ("encoder", None),
+            "quality": ("quality", None),
+            "speed": ("speed", None),
+            "dedup_policy": ("dedup", "off"),
+            "adaptive": ("adaptive", False),
+            "max_speed_ratio": ("max_speed_ratio", None),
+        },
+    },
+    "chapter": {
+        "module": "media_processor.runner.add_chapters_runner",
+        "requires_output_dir": False,
+        "params": {
+            "tasks": ("tasks", []),
+            "output_dir": ("output_dir", None),
+            "input_dirs": ("input_dirs", None),
+            "auto_chapters": ("auto_chapters", None),
+            "jobs": ("jobs", 1),
+            "io_concurrency": ("io_concurrency", None),
+        },
+    },
+    "cut": {
+        "module": "media_processor.runner.batch_cut_runner",
+        "requires_output_dir": False,
+        "params": {
+            "tasks": ("tasks", []),
+            "output_dir": ("output_dir", None),
+            "input_dirs": ("input_dirs", None),
+            "ranges": ("ranges", None),
+            "smart_cut": ("smart_cut", False),
+            "io_concurrency": ("io_concurrency", None),
+        },
+    },
+    "merge": {
+        "module": "media_processor.runner.batch_merge_runner",
+        "requires_output_dir": True,
+        "params": {
+            "input_dirs": ("input_dirs", []),
+            "output_dir": ("output_dir", None),
+            "io_concurrency": ("io_concurrency", None),
+            "max_part_size_mb": ("max_part_size_mb", None),
+            "max_part_duration": ("max_part_duration", None),
+        },
+    },
+    "subtitle": {
+        # output_dir is optional for subtitle task (In-place processing)
+        "module": "media_processor.runner.batch_subtitle_runner",
+        "requires_output_dir": False,
+        "params": {
+            "input_dirs": ("input_dirs", []),
+            "output_dir": ("output_dir", None),
+            "remove_subtitle": ("remove_subtitle", True),
+            "io_concurrency": ("io_concurrency", None),
+        },
+    },
+}
+
+
+def task_names():
+    return list(TASKS)
+
+
+def build_kwargs(task_type, params):
+    """Maps a params.json dict to the runner's keyword arguments.
+
+    Args:
+        task_type (str): Registered task name.
+        params (dict): Loaded configuration.
+
+    Returns:
+        dict: kwargs for the runner's `run()` / `plan()`.
+    """
+    return {
+        arg: params.get(key, default)
+        for arg, (key, default) in TASKS[task_type]["params"].items()
+    }
+
+
+def load_runner(task_type):
+    """Imports the runner module of a task (only when it is selected).
+
+    Raises:
+        KeyError: If the task is not registered.
+    """
+    return importlib.import_module(TASKS[task_type]["module"])
+
+
+def make_job(task_type, input_path, outputs, skip=None, kwargs=None):
+    """Builds one entry of a plan (see each runner's `plan()`).
+
+    Args:
+        task_type (str): Registered task name.
+        input_path (Path): Source file or folder.
+        outputs (list[Path]): Files / directories the job would write.
+        skip (str, optional): Why the job would be skipped (e.g. "exists").
+        kwargs (dict, optional): JSON-serialisable processor arguments, replayed by
+            the runner's `execute_job()` (`run --plan`).
+
+    Returns:
+        dict: JSON-serialisable job description.
+    """
+    return {
+        "task": task_type,
+        "input": str(input_path),
+        "outputs": [str(p) for p in outputs],
+        "skip": skip,
+        "kwargs": kwargs or {},
+    }
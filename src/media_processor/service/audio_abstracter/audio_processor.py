@@ -1,33 +1,75 @@
 import os
 import subprocess
 import math
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from media_processor.constant.extensions import VIDEO_EXTENSIONS
-from media_processor.constant.constant import AUDIO_SAMPLE_RATE
+from media_processor.constant.constant import (
+    AUDIO_BITRATE,
+    AUDIO_CODEC,
+    AUDIO_OPUS_BITRATE,
+    AUDIO_OPUS_SAMPLE_RATE,
+    AUDIO_SAMPLE_RATE,
+    LOUDNORM_TARGET_I,
+)
+from media_processor.service.audio_abstracter import loudness
+from media_processor.service.common import concat, probe, profiler
+
+
+# 输出编码: audio_codec -> 扩展名 / 编码参数 / 编码采样率
+# (三个编码器都是单线程，并行靠同时编码多个 batch，见 process_folder)
+AUDIO_CODECS = {
+    "mp3": {
+        "suffix": ".mp3",
+        "args": ["-c:a", AUDIO_CODEC, "-q:a", "2"],
+        "sample_rate": AUDIO_SAMPLE_RATE,
+    },
+    "opus": {
+        "suffix": ".opus",
+        "args": ["-c:a", "libopus", "-b:a", AUDIO_OPUS_BITRATE],
+        "sample_rate": AUDIO_OPUS_SAMPLE_RATE,
+    },
+    "aac": {
+        "suffix": ".m4a",
+        "args": ["-c:a", "aac", "-b:a", AUDIO_BITRATE, "-movflags", "+faststart"],
+        "sample_rate": AUDIO_SAMPLE_RATE,
+    },
+}
+
+
+def codec_spec(audio_codec=None):
+    """Returns the `AUDIO_CODECS` entry of a codec name (default "mp3")."""
+    name = (audio_codec or "mp3").lower()
+    if name not in AUDIO_CODECS:
+        raise ValueError(
+            f"Unknown audio_codec '{audio_codec}' (expected: {', '.join(AUDIO_CODECS)})"
+        )
+    return AUDIO_CODECS[name]
 
 
 # --- 工具函数 ---
 
 
-def run_ffmpeg(cmd):
+def full_command(cmd):
+    """Prepends the global ffmpeg flags used by `run_ffmpeg`."""
+    # -loglevel error: 保持清爽
+    return ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
+
+
+def run_ffmpeg(cmd, stage="ffmpeg", **kwargs):
     try:
-        # -loglevel error: 保持清爽
-        full_cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
-        subprocess.run(full_cmd, check=True)
+        full_cmd = full_command(cmd)
+        profiler.run_ffmpeg(full_cmd, stage, **kwargs)
+        return True
     except subprocess.CalledProcessError:
         print(f"❌ Error executing FFmpeg.")
         # 这里不抛出异常，让主流程尝试处理下一个
-        pass
-
+        return False
 
-def extract_audio_to_wav(video_path, temp_audio_path):
-    """Extracts audio from video to WAV format (PCM).
 
-    Args:
-        video_path (Path): Path to the input video file.
-        temp_audio_path (Path): Path to the output temporary WAV file.
-    """
-    cmd = [
+def build_extract_command(video_path, temp_audio_path):
+    """Builds the WAV (PCM) extraction arguments (without global ffmpeg flags)."""
+    return [
         "-i",
         str(video_path),
         "-vn",
@@ -39,66 +81,211 @@ def extract_audio_to_wav(video_path, temp_audio_path):
         "pcm_s16le",
         str(temp_audio_path),
     ]
+
+
+def extract_audio_to_wav(video_path, temp_audio_path):
+    """Extracts audio from video to WAV format (PCM).
+
+    Args:
+        video_path (Path): Path to the input video file.
+        temp_audio_path (Path): Path to the output temporary WAV file.
+    """
+    cmd = build_extract_command(video_path, temp_audio_path)
     # print(f"  🎵 Extracting: {video_path.name}")
-    run_ffmpeg(cmd)
+    run_ffmpeg(cmd, "extract")
+
+
+def _encode_args(audio_filter=None, audio_codec=None):
+    spec = codec_spec(audio_codec)
+    args = []
+    if audio_filter:
+        # loudnorm 内部以 192kHz 处理，需显式还原采样率
+        args.extend(["-af", audio_filter, "-ar", spec["sample_rate"]])
+    elif spec["sample_rate"] != AUDIO_SAMPLE_RATE:
+        args.extend(["-ar", spec["sample_rate"]])
+    args.extend(spec["args"])
+    return args
+
+
+def build_merge_command(output_path, audio_filter=None, audio_codec=None):
+    """Builds the concat + encode arguments; the WAV list is read from stdin."""
+    return concat.build_args(output_path, _encode_args(audio_filter, audio_codec))
 
 
-def merge_wavs_to_mp3(audio_files, output_path):
-    """Merges multiple WAV files and converts them to MP3.
+def merge_wavs_to_mp3(audio_files, output_path, audio_filter=None, audio_codec=None):
+    """Merges multiple WAV files and encodes them (MP3 by default).
+
+    The WAV list is streamed to ffmpeg over a pipe (no shared temp list file);
+    very long batches are merged in groups first (see `concat.merge`).
 
     Args:
-        audio_files (list[Path]): List of WAV file paths.
-        output_path (Path): Path to the output MP3 file.
+        audio_files (list[Path | tuple]): WAV files, or (wav, start, end) segments.
+        output_path (Path): Path to the output audio file.
+        audio_filter (str, optional): `-af` chain (silence trimming / loudnorm).
+        audio_codec (str, optional): "mp3" (default), "opus" or "aac".
     """
-    list_filename = output_path.parent / "temp_concat_list.txt"
-
-    with open(list_filename, "w", encoding="utf-8") as f:
-        for audio in audio_files:
-            safe_path = str(audio.resolve()).replace("'", "'\\''")
-            f.write(f"file '{safe_path}'\n")
-
-    cmd = [
-        "-f",
-        "concat",
-        "-safe",
-        "0",
-        "-i",
-        str(list_filename),
-        "-c:a",
-        "libmp3lame",
-        "-q:a",
-        "2",
-        str(output_path),
-    ]
     print(f"  🔗 Merging -> {output_path.name}")
-    run_ffmpeg(cmd)
+    # 中间文件用 Matroska: WAV 有 4GB 上限
+    concat.merge(
+        audio_files,
+        output_path,
+        _encode_args(audio_filter, audio_codec),
+        lambda cmd, manifest: run_ffmpeg(cmd, "encode", input=manifest),
+        intermediate_suffix=".mka",
+    )
 
-    if list_filename.exists():
-        os.remove(list_filename)
+
+def list_videos(input_dir, skip_files=None):
+    """Lists the videos of a folder in merge order."""
+    extensions = VIDEO_EXTENSIONS
+    videos = [p for p in Path(input_dir).iterdir() if p.suffix.lower() in extensions]
+    if skip_files:
+        videos = [p for p in videos if p not in skip_files]
+    videos.sort()
+    return videos
+
+
+def split_batches(items, batch_size=0):
+    """Groups items into merge batches (batch_size 0 = everything in one batch)."""
+    # 如果 BATCH_SIZE 为 0，则设为总长度（全量合并）
+    current_batch_size = batch_size if batch_size and batch_size > 0 else len(items)
+    if not current_batch_size:
+        return []
+    num_batches = math.ceil(len(items) / current_batch_size)
+    return [
+        items[i * current_batch_size : (i + 1) * current_batch_size]
+        for i in range(num_batches)
+    ]
+
+
+def split_batches_by_duration(items, target_seconds, cut_points=None):
+    """Packs consecutive clips into batches close to a target duration.
+
+    When a clip would overflow the current batch, the batch length closest to the
+    target wins among: closing the batch now, taking the whole clip, or cutting the
+    clip at one of its silences (the rest starts the next batch).
+
+    Args:
+        items (list[tuple[Path, float]]): (clip, duration seconds) in order.
+        target_seconds (float): Target batch duration.
+        cut_points (dict, optional): {clip: [seconds, ...]} allowed cut positions.
+
+    Returns:
+        list[list[tuple[Path, float | None, float | None]]]: Batches of
+            (clip, start, end) segments; None means the clip's start / end.
+    """
+    cut_points = cut_points or {}
+    batches = []
+    current, total = [], 0.0
+
+    for path, duration in items:
+        start = 0.0
+        while True:
+            remaining = duration - start
+            if total + remaining <= target_seconds:
+                current.append((path, start or None, None))
+                total += remaining
+                break
+
+            # 超出目标: 在 "整段加入 / 现在结束 / 在静音处切开" 中选最接近目标的
+            options = [(abs(total + remaining - target_seconds), "whole", None)]
+            if current:
+                options.append((abs(total - target_seconds), "close", None))
+            for cut in cut_points.get(path, []):
+                if start < cut < duration:
+                    length = total + cut - start
+                    options.append((abs(length - target_seconds), "cut", cut))
+            _, action, cut = min(options, key=lambda o: o[0])
+
+            if action != "close":
+                current.append((path, start or None, cut))
+            batches.append(current)
+            current, total = [], 0.0
+            if action == "whole":
+                break
+            if action == "cut":
+                start = cut
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def plan_batches(videos, wavs, batch_size=0, batch_minutes=0, cut_points=None):
+    """Groups extracted WAVs into output batches.
+
+    Args:
+        videos (list[Path]): Source videos (durations are probed, cached).
+        wavs (list[Path]): Their WAVs, same order.
+        batch_size (int): Clips per batch (used when batch_minutes is 0).
+        batch_minutes (float): Target batch duration; 0 disables duration batching.
+        cut_points (dict, optional): {video: [seconds, ...]} silences usable as cuts.
+
+    Returns:
+        list[list[tuple[Path, float | None, float | None]]]: (wav, start, end) batches.
+    """
+    if not batch_minutes:
+        return [[(w, None, None) for w in b] for b in split_batches(wavs, batch_size)]
+
+    cut_points = cut_points or {}
+    items = [(w, probe.probe_media(v).get("duration", 0.0)) for v, w in zip(videos, wavs)]
+    cuts = {w: cut_points[v] for v, w in zip(videos, wavs) if cut_points.get(v)}
+    return split_batches_by_duration(items, batch_minutes * 60, cuts)
+
+
+def output_name_for(batch, audio_codec=None):
+    """Names a batch after its first clip (`001.mp3`, or `001_t01800.mp3` mid-clip)."""
+    path, start, _ = batch[0]
+    suffix = codec_spec(audio_codec)["suffix"]
+    if start:
+        return f"{path.stem}_t{int(start):05d}{suffix}"
+    return f"{path.stem}{suffix}"
+
+
+def target_dir_for(input_dir, output_root):
+    """Returns the folder receiving the MP3s of `input_dir`."""
+    return Path(output_root).resolve() / Path(input_dir).resolve().name
 
 
 # --- 核心入口 ---
 
 
-def process_folder(input_dir, output_root, batch_size=0):
+def process_folder(
+    input_dir,
+    output_root,
+    batch_size=0,
+    normalize_loudness=False,
+    trim_silence=False,
+    skip_files=None,
+    batch_minutes=0,
+    split_at_silence=False,
+    audio_codec=None,
+    jobs=None,
+):
     """Processes all videos in the folder, extracting and merging audio.
 
     Args:
         input_dir (Path): Source directory containing videos.
         output_root (Path): Output root directory.
         batch_size (int): Number of videos per merged audio file. 0 for all-in-one.
+        normalize_loudness (bool): Two-pass EBU R128 loudness normalization.
+        trim_silence (bool): Remove long silent gaps.
+        skip_files (set[Path], optional): Videos to leave out (e.g. duplicates).
+        batch_minutes (float): Target duration per MP3 (overrides batch_size).
+        split_at_silence (bool): With batch_minutes, allow cutting inside a clip
+            at a detected pause to get closer to the target.
+        audio_codec (str, optional): "mp3" (default), "opus" or "aac".
+        jobs (int, optional): Batches encoded at the same time (default: CPU count).
     """
     root = Path(input_dir).resolve()
 
     # 为了防止不同文件夹的文件名冲突（比如都有 001.mp4），
     # 我们在输出目录下创建一个同名子目录来存放结果
     # 结果路径: ./Output/源文件夹名/001.mp3
-    target_dir = Path(output_root).resolve() / root.name
+    target_dir = target_dir_for(root, output_root)
     target_dir.mkdir(parents=True, exist_ok=True)
 
-    extensions = VIDEO_EXTENSIONS
-    videos = [p for p in root.iterdir() if p.suffix.lower() in extensions]
-    videos.sort()
+    videos = list_videos(root, skip_files)
 
     if not videos:
         # print(f"No videos in {root.name}")
@@ -111,40 +298,71 @@ def process_folder(input_dir, output_root, batch_size=0):
     temp_dir.mkdir(parents=True, exist_ok=True)
 
     temp_audios = []
+    measurements = {}
+    silences = {}
+    split_at_silence = split_at_silence and bool(batch_minutes)
 
     # --- 阶段 1: 抽取 WAV ---
+    # 响度测量 (loudnorm 第一遍) 在后台线程中与后续文件的抽取并行
     print("  ...Extracting WAVs...")
-    for v in videos:
-        audio_name = v.stem + ".wav"
-        temp_audio = temp_dir / audio_name
-
-        if not temp_audio.exists():
-            extract_audio_to_wav(v, temp_audio)
-        temp_audios.append(temp_audio)
-
-    # --- 阶段 2: 合并 MP3 ---
-    # 如果 BATCH_SIZE 为 0，则设为总长度（全量合并）
-    current_batch_size = (
-        batch_size if batch_size and batch_size > 0 else len(temp_audios)
-    )
-    num_batches = math.ceil(len(temp_audios) / current_batch_size)
-
-    for i in range(num_batches):
-        start_idx = i * current_batch_size
-        end_idx = start_idx + current_batch_size
-        batch = temp_audios[start_idx:end_idx]
-
-        # 命名规则: 使用该组第一个文件的文件名
-        first_file_name = batch[0].stem
-        output_name = f"{first_file_name}.mp3"
+    with ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1)) as pool:
+        for v in videos:
+            audio_name = v.stem + ".wav"
+            temp_audio = temp_dir / audio_name
+
+            if not temp_audio.exists():
+                extract_audio_to_wav(v, temp_audio)
+            temp_audios.append(temp_audio)
+
+            if normalize_loudness and temp_audio.exists():
+                measurements[temp_audio] = pool.submit(
+                    loudness.measure_loudness, v, temp_audio
+                )
+            if split_at_silence and temp_audio.exists():
+                silences[v] = pool.submit(loudness.detect_silences, v, temp_audio)
+
+        # 等待所有测量完成 (退出 with 时也会等待，这里取出结果)
+        measurements = {k: f.result() for k, f in measurements.items()}
+        silences = {k: f.result() for k, f in silences.items()}
+
+    # --- 阶段 2: 合并编码 ---
+    # 编码器都是单线程: 各 batch 互不依赖，同时编码多个 batch 才能用满多核
+    batches = plan_batches(videos, temp_audios, batch_size, batch_minutes, silences)
+    pending = []
+    for batch in batches:
+        # 命名规则: 使用该组第一个文件的文件名 (从中间切开时带上起始秒数)
+        output_name = output_name_for(batch, audio_codec)
 
         final_mp3_path = target_dir / output_name
 
         # 避免重复合并
         if final_mp3_path.exists():
             print(f"  ⏭️  Skipping existing: {output_name}")
-        else:
-            merge_wavs_to_mp3(batch, final_mp3_path)
+            continue
+
+        measurement = None
+        if normalize_loudness:
+            measurement = loudness.combine_measurements(
+                [measurements.get(a) for a, _, _ in batch]
+            )
+            if measurement:
+                print(
+                    f"  🔊 Loudness ({output_name}): {measurement['input_i']:.1f} LUFS"
+                    f" -> {LOUDNORM_TARGET_I} LUFS"
+                )
+        audio_filter = loudness.build_audio_filters(measurement, trim_silence)
+        pending.append((batch, final_mp3_path, audio_filter))
+
+    workers = max(1, min(jobs or os.cpu_count() or 1, len(pending) or 1))
+    if len(pending) > 1 and workers > 1:
+        print(f"  ...Encoding {len(pending)} batches ({workers} at a time)...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(merge_wavs_to_mp3, batch, path, audio_filter, audio_codec)
+            for batch, path, audio_filter in pending
+        ]
+        for future in futures:
+            future.result()
 
     # --- 清理 ---
     print("  🧹 Cleaning temp files...")
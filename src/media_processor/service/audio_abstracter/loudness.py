@@ -0,0 +1,254 @@
+import json
+import math
+import re
+import subprocess
+
+from media_processor.constant.constant import (
+    LOUDNORM_TARGET_I,
+    LOUDNORM_TARGET_TP,
+    LOUDNORM_TARGET_LRA,
+    SILENCE_THRESHOLD,
+    SILENCE_MIN_DURATION,
+    SILENCE_KEEP_DURATION,
+    SILENCE_SPLIT_DURATION,
+)
+from media_processor.service.common import profiler
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+
+"""
+Loudness (EBU R128) & Silence Trimming:
+两遍 loudnorm —— 第一遍只测量 (print_format=json)，第二遍带测量值做线性归一化。
+测量针对每个源文件单独进行，可以和 WAV 抽取并行，结果按源文件指纹缓存；
+合并时把同一批次内各文件的测量值按时长做能量加权，得到整批的近似测量值，
+这样最终编码 (本来就要做的那一遍) 顺带完成归一化，不需要额外的完整解码/编码。
+"""
+
+_cache = JsonCache("loudnorm")
+_silence_cache = JsonCache("silence_points")
+
+MEASURE_KEYS = ("input_i", "input_tp", "input_lra", "input_thresh")
+
+
+def _loudnorm_args():
+    return f"I={LOUDNORM_TARGET_I}:TP={LOUDNORM_TARGET_TP}:LRA={LOUDNORM_TARGET_LRA}"
+
+
+def measure_loudness(source_path, wav_path):
+    """Runs the loudnorm measurement pass on an extracted WAV (cached per source).
+
+    Args:
+        source_path (Path): Original video file (cache identity).
+        wav_path (Path): Extracted WAV to measure.
+
+    Returns:
+        dict | None: {"input_i", "input_tp", "input_lra", "input_thresh", "duration"}
+            as floats, or None if the measurement failed.
+    """
+    try:
+        key = file_fingerprint(source_path)
+    except OSError:
+        key = None
+
+    if key:
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        str(wav_path),
+        "-af",
+        f"loudnorm={_loudnorm_args()}:print_format=json",
+        "-f",
+        "null",
+        "-",
+    ]
+    try:
+        with profiler.span("loudnorm_measure", file=wav_path.name):
+            result = subprocess.run(
+                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+            )
+    except OSError as e:
+        print(f"  ⚠️  Loudness measurement failed: {e}")
+        return None
+
+    measurement = parse_loudnorm_output(result.stderr)
+    if measurement is None:
+        print(f"  ⚠️  Loudness measurement failed: {wav_path.name}")
+        return None
+
+    measurement["duration"] = _parse_duration(result.stderr)
+    if key:
+        _cache.set(key, measurement)
+    return measurement
+
+
+def parse_loudnorm_output(stderr):
+    """Extracts the JSON block printed by `loudnorm=print_format=json`.
+
+    Returns:
+        dict | None: Measured values as floats ("-inf" for silent input).
+    """
+    match = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", stderr)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+        return {k: float(data[k]) for k in MEASURE_KEYS}
+    except (KeyError, ValueError):
+        return None
+
+
+def _parse_duration(stderr):
+    # "Duration: 00:01:02.50," from the input banner
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", stderr)
+    if not match:
+        return 0.0
+    h, m, s = match.groups()
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def _fingerprint(path):
+    try:
+        return file_fingerprint(path)
+    except OSError:
+        return None
+
+
+def cached_silences(source_path):
+    """Returns previously detected cut points of a source, or None (never runs ffmpeg)."""
+    key = _fingerprint(source_path)
+    return _silence_cache.get(key) if key else None
+
+
+def detect_silences(source_path, wav_path):
+    """Finds pauses usable as cut points in an extracted WAV (cached per source).
+
+    Args:
+        source_path (Path): Original video file (cache identity).
+        wav_path (Path): Extracted WAV to analyse.
+
+    Returns:
+        list[float]: Midpoints (seconds) of silences longer than SILENCE_SPLIT_DURATION.
+    """
+    key = _fingerprint(source_path)
+    if key:
+        cached = _silence_cache.get(key)
+        if cached is not None:
+            return cached
+
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        str(wav_path),
+        "-af",
+        f"silencedetect=noise={SILENCE_THRESHOLD}:d={SILENCE_SPLIT_DURATION}",
+        "-f",
+        "null",
+        "-",
+    ]
+    try:
+        with profiler.span("silencedetect", file=wav_path.name):
+            result = subprocess.run(
+                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+            )
+    except OSError as e:
+        print(f"  ⚠️  Silence detection failed: {e}")
+        return []
+
+    points = parse_silences(result.stderr)
+    if key and result.returncode == 0:
+        _silence_cache.set(key, points)
+    return points
+
+
+def parse_silences(stderr):
+    """Parses `silencedetect` output into silence midpoints (seconds)."""
+    points = []
+    start = None
+    for line in stderr.splitlines():
+        match = re.search(r"silence_start: (-?[\d.]+)", line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = re.search(r"silence_end: ([\d.]+)", line)
+        if match and start is not None:
+            points.append(round((start + float(match.group(1))) / 2, 3))
+            start = None
+    return points
+
+
+def combine_measurements(measurements):
+    """Combines per-file measurements into an approximate whole-batch measurement.
+
+    Integrated loudness is an energy mean weighted by duration; true peak and LRA take
+    the maximum (conservative). The relative gate of R128 sits 10 LU below the ungated
+    level, so the threshold is derived from the combined loudness.
+
+    Args:
+        measurements (list[dict]): Results of `measure_loudness`.
+
+    Returns:
+        dict | None: Combined measurement, or None if nothing usable was measured.
+    """
+    usable = [
+        m
+        for m in measurements
+        if m and math.isfinite(m["input_i"]) and m.get("duration", 0) > 0
+    ]
+    if not usable:
+        return None
+
+    total_duration = sum(m["duration"] for m in usable)
+    energy = sum(m["duration"] * 10 ** (m["input_i"] / 10) for m in usable)
+    integrated = 10 * math.log10(energy / total_duration)
+
+    return {
+        "input_i": integrated,
+        "input_tp": max(
+            (m["input_tp"] for m in usable if math.isfinite(m["input_tp"])),
+            default=float(LOUDNORM_TARGET_TP),
+        ),
+        "input_lra": max(m["input_lra"] for m in usable),
+        "input_thresh": integrated - 10,
+    }
+
+
+def build_audio_filters(measurement=None, trim_silence=False):
+    """Builds the `-af` chain for the final encode.
+
+    Args:
+        measurement (dict, optional): Combined measurement; None disables loudnorm.
+        trim_silence (bool): Whether to remove long silent gaps.
+
+    Returns:
+        str | None: Filter chain, or None if no filter is needed.
+    """
+    filters = []
+
+    # 先去静音再归一化：R128 本身带门限，静音段对测量值影响很小
+    if trim_silence:
+        filters.append(
+            "silenceremove=start_periods=1"
+            f":start_threshold={SILENCE_THRESHOLD}"
+            f":stop_periods=-1:stop_duration={SILENCE_MIN_DURATION}"
+            f":stop_threshold={SILENCE_THRESHOLD}"
+            f":stop_silence={SILENCE_KEEP_DURATION}"
+        )
+
+    if measurement:
+        filters.append(
+            f"loudnorm={_loudnorm_args()}"
+            f":measured_I={measurement['input_i']:.2f}"
+            f":measured_TP={measurement['input_tp']:.2f}"
+            f":measured_LRA={measurement['input_lra']:.2f}"
+            f":measured_thresh={measurement['input_thresh']:.2f}"
+            ":linear=true"
+        )
+
+    return ",".join(filters) if filters else None
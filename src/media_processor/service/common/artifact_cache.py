@@ -0,0 +1,145 @@
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+
+from media_processor.constant.constant import ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_GB
+from media_processor.service.common import dedup
+from media_processor.service.common.fileops import clone_file
+from media_processor.service.common.json_cache import JsonCache
+
+"""
+Artifact Cache:
+相同的源文件 + 相同的 ffmpeg 参数 => 相同的输出。
+输出完成后存入内容寻址的缓存目录 (key = 源内容哈希 + 参数指纹 + ffmpeg 版本)，
+之后重复的转码请求 (换了 output_dir、输出被删掉等) 直接 reflink/复制，不再编码。
+不用硬链接: 交付的输出与缓存共用 inode 时，原地修改输出会污染之后每一次命中。
+缓存目录有容量上限，按最近使用时间 (LRU) 淘汰。
+"""
+
+_index = JsonCache("artifacts_index")
+
+
+@functools.lru_cache(maxsize=1)
+def ffmpeg_version():
+    """Returns the first line of `ffmpeg -version` (part of the cache key)."""
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-version"], stdout=subprocess.PIPE, text=True, check=True
+        )
+        return result.stdout.splitlines()[0]
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        return "unknown"
+
+
+def make_key(input_path, cmd, placeholders, mode=None):
+    """Builds the cache key for a transcode request.
+
+    Args:
+        input_path (Path): Main source file (hashed by content).
+        cmd (list[str]): ffmpeg arguments.
+        placeholders (dict[str, Path]): Paths inside `cmd` to neutralise, mapped to the
+            name they are replaced with (e.g. output path -> "{output}").
+            Side inputs such as subtitle files are hashed by content as well.
+        mode (str, optional): How the output is produced when it is not a single run
+            of `cmd` (e.g. "resumable:600" for segmented encodes).
+
+    Returns:
+        str: Hex digest.
+    """
+    replacements = {str(p): name for name, p in placeholders.items()}
+    argv = [replacements.get(arg, arg) for arg in cmd]
+
+    side_inputs = {
+        name: dedup.content_hash(p)
+        for name, p in placeholders.items()
+        if name not in ("{input}", "{output}") and Path(p).is_file()
+    }
+
+    payload = json.dumps(
+        {
+            "input": dedup.content_hash(input_path),
+            "argv": argv,
+            "side_inputs": side_inputs,
+            "ffmpeg": ffmpeg_version(),
+            "mode": mode,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(key, output_path):
+    """Materialises a cached artifact at `output_path` if present.
+
+    Returns:
+        str | None: How the file was materialised ("reflink"/"copy"), or None on miss
+            (or if it could not be materialised).
+    """
+    entry = _index.get(key)
+    if not entry:
+        return None
+
+    cached_file = ARTIFACT_CACHE_DIR / entry["file"]
+    if not cached_file.exists():
+        _index.pop(key)
+        return None
+
+    try:
+        method = clone_file(cached_file, output_path, allow_hardlink=False)
+    except OSError as e:
+        print(f"⚠️  Failed to restore artifact from cache: {e}")
+        Path(output_path).unlink(missing_ok=True)
+        return None
+    entry["last_used"] = time.time()
+    _index.set(key, entry)
+    return method
+
+
+def store(key, output_path, max_gb=ARTIFACT_CACHE_MAX_GB):
+    """Adds a finished output to the cache and evicts old entries.
+
+    Failures only print a warning (the output itself is already finished).
+
+    Args:
+        key (str): Result of `make_key`.
+        output_path (Path): Finished output file.
+        max_gb (float): Cache size limit in GiB.
+    """
+    output_path = Path(output_path)
+    cached_name = f"{key}{output_path.suffix}"
+    cached_file = ARTIFACT_CACHE_DIR / cached_name
+
+    try:
+        if not cached_file.exists():
+            clone_file(output_path, cached_file, allow_hardlink=False)
+        size = cached_file.stat().st_size
+    except OSError as e:
+        print(f"⚠️  Failed to store artifact in cache: {e}")
+        return
+
+    _index.set(key, {"file": cached_name, "size": size, "last_used": time.time()})
+    try:
+        evict(max_gb)
+    except OSError as e:
+        print(f"⚠️  Failed to evict old artifacts: {e}")
+
+
+def evict(max_gb=ARTIFACT_CACHE_MAX_GB):
+    """Deletes least recently used artifacts until the cache fits in `max_gb`."""
+    limit = max_gb * 1024**3
+    entries = sorted(_index.items(), key=lambda kv: kv[1].get("last_used", 0))
+    total = sum(e.get("size", 0) for _, e in entries)
+
+    for key, entry in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(ARTIFACT_CACHE_DIR / entry["file"])
+        except OSError:
+            pass
+        _index.pop(key)
+        total -= entry.get("size", 0)
@@ -0,0 +1,120 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from media_processor.constant.constant import CONCAT_FD_RESERVE, CONCAT_MAX_FILES
+
+"""
+Concat (stream copy / re-encode of many clips):
+concat 清单不再写临时文件，而是通过 stdin 流式传给 ffmpeg (`-f concat -i -`)，
+同一输出目录下的并发任务不会互相覆盖清单。
+
+文件数超过上限 (RLIMIT_NOFILE 减去预留，且不超过 CONCAT_MAX_FILES) 时分层合并:
+先按组 stream copy 成中间文件 (放在输出目录下的唯一临时目录)，再合并各组。
+"""
+
+# 清单来自 stdin (pipe)，其中引用的是本地文件，两种协议都需放行
+PIPE_INPUT_ARGS = [
+    "-f",
+    "concat",
+    "-safe",
+    "0",
+    "-protocol_whitelist",
+    "file,pipe",
+    "-i",
+    "-",
+]
+
+
+def escape_path(path):
+    """Quotes a path for a concat manifest line (single quotes escaped)."""
+    return str(Path(path).resolve()).replace("'", "'\\''")
+
+
+def manifest(files):
+    """Builds the concat manifest fed to ffmpeg's stdin.
+
+    Args:
+        files (list[Path | tuple]): Clips, or (path, inpoint, outpoint) segments
+            (None = from the start / to the end).
+
+    Returns:
+        bytes: One `file '...'` line per clip, plus inpoint/outpoint directives.
+    """
+    lines = []
+    for item in files:
+        path, inpoint, outpoint = item if isinstance(item, tuple) else (item, None, None)
+        lines.append(f"file '{escape_path(path)}'\n")
+        if inpoint:
+            lines.append(f"inpoint {inpoint:.3f}\n")
+        if outpoint is not None:
+            lines.append(f"outpoint {outpoint:.3f}\n")
+    return "".join(lines).encode("utf-8")
+
+
+def build_args(output_path, output_args):
+    """Builds the concat arguments (without global flags); the manifest comes from stdin."""
+    return PIPE_INPUT_ARGS + list(output_args) + [str(output_path)]
+
+
+def max_group_size():
+    """Returns how many clips a single concat may reference."""
+    limit = CONCAT_MAX_FILES
+    try:
+        import resource
+
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            limit = min(limit, soft - CONCAT_FD_RESERVE)
+    except (ImportError, OSError, ValueError):
+        # Windows: 没有 resource 模块，使用默认上限
+        pass
+    return max(2, limit)
+
+
+def split_groups(files, group_size):
+    """Splits clips into consecutive groups of at most `group_size`."""
+    return [files[i : i + group_size] for i in range(0, len(files), group_size)]
+
+
+def merge(files, output_path, output_args, run, intermediate_suffix=None, group_size=None):
+    """Concatenates clips into `output_path`, hierarchically if there are too many.
+
+    Args:
+        files (list[Path | tuple]): Clips (or segments, see `manifest`) in order.
+        output_path (Path): Final output.
+        output_args (list[str]): Arguments between the input and the output
+            (e.g. ["-c", "copy"] or an audio filter and encoder).
+        run (callable): `run(cmd, manifest)` executes ffmpeg arguments (without global
+            flags) with the manifest on stdin; returns True on success.
+        intermediate_suffix (str, optional): Container of the group files
+            (defaults to the output's suffix).
+        group_size (int, optional): Clips per concat (defaults to `max_group_size()`).
+
+    Returns:
+        bool: True if every ffmpeg call succeeded.
+    """
+    output_path = Path(output_path)
+    files = list(files)
+    group_size = group_size or max_group_size()
+
+    if len(files) <= group_size:
+        return bool(run(build_args(output_path, output_args), manifest(files)))
+
+    suffix = intermediate_suffix or output_path.suffix
+    groups = split_groups(files, group_size)
+    print(f"  🧩 {len(files)} clips: merging in {len(groups)} groups of {group_size}")
+
+    work_dir = Path(
+        tempfile.mkdtemp(prefix=f".{output_path.stem}_concat_", dir=output_path.parent)
+    )
+    try:
+        parts = []
+        for i, group in enumerate(groups):
+            part = work_dir / f"part_{i:05d}{suffix}"
+            if not run(build_args(part, ["-c", "copy"]), manifest(group)):
+                return False
+            parts.append(part)
+        return merge(parts, output_path, output_args, run, suffix, group_size)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,173 @@
+import hashlib
+import os
+from pathlib import Path
+
+from media_processor.service.common.fileops import clone_file
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+
+"""
+Input Deduplication:
+同一段素材经常从不同 SD 卡重复拷贝或被改名，内容相同却会被重复编码。
+
+- 快速指纹: 文件大小 + 头/中/尾三个 1MiB 块的哈希 (只读 3MiB，与文件大小无关)
+- 只有快速指纹相同时，才计算完整哈希确认 (避免误判)
+- 两种哈希都按文件指纹 (路径+大小+mtime) 持久化缓存，重复运行不会重复读盘
+
+Policy:
+- "off":  不去重 (默认)
+- "skip": 重复文件直接跳过
+- "link": 只编码一次，然后把结果 reflink/硬链接 (失败则复制) 到每个重复文件的预期输出路径
+"""
+
+DEDUP_POLICIES = ("off", "skip", "link")
+
+BLOCK_SIZE = 1024 * 1024
+
+_cache = JsonCache("dedup_hashes")
+
+
+def partial_hash(path):
+    """Hashes size + head/middle/tail blocks of a file.
+
+    Args:
+        path (Path): File to hash.
+
+    Returns:
+        str: "<size>:<blake2b hex>".
+    """
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if size <= BLOCK_SIZE * 3:
+            h.update(f.read())
+        else:
+            for offset in (0, size // 2 - BLOCK_SIZE // 2, size - BLOCK_SIZE):
+                f.seek(offset)
+                h.update(f.read(BLOCK_SIZE))
+    return f"{size}:{h.hexdigest()}"
+
+
+def full_hash(path):
+    """Hashes the whole file content (sha256)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOCK_SIZE * 8), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cached_hash(path, kind):
+    key = file_fingerprint(path)
+    entry = _cache.get(key) or {}
+    if kind not in entry:
+        entry[kind] = partial_hash(path) if kind == "partial" else full_hash(path)
+        _cache.set(key, entry)
+    return entry[kind]
+
+
+def content_hash(path):
+    """Returns the (cached) full content hash of a file."""
+    return _cached_hash(path, "full")
+
+
+class DedupIndex:
+    """Groups files by content during discovery.
+
+    The first path seen with a given content is the canonical one; later paths with
+    identical content are recorded as its duplicates.
+    """
+
+    def __init__(self):
+        self._by_partial = {}  # partial hash -> [canonical paths]
+        self.duplicates = {}  # duplicate path -> canonical path
+
+    def add(self, path):
+        """Registers a file.
+
+        Args:
+            path (Path): File discovered by a runner.
+
+        Returns:
+            Path: The canonical path for this content (`path` itself if new).
+        """
+        path = Path(path)
+        try:
+            partial = _cached_hash(path, "partial")
+        except OSError as e:
+            print(f"⚠️  Dedup hash failed for {path}: {e}")
+            return path
+
+        candidates = self._by_partial.setdefault(partial, [])
+        for canonical in candidates:
+            if canonical == path:
+                return path
+            # 快速指纹碰撞 -> 用完整哈希确认
+            try:
+                if content_hash(canonical) == content_hash(path):
+                    self.duplicates[path] = canonical
+                    return canonical
+            except OSError:
+                continue
+
+        candidates.append(path)
+        return path
+
+    def is_duplicate(self, path):
+        return Path(path) in self.duplicates
+
+    def duplicates_of(self, canonical):
+        """Lists the duplicates registered for a canonical path."""
+        canonical = Path(canonical)
+        return [d for d, c in self.duplicates.items() if c == canonical]
+
+
+def build_index(paths):
+    """Builds a dedup index over discovered files and prints a summary.
+
+    Args:
+        paths (list[Path]): Discovered input files, in processing order.
+
+    Returns:
+        DedupIndex: The populated index.
+    """
+    index = DedupIndex()
+    for p in paths:
+        index.add(p)
+
+    if index.duplicates:
+        print(
+            f"🧬 Dedup: {len(index.duplicates)} duplicate(s) among {len(paths)} files"
+        )
+        for dup, canonical in index.duplicates.items():
+            print(f"   {dup.name} == {canonical.name}")
+    return index
+
+
+def link_or_copy(src, dst):
+    """Materialises `src` at `dst` via reflink or hard link, falling back to copy.
+
+    Directories (e.g. streaming packages) are materialised file by file.
+
+    Args:
+        src (Path): Existing file or directory.
+        dst (Path): Target path (skipped if it already exists).
+
+    Returns:
+        bool: True if `dst` exists afterwards.
+    """
+    src = Path(src)
+    dst = Path(dst)
+    if dst.exists():
+        return True
+    if not src.exists():
+        return False
+
+    if src.is_dir():
+        method = "copy"
+        for f in sorted(src.rglob("*")):
+            if f.is_file():
+                method = clone_file(f, dst / f.relative_to(src))
+    else:
+        method = clone_file(src, dst)
+    print(f"🔗 Duplicate materialised ({method}): {dst.name}")
+    return True
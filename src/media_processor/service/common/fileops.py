@@ -0,0 +1,64 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+"""
+File Operations:
+Cheapest-first ways to make a file appear at a second path:
+reflink (copy-on-write clone, Btrfs/XFS/APFS) -> hard link (same filesystem) -> copy.
+"""
+
+# Linux ioctl: FICLONE = _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    if sys.platform == "darwin":
+        # APFS clonefile
+        subprocess.run(["cp", "-c", str(src), str(dst)], check=True, capture_output=True)
+        return
+
+    import fcntl
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+def clone_file(src, dst, allow_hardlink=True):
+    """Makes `src` available at `dst` without re-encoding anything.
+
+    Args:
+        src (Path): Existing file.
+        dst (Path): Target path (must not exist).
+        allow_hardlink (bool): Whether sharing the inode with `src` is acceptable.
+
+    Returns:
+        str: "reflink", "hardlink" or "copy".
+    """
+    src = Path(src)
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        _reflink(src, dst)
+        shutil.copystat(src, dst)
+        return "reflink"
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    if allow_hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+    return "copy"
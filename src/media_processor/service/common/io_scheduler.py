@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from media_processor.constant.constant import (
+    IO_CONCURRENCY_HDD,
+    IO_CONCURRENCY_SSD,
+    IO_CONCURRENCY_UNKNOWN,
+)
+from media_processor.service.common import metrics
+
+"""
+I/O Scheduler (stream copy tasks):
+merge / subtitle / chapter 都是 stream copy，瓶颈完全在磁盘。
+同一块机械盘上并发会让磁头来回寻道，而多块盘串行执行又浪费了其余磁盘的带宽。
+
+每个 job 按其读写路径解析所在的块设备 (st_dev，挂载点 + /proc/mounts 得到设备名，
+/sys 的 rotational 区分机械盘/SSD)，每个设备有自己的并发上限:
+调度器只启动 "涉及的所有设备都有空位" 的 job，不同磁盘上的 job 同时进行。
+结束时按设备汇报读写量与实际达到的 MB/s。
+"""
+
+MOUNTS_FILE = "/proc/mounts"
+
+_mount_sources = None
+
+
+def _existing(path):
+    """Closest existing ancestor (outputs usually don't exist yet)."""
+    path = Path(path).resolve()
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
+
+
+def mount_point(path):
+    """Returns the mount point a path lives on."""
+    path = _existing(path)
+    while not os.path.ismount(path) and path != path.parent:
+        path = path.parent
+    return path
+
+
+def _load_mounts():
+    """mount point -> source device (e.g. /dev/sda1), from /proc/mounts (Linux only)."""
+    global _mount_sources
+    if _mount_sources is None:
+        _mount_sources = {}
+        try:
+            with open(MOUNTS_FILE, "r", encoding="utf-8") as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 2:
+                        # 挂载点中的空格写作 \040
+                        target = fields[1].replace("\\040", " ")
+                        _mount_sources[target] = fields[0]
+        except OSError:
+            pass
+    return _mount_sources
+
+
+def is_rotational(st_dev):
+    """True for spinning disks, False for SSDs, None if unknown (non-Linux)."""
+    major, minor = os.major(st_dev), os.minor(st_dev)
+    base = Path(f"/sys/dev/block/{major}:{minor}")
+    # 分区没有 queue/，在父设备上
+    for queue in (base / "queue", base / ".." / "queue"):
+        try:
+            return (queue / "rotational").read_text().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+class Device:
+    """One block device: concurrency slots plus byte / busy-time accounting."""
+
+    def __init__(self, st_dev, mount, source, limit):
+        self.st_dev = st_dev
+        self.mount = mount
+        self.source = source
+        self.limit = limit
+        self.active = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.busy_seconds = 0.0
+        self._busy_since = None
+
+    @property
+    def label(self):
+        if self.source and self.source != str(self.mount):
+            return f"{self.source} ({self.mount})"
+        return str(self.mount)
+
+    def acquire(self):
+        if self.active == 0:
+            self._busy_since = time.perf_counter()
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        if self.active == 0:
+            self.busy_seconds += time.perf_counter() - self._busy_since
+
+    def throughput(self):
+        """MB/s while the device had at least one job running."""
+        if not self.busy_seconds:
+            return 0.0
+        total_mb = (self.bytes_read + self.bytes_written) / (1024 * 1024)
+        return total_mb / self.busy_seconds
+
+
+def default_limit(st_dev):
+    rotational = is_rotational(st_dev)
+    if rotational is None:
+        return IO_CONCURRENCY_UNKNOWN
+    return IO_CONCURRENCY_HDD if rotational else IO_CONCURRENCY_SSD
+
+
+def resolve_limit(io_concurrency, st_dev, mount, source):
+    """Concurrency of a device: config override (int, or per mount / device), else auto."""
+    if isinstance(io_concurrency, dict):
+        for key in (str(mount), source):
+            if key in io_concurrency:
+                return max(1, int(io_concurrency[key]))
+    elif io_concurrency:
+        return max(1, int(io_concurrency))
+    return default_limit(st_dev)
+
+
+def _size(path):
+    """Bytes of a file, or of all files under a directory."""
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def run_jobs(jobs, execute, io_paths, io_concurrency=None, max_jobs=None):
+    """Runs jobs with per-device concurrency limits.
+
+    Args:
+        jobs (list[dict]): Runnable jobs, started in list order when their devices allow.
+        execute (callable): `execute(job)`; exceptions are reported, not raised. A
+            bool return value is the job's success, otherwise every write path must
+            exist afterwards.
+        io_paths (callable): `io_paths(job)` -> (reads, writes) lists of paths.
+        io_concurrency (int | dict, optional): Jobs per device; a dict maps a mount
+            point or device name (e.g. "/dev/sdb1") to its limit. Default: by disk type.
+        max_jobs (int, optional): Cap on jobs running at once across all devices.
+
+    Returns:
+        list[Device]: Per-device statistics.
+    """
+    devices = {}
+    job_devices = []
+    for job in jobs:
+        reads, writes = io_paths(job)
+        used = []
+        for path in list(reads) + list(writes):
+            st_dev = _existing(path).stat().st_dev
+            if st_dev not in devices:
+                mount = mount_point(path)
+                source = _load_mounts().get(str(mount))
+                devices[st_dev] = Device(
+                    st_dev,
+                    mount,
+                    source,
+                    resolve_limit(io_concurrency, st_dev, mount, source),
+                )
+            if st_dev not in used:
+                used.append(st_dev)
+        job_devices.append(
+            (
+                [devices[d] for d in used],
+                [Path(p) for p in reads],
+                [Path(p) for p in writes],
+            )
+        )
+
+    for device in devices.values():
+        print(f"💽 {device.label}: up to {device.limit} concurrent jobs")
+
+    condition = threading.Condition()
+    pending = list(zip(jobs, job_devices))
+    metrics.jobs_queued(len(pending))
+    threads = []
+    running = [0]
+
+    def worker(job, used, reads, writes):
+        # 读取量在执行前统计 (源文件可能在执行后被删除或原地替换)
+        read_bytes = {}
+        for p in reads:
+            dev = _existing(p).stat().st_dev
+            read_bytes[dev] = read_bytes.get(dev, 0) + _size(p)
+        try:
+            with metrics.job() as tracked:
+                try:
+                    result = execute(job)
+                    # processor 失败时多半只打印错误，没有返回值时以输出是否生成为准
+                    if isinstance(result, bool):
+                        tracked["success"] = result
+                    else:
+                        tracked["success"] = all(p.exists() for p in writes)
+                except Exception as e:
+                    tracked["success"] = False
+                    print(f"❌ Error processing {job['input']}: {e}")
+        finally:
+            written = {}
+            for p in writes:
+                if p.exists():
+                    dev = p.stat().st_dev
+                    written[dev] = written.get(dev, 0) + _size(p)
+            metrics.add_bytes(sum(read_bytes.values()), sum(written.values()))
+            with condition:
+                for device in used:
+                    device.bytes_read += read_bytes.get(device.st_dev, 0)
+                    device.bytes_written += written.get(device.st_dev, 0)
+                    device.release()
+                running[0] -= 1
+                condition.notify_all()
+
+    with condition:
+        while pending:
+            # 第一个所有设备都有空位的 job (其他磁盘上的 job 不会被排在前面的 job 挡住)
+            ready = None
+            if not max_jobs or running[0] < max_jobs:
+                ready = next(
+                    (
+                        item
+                        for item in pending
+                        if all(d.active < d.limit for d in item[1][0])
+                    ),
+                    None,
+                )
+            if ready is None:
+                condition.wait()
+                continue
+            pending.remove(ready)
+            job, (used, reads, writes) = ready
+            for device in used:
+                device.acquire()
+            running[0] += 1
+            thread = threading.Thread(target=worker, args=(job, used, reads, writes))
+            thread.start()
+            threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+    return list(devices.values())
+
+
+def print_report(devices):
+    """Prints bytes moved and achieved MB/s per device."""
+    for device in devices:
+        if not device.busy_seconds:
+            continue
+        total_mb = (device.bytes_read + device.bytes_written) / (1024 * 1024)
+        print(
+            f"💽 {device.label}: read {device.bytes_read / (1024 * 1024):.0f} MB, "
+            f"wrote {device.bytes_written / (1024 * 1024):.0f} MB "
+            f"in {device.busy_seconds:.1f}s busy -> {device.throughput():.1f} MB/s "
+            f"({total_mb:.0f} MB, limit {device.limit})"
+        )
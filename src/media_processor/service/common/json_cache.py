@@ -0,0 +1,117 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from media_processor.constant.constant import CACHE_DIR
+
+"""
+JSON Cache:
+A small persistent key/value store (one JSON file per cache) for analysis results
+that are expensive to recompute (ffprobe, loudness, scene cuts, ...).
+Entries are keyed by file fingerprint, so a modified or replaced file is re-analysed.
+Writes are coalesced (at most one save per SAVE_INTERVAL seconds, plus a final flush
+at exit) so indexing thousands of files doesn't rewrite the file thousands of times.
+"""
+
+SAVE_INTERVAL = 2.0
+
+# 临时副本 -> 原文件 (例如 staging 复制到本地盘的输入)，指纹按原文件路径计算
+_aliases = {}
+
+
+def file_fingerprint(path):
+    """Builds a cheap identity for a file from its path, size and mtime.
+
+    Args:
+        path (Path): Path to the file.
+
+    Returns:
+        str: Hex digest identifying this version of the file.
+    """
+    path = Path(path).resolve()
+    st = path.stat()
+    raw = f"{_aliases.get(path, path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def alias_fingerprint(copy, original):
+    """Makes `file_fingerprint(copy)` match `original` while the copy exists.
+
+    The copy must keep the original's size and mtime (`shutil.copy2`), so cached
+    analysis results and resume checkpoints of the original stay valid.
+    """
+    _aliases[Path(copy).resolve()] = Path(original).resolve()
+
+
+def drop_alias(copy):
+    """Forgets an alias registered with `alias_fingerprint`."""
+    _aliases.pop(Path(copy).resolve(), None)
+
+
+class JsonCache:
+    """Thread-safe dict persisted to `<CACHE_DIR>/<name>.json`."""
+
+    def __init__(self, name, cache_dir=None):
+        self.path = Path(cache_dir or CACHE_DIR) / f"{name}.json"
+        self._lock = threading.Lock()
+        self._data = None
+        self._dirty = False
+        self._last_save = 0.0
+        atexit.register(self.flush)
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._data = {}
+        return self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._load().get(key, default)
+
+    def set(self, key, value):
+        """Stores a value; the cache file is written atomically (coalesced)."""
+        with self._lock:
+            self._load()[key] = value
+            self._mark_dirty()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._load().pop(key, default)
+            self._mark_dirty()
+            return value
+
+    def items(self):
+        with self._lock:
+            return list(self._load().items())
+
+    def flush(self):
+        """Writes pending changes to disk."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self._save()
+
+    def _save(self):
+        self._dirty = False
+        self._last_save = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # 缓存写失败不影响主流程
+            print(f"⚠️  Failed to write cache {self.path.name}: {e}")
@@ -0,0 +1,270 @@
+import contextlib
+import os
+import threading
+import time
+from pathlib import Path
+
+from media_processor.constant.constant import METRICS_FLUSH_SECONDS, METRICS_HOST
+
+"""
+Metrics (opt-in, Prometheus text format):
+无人值守的编码节点上，唯一的输出是带 emoji 的 print，没法告警。
+启用后 (run --metrics-file / --metrics-port) 在进程内累计计数器与仪表:
+- job: 排队 / 运行中 / 完成 / 失败 (按 task)
+- 编码: 最近一次的实时倍率 (媒体秒数 / 墙钟秒数)，以及两者的累计值 (rate 之比即吞吐)
+- 读写字节数、ffmpeg 退出码 (按阶段)、各阶段耗时 (来自 profiler.span)
+输出方式二选一或同时:
+- textfile: 定期原子写入 `.prom` 文件，交给 node_exporter 的 textfile collector；
+- HTTP: 本机端口上的 `/metrics`，Prometheus 直接抓取。
+未启用时所有记录函数只有一次布尔判断的开销。
+"""
+
+PREFIX = "media_processor"
+
+# 名称 -> (类型, 说明, 标签)
+METRICS = {
+    "jobs_queued": ("gauge", "Jobs waiting to run.", ("task",)),
+    "jobs_running": ("gauge", "Jobs currently running.", ("task",)),
+    "jobs_completed_total": (
+        "counter",
+        "Finished jobs by outcome (done / failed).",
+        ("task", "status"),
+    ),
+    "encode_realtime_factor": (
+        "gauge",
+        "Media seconds encoded per wall second, last encode.",
+        ("task",),
+    ),
+    "encoded_media_seconds_total": (
+        "counter",
+        "Media duration encoded.",
+        ("task",),
+    ),
+    "encode_seconds_total": ("counter", "Wall time spent encoding.", ("task",)),
+    "bytes_read_total": ("counter", "Input bytes of finished jobs.", ("task",)),
+    "bytes_written_total": ("counter", "Output bytes of finished jobs.", ("task",)),
+    "ffmpeg_exits_total": (
+        "counter",
+        "ffmpeg runs by stage and exit code.",
+        ("task", "stage", "code"),
+    ),
+    "stage_seconds_total": ("counter", "Time spent per stage.", ("task", "stage")),
+    "stage_runs_total": ("counter", "Completed runs per stage.", ("task", "stage")),
+    "start_time_seconds": ("gauge", "Unix time the batch started.", ("task",)),
+}
+
+_enabled = False
+_task = ""
+_values = {}
+_lock = threading.Lock()
+_textfile = None
+_server = None
+_stop = threading.Event()
+_flusher = None
+
+
+def is_enabled():
+    return _enabled
+
+
+def _add(name, value, *labels, replace=False):
+    key = (name, (_task,) + labels)
+    with _lock:
+        _values[key] = value if replace else _values.get(key, 0) + value
+
+
+def render():
+    """Renders all recorded values in the Prometheus text exposition format."""
+    with _lock:
+        values = dict(_values)
+    lines = []
+    for name, (kind, help_text, label_names) in METRICS.items():
+        samples = sorted((k[1], v) for k, v in values.items() if k[0] == name)
+        if not samples:
+            continue
+        full_name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in samples:
+            pairs = ",".join(
+                f'{key}="{_escape(label)}"' for key, label in zip(label_names, labels)
+            )
+            lines.append(f"{full_name}{{{pairs}}} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format(value):
+    # 字节数等大整数不能用 %g (会丢精度)
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_textfile(path):
+    """Atomically writes the current values (the collector never reads half a file)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(render(), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def serve(port, host=METRICS_HOST):
+    """Starts a background HTTP server answering `GET /metrics`.
+
+    Returns:
+        ThreadingHTTPServer: The running server (`shutdown()` to stop it).
+    """
+    # 按需 import: profiler 会 import 本模块，不能拖慢启动
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header(
+                "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 不往批处理日志里刷访问记录
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _flush_loop():
+    while not _stop.wait(METRICS_FLUSH_SECONDS):
+        try:
+            write_textfile(_textfile)
+        except OSError as e:
+            print(f"⚠️  Failed to write metrics: {e}")
+
+
+def enable(task, textfile=None, port=None):
+    """Turns metrics on for the rest of the process.
+
+    Args:
+        task (str): Task name, used as the `task` label of every metric.
+        textfile (Path, optional): `.prom` file rewritten every
+            `METRICS_FLUSH_SECONDS` (node_exporter textfile collector).
+        port (int, optional): Serve `/metrics` on `METRICS_HOST:port`.
+    """
+    global _enabled, _task, _textfile, _server, _flusher
+    _enabled = True
+    _task = task
+    _add("start_time_seconds", time.time(), replace=True)
+    # 没有 job 时也导出 0，告警规则不会因为缺少序列而失效
+    for name, labels in (
+        ("jobs_queued", ()),
+        ("jobs_running", ()),
+        ("jobs_completed_total", ("done",)),
+        ("jobs_completed_total", ("failed",)),
+    ):
+        _add(name, 0, *labels)
+
+    if textfile:
+        _textfile = Path(textfile)
+        write_textfile(_textfile)
+        _stop.clear()
+        _flusher = threading.Thread(target=_flush_loop, daemon=True)
+        _flusher.start()
+        print(f"📈 Metrics: {_textfile} (every {METRICS_FLUSH_SECONDS}s)")
+    if port:
+        _server = serve(port)
+        host, bound_port = _server.server_address[:2]
+        print(f"📈 Metrics: http://{host}:{bound_port}/metrics")
+
+
+def shutdown():
+    """Writes the final values and stops the exporters."""
+    global _server, _flusher
+    _stop.set()
+    if _flusher is not None:
+        _flusher.join()
+        _flusher = None
+    if _textfile is not None:
+        try:
+            write_textfile(_textfile)
+        except OSError as e:
+            print(f"⚠️  Failed to write metrics: {e}")
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+# --- 记录 (未启用时直接返回) ---
+
+
+def jobs_queued(count):
+    """Adds `count` jobs to the queue gauge."""
+    if _enabled and count:
+        _add("jobs_queued", count)
+
+
+@contextlib.contextmanager
+def job():
+    """Tracks one queued job while it runs.
+
+    Yields:
+        dict: Set `["success"] = False` if the job failed without raising
+            (processors report most ffmpeg failures by printing).
+    """
+    if not _enabled:
+        yield {}
+        return
+
+    state = {"success": True}
+    _add("jobs_queued", -1)
+    _add("jobs_running", 1)
+    try:
+        yield state
+    except BaseException:
+        state["success"] = False
+        raise
+    finally:
+        _add("jobs_running", -1)
+        status = "done" if state["success"] else "failed"
+        _add("jobs_completed_total", 1, status)
+
+
+def observe_encode(media_seconds, wall_seconds):
+    """Records one finished encode (realtime factor = media / wall seconds)."""
+    if not _enabled or wall_seconds <= 0:
+        return
+    if media_seconds:
+        _add("encode_realtime_factor", media_seconds / wall_seconds, replace=True)
+        _add("encoded_media_seconds_total", media_seconds)
+    _add("encode_seconds_total", wall_seconds)
+
+
+def add_bytes(read=0, written=0):
+    """Counts input / output bytes of a finished job."""
+    if _enabled:
+        _add("bytes_read_total", read)
+        _add("bytes_written_total", written)
+
+
+def observe_ffmpeg(stage, returncode):
+    """Counts one ffmpeg run by stage and exit code."""
+    if _enabled:
+        _add("ffmpeg_exits_total", 1, stage, str(returncode))
+
+
+def observe_stage(stage, seconds):
+    """Adds the duration of one stage (fed by `profiler.span`)."""
+    if _enabled:
+        _add("stage_seconds_total", seconds, stage)
+        _add("stage_runs_total", 1, stage)
@@ -0,0 +1,219 @@
+import datetime
+import json
+import os
+import socket
+import statistics
+from pathlib import Path
+
+from media_processor.constant.constant import PERF_HISTORY_FILE
+
+"""
+Performance History:
+Every successful encode appends one JSON line with the realtime speed factor
+(media seconds / wall seconds) and the settings that produced it.
+The history is used to estimate batch ETAs and to compare settings over time.
+
+Speed lookup falls back from the most specific match to the most general one:
+  host + input(codec, height) + encoder settings  ->  host + encoder settings
+  ->  host + encoder  ->  any host + encoder
+"""
+
+# 设置字段 (用于匹配与报表)
+SETTING_FIELDS = ("encoder", "preset", "crf", "filters")
+
+MATCH_LEVELS = [
+    ("host", "codec", "height") + SETTING_FIELDS,
+    ("host",) + SETTING_FIELDS,
+    ("host", "encoder"),
+    ("encoder",),
+]
+
+
+def _flatten(record):
+    """Flattens a history record into the fields used for matching."""
+    settings = record.get("settings", {})
+    source = record.get("input", {})
+    return {
+        "host": record.get("host"),
+        "codec": source.get("codec"),
+        "height": source.get("height"),
+        "encoder": settings.get("encoder"),
+        "preset": settings.get("preset"),
+        "crf": settings.get("crf"),
+        "filters": ",".join(settings.get("filters", [])),
+    }
+
+
+def record_run(input_info, settings, media_duration, wall_time, history_file=None):
+    """Appends one encode result to the history file.
+
+    Args:
+        input_info (dict): Probe result of the source (codec, width, height).
+        settings (dict): Encoder settings (encoder, preset, crf, filters, ...).
+        media_duration (float): Seconds of media that were encoded.
+        wall_time (float): Wall-clock seconds the encode took.
+        history_file (Path, optional): Override for the history file location.
+    """
+    if media_duration <= 0 or wall_time <= 0:
+        return
+
+    entry = {
+        "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": socket.gethostname(),
+        "cpu_count": os.cpu_count(),
+        "input": {
+            "codec": input_info.get("codec", ""),
+            "width": input_info.get("width", 0),
+            "height": input_info.get("height", 0),
+        },
+        "settings": settings,
+        "media_duration": round(media_duration, 3),
+        "wall_time": round(wall_time, 3),
+        "speed": round(media_duration / wall_time, 4),
+    }
+
+    path = Path(history_file or PERF_HISTORY_FILE)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"⚠️  Failed to record performance history: {e}")
+
+
+def load_records(history_file=None):
+    """Loads all history records (malformed lines are ignored)."""
+    path = Path(history_file or PERF_HISTORY_FILE)
+    if not path.exists():
+        return []
+
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def estimate_speed(records, input_info, settings, host=None):
+    """Estimates the realtime speed factor for a job from history.
+
+    Args:
+        records (list[dict]): History records.
+        input_info (dict): Probe result of the source.
+        settings (dict): Encoder settings of the planned job.
+        host (str, optional): Host name. Defaults to the current host.
+
+    Returns:
+        float | None: Median speed of the most specific matching group, or None.
+    """
+    target = _flatten(
+        {
+            "host": host or socket.gethostname(),
+            "input": input_info,
+            "settings": settings,
+        }
+    )
+    flat_records = [(_flatten(r), r["speed"]) for r in records if r.get("speed")]
+
+    for fields in MATCH_LEVELS:
+        speeds = [
+            speed
+            for flat, speed in flat_records
+            if all(flat[k] == target[k] for k in fields)
+        ]
+        if speeds:
+            return statistics.median(speeds)
+    return None
+
+
+def estimate_batch(jobs, history_file=None):
+    """Estimates the total wall time of a batch.
+
+    Args:
+        jobs (list[tuple[dict, dict, float]]): (input_info, settings, media_duration) per job.
+        history_file (Path, optional): Override for the history file location.
+
+    Returns:
+        tuple[float, int]: (estimated seconds for jobs with history, jobs without history).
+    """
+    records = load_records(history_file)
+    total = 0.0
+    unknown = 0
+    for input_info, settings, media_duration in jobs:
+        speed = estimate_speed(records, input_info, settings)
+        if speed and media_duration > 0:
+            total += media_duration / speed
+        else:
+            unknown += 1
+    return total, unknown
+
+
+def build_report(records, by="compatibility_mode", period="week"):
+    """Groups history by a setting and a time period.
+
+    Args:
+        records (list[dict]): History records.
+        by (str): Setting (or flattened field such as `host`, `height`) to group by.
+        period (str): "day", "week" or "month".
+
+    Returns:
+        list[dict]: Rows sorted by period then value, with run count, median speed
+            and total media hours.
+    """
+    groups = {}
+    for r in records:
+        if not r.get("speed"):
+            continue
+        value = r.get("settings", {}).get(by, _flatten(r).get(by))
+        if isinstance(value, list):
+            value = ",".join(value)
+        ts = datetime.datetime.fromisoformat(r["ts"])
+        if period == "day":
+            bucket = ts.strftime("%Y-%m-%d")
+        elif period == "month":
+            bucket = ts.strftime("%Y-%m")
+        else:
+            year, week, _ = ts.isocalendar()
+            bucket = f"{year}-W{week:02d}"
+        groups.setdefault((bucket, str(value)), []).append(r)
+
+    rows = []
+    for (bucket, value), items in sorted(groups.items()):
+        rows.append(
+            {
+                "period": bucket,
+                "value": value,
+                "runs": len(items),
+                "median_speed": statistics.median(i["speed"] for i in items),
+                "media_hours": sum(i["media_duration"] for i in items) / 3600,
+            }
+        )
+    return rows
+
+
+def format_report(rows, by):
+    """Renders report rows as a plain-text table."""
+    if not rows:
+        return "No performance history recorded yet."
+
+    header = f"{'Period':<10} {by:<24} {'Runs':>5} {'Speed(x)':>9} {'Media(h)':>9}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['period']:<10} {row['value']:<24} {row['runs']:>5} "
+            f"{row['median_speed']:>9.2f} {row['media_hours']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def format_eta(seconds):
+    """Formats seconds as `1h 02m 03s`."""
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    if h:
+        return f"{h}h {m:02d}m {s:02d}s"
+    return f"{m}m {s:02d}s"
@@ -0,0 +1,80 @@
+import json
+import subprocess
+from pathlib import Path
+
+from media_processor.service.common import profiler
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+
+"""
+Media Probe:
+ffprobe wrapper returning the basic facts we plan around
+(duration, first video stream resolution/codec), cached per file fingerprint.
+"""
+
+_cache = JsonCache("probe")
+
+
+def _run_ffprobe(file_path):
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=codec_name,width,height:format=duration,start_time",
+        "-of",
+        "json",
+        str(file_path),
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
+    data = json.loads(result.stdout or "{}")
+
+    streams = data.get("streams") or [{}]
+    stream = streams[0]
+    duration = data.get("format", {}).get("duration")
+    start_time = data.get("format", {}).get("start_time")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else 0.0,
+        # 容器起始时间 (MPEG-TS / 相机录像常不为 0)，ffmpeg -ss 相对于它
+        "start_time": float(start_time) if start_time not in (None, "N/A") else 0.0,
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "codec": stream.get("codec_name") or "",
+    }
+
+
+def probe_media(file_path):
+    """Probes a media file (cached).
+
+    Args:
+        file_path (Path): Path to the media file.
+
+    Returns:
+        dict: {"duration", "start_time", "width", "height", "codec"}. Empty dict if
+            probing failed.
+    """
+    try:
+        key = file_fingerprint(file_path)
+    except OSError:
+        return {}
+
+    cached = _cache.get(key)
+    # 旧缓存条目没有 start_time，重新探测
+    if cached is not None and "start_time" in cached:
+        return cached
+
+    try:
+        with profiler.span("probe", file=Path(file_path).name):
+            info = _run_ffprobe(file_path)
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        print(f"⚠️  ffprobe failed for {file_path}: {e}")
+        return {}
+
+    _cache.set(key, info)
+    return info
+
+
+def get_duration(file_path):
+    """Returns the media duration in seconds (0.0 if unknown)."""
+    return probe_media(file_path).get("duration", 0.0)
@@ -0,0 +1,306 @@
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from media_processor.service.common import metrics
+
+"""
+Profiler (opt-in):
+把一次批处理拆成分层的计时区间 (span)：目录遍历 / ffprobe / 编码 / 重命名 / 删除源文件 ...
+ffmpeg 内部的耗时通过 -benchmark_all 拿到 (decode / encode / mux 各阶段的 user/sys/real)，
+挂在对应的 ffmpeg span 下面。
+
+结果导出为 Chrome Trace Event JSON (chrome://tracing、Perfetto、speedscope 都能直接打开)。
+启用 metrics 时 span 的耗时与 ffmpeg 退出码也计入 metrics (不需要同时开启 profile)。
+两者都未启用时 span() 和 run_ffmpeg() 只有布尔判断的开销。
+"""
+
+# ffmpeg -benchmark_all: "bench:     1234 user       56 sys     1300 real decode_video 0.0"
+BENCH_STEP_RE = re.compile(r"bench:\s+(\d+) user\s+(\d+) sys\s+(\d+) real (\S+)")
+# 结束时的汇总: "bench: utime=1.234s stime=0.056s rtime=1.300s" / "bench: maxrss=123456KiB"
+BENCH_TOTAL_RE = re.compile(r"bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s")
+BENCH_MAXRSS_RE = re.compile(r"bench: maxrss=(\d+)KiB")
+
+# ffmpeg 内部阶段放在单独的轨道上 (汇总值，多线程时之和可能大于 wall time)
+BENCH_TID = 0
+
+_enabled = False
+_events = []
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+def enable():
+    """Turns profiling on for the rest of the process."""
+    global _enabled, _origin
+    _enabled = True
+    _origin = time.perf_counter()
+
+
+def is_enabled():
+    return _enabled
+
+
+def _now_us():
+    return (time.perf_counter() - _origin) * 1e6
+
+
+def _add_event(name, start_us, duration_us, args=None, tid=None, cat="stage"):
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": round(start_us, 1),
+        "dur": round(duration_us, 1),
+        "pid": os.getpid(),
+        "tid": threading.get_ident() if tid is None else tid,
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    """Times a block as a named stage (no-op unless profiling is enabled).
+
+    Args:
+        name (str): Stage name, e.g. "walk", "probe", "encode", "rename", "delete".
+        **args: Extra details shown in the viewer (file names etc.).
+
+    Yields:
+        dict: Mutable args dict, to attach results discovered inside the block.
+    """
+    if not _enabled and not metrics.is_enabled():
+        yield args
+        return
+
+    start = _now_us()
+    try:
+        yield args
+    finally:
+        duration = _now_us() - start
+        if _enabled:
+            _add_event(name, start, duration, {k: str(v) for k, v in args.items()})
+        metrics.observe_stage(name, duration / 1e6)
+
+
+class BenchParser:
+    """Accumulates `-benchmark_all` numbers one stderr line at a time."""
+
+    def __init__(self):
+        self.steps = defaultdict(lambda: {"user": 0, "sys": 0, "real": 0, "count": 0})
+        self.totals = {}
+
+    def feed(self, line):
+        match = BENCH_STEP_RE.search(line)
+        if match:
+            user, sys_, real, task = match.groups()
+            step = self.steps[task]
+            step["user"] += int(user)
+            step["sys"] += int(sys_)
+            step["real"] += int(real)
+            step["count"] += 1
+            return
+        match = BENCH_TOTAL_RE.search(line)
+        if match:
+            self.totals.update(
+                zip(("utime", "stime", "rtime"), (float(v) for v in match.groups()))
+            )
+            return
+        match = BENCH_MAXRSS_RE.search(line)
+        if match:
+            self.totals["maxrss_kib"] = int(match.group(1))
+
+    def result(self):
+        return dict(self.steps), self.totals
+
+
+def parse_bench(stderr):
+    """Parses `-benchmark_all` output.
+
+    Args:
+        stderr (str): ffmpeg stderr.
+
+    Returns:
+        tuple[dict, dict]: Per task real/user/sys microseconds (e.g. "decode_video"),
+            and the run totals (utime/stime/rtime seconds, maxrss KiB).
+    """
+    parser = BenchParser()
+    for line in stderr.splitlines():
+        parser.feed(line)
+    return parser.result()
+
+
+def _iter_lines(stream, chunk_size=65536):
+    """Yields decoded lines of a binary pipe as they arrive.
+
+    `-stats` 进度行用 \r 覆盖刷新，也按行切开，否则几小时的编码会拼成一个巨大的行。
+    """
+    pending = b""
+    for chunk in iter(lambda: stream.read1(chunk_size), b""):
+        pending += chunk
+        parts = re.split(rb"[\r\n]", pending)
+        pending = parts.pop()
+        for part in parts:
+            if part:
+                yield part.decode("utf-8", errors="replace")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+
+def _write_stdin(process, data):
+    try:
+        process.stdin.write(data)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass  # ffmpeg 提前退出，错误由退出码体现
+
+
+def _profiled_cmd(cmd):
+    """Adds -benchmark_all and raises the log level so bench lines are printed."""
+    cmd = list(cmd)
+    if "-loglevel" in cmd:
+        i = cmd.index("-loglevel")
+        cmd[i + 1] = "level+info"
+    else:
+        cmd[1:1] = ["-loglevel", "level+info"]
+    cmd[1:1] = ["-benchmark_all"]
+    return cmd
+
+
+def run_ffmpeg(cmd, name="ffmpeg", **kwargs):
+    """Runs a full ffmpeg command line (`check=True`), profiled when enabled.
+
+    When profiling, stderr is consumed to collect the bench numbers; warnings and
+    errors are still echoed, but the `-stats` progress line is not.
+
+    Args:
+        cmd (list[str]): Full command, starting with "ffmpeg".
+        name (str): Span name.
+        **kwargs: Passed to `subprocess.run` (`subprocess.Popen` when profiling),
+            e.g. `input=` bytes for stdin (ignored keys: check, stderr, text).
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg exits non-zero.
+    """
+    if not _enabled:
+        with span(name):
+            try:
+                result = subprocess.run(cmd, check=True, **kwargs)
+            except subprocess.CalledProcessError as e:
+                metrics.observe_ffmpeg(name, e.returncode)
+                raise
+        metrics.observe_ffmpeg(name, 0)
+        return result
+
+    for key in ("check", "stderr", "text"):
+        kwargs.pop(key, None)
+
+    with span(name, output=Path(cmd[-1]).name) as args:
+        start = _now_us()
+        # 不用 text=True: 调用方可能通过 input= 传入 bytes
+        stdin_data = kwargs.pop("input", None)
+        if stdin_data is not None:
+            kwargs["stdin"] = subprocess.PIPE
+        process = subprocess.Popen(_profiled_cmd(cmd), stderr=subprocess.PIPE, **kwargs)
+        feeder = None
+        if stdin_data is not None:
+            # 另起线程写 stdin，避免和读 stderr 互相阻塞
+            feeder = threading.Thread(
+                target=_write_stdin, args=(process, stdin_data), daemon=True
+            )
+            feeder.start()
+
+        # 逐行解析: -benchmark_all 每帧每阶段一行，长编码的 stderr 不能整体缓存
+        parser = BenchParser()
+        with process:
+            for line in _iter_lines(process.stderr):
+                if "[warning]" in line or "[error]" in line or "[fatal]" in line:
+                    print(line, file=sys.stderr)
+                parser.feed(line)
+            returncode = process.wait()
+            if feeder is not None:
+                feeder.join()
+
+        steps, totals = parser.result()
+        args.update(totals)
+        args["exit_code"] = returncode
+        metrics.observe_ffmpeg(name, returncode)
+
+        # 各阶段汇总依次排在 bench 轨道上
+        offset = start
+        for task, step in sorted(steps.items(), key=lambda kv: -kv[1]["real"]):
+            _add_event(
+                task,
+                offset,
+                step["real"],
+                {
+                    "user_us": step["user"],
+                    "sys_us": step["sys"],
+                    "calls": step["count"],
+                },
+                tid=BENCH_TID,
+                cat="ffmpeg",
+            )
+            offset += step["real"]
+
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd)
+        return subprocess.CompletedProcess(cmd, returncode)
+
+
+def summarize():
+    """Aggregates recorded stages: {name: (total seconds, count)}, slowest first."""
+    totals = defaultdict(lambda: [0.0, 0])
+    with _lock:
+        for event in _events:
+            if event["cat"] != "stage":
+                continue
+            totals[event["name"]][0] += event["dur"] / 1e6
+            totals[event["name"]][1] += 1
+    return dict(sorted(totals.items(), key=lambda kv: -kv[1][0]))
+
+
+def export(path):
+    """Writes the Chrome trace JSON and prints a per-stage summary.
+
+    Args:
+        path (Path): Destination `.json` file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+    metadata = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": "media_processor"},
+        },
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": BENCH_TID,
+            "args": {"name": "ffmpeg -benchmark_all (summed)"},
+        },
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, indent=1
+        )
+
+    print(f"\n⏱️  Profile ({len(events)} spans) -> {path}")
+    for name, (seconds, count) in summarize().items():
+        print(f"   {name:<12} {seconds:9.2f}s  x{count}")
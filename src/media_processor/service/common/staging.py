@@ -0,0 +1,264 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from media_processor.constant.constant import STAGING_PREFETCH
+from media_processor.constant.extensions import SUBTITLE_EXTENSIONS
+from media_processor.service.common import json_cache
+
+"""
+Scratch Staging (network-mounted inputs):
+源文件在 NAS 上时，ffmpeg 直接通过 NFS 读取，网络一卡编码就跟着停；
+`_processing` 输出写回 NFS 也很慢。这里把 I/O 挪到本地暂存盘:
+- 后台线程按队列顺序把接下来的 N 个输入 (连同同名字幕) 复制到 `<scratch>/in/`，
+  当前文件编码时下一个已经在本地；
+- 编码输出写到 `<scratch>/out/`，完成后由另一个线程异步搬运到正式输出目录
+  (先写 `.name.staging` 再 rename，输出目录里不会出现半个文件)；
+- 占用有上限: 每个输入预留 "输入大小 × 2" (副本 + 输出估算)，放不下就等前面的
+  job 释放，单个文件超过上限则不暂存、直接读写原路径；
+- 编码失败时清理本地产物，源文件只在输出搬运成功后才会被删除。
+暂存路径按源/输出路径哈希固定，resumable 模式的分段在重跑时仍能续上；
+副本的文件指纹按源文件计算，分析缓存与 resumable 检查点在暂存与否之间通用。
+"""
+
+
+def _slot(path):
+    """Stable directory name for a path (same source -> same scratch location)."""
+    return hashlib.sha1(str(Path(path).resolve()).encode("utf-8")).hexdigest()[:12]
+
+
+def _size(path):
+    """Bytes of a file, or of everything under a directory."""
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def sidecars(source):
+    """Sidecar subtitles of a video (they must travel with the staged copy)."""
+    source = Path(source)
+    candidates = [source.with_suffix(ext) for ext in SUBTITLE_EXTENSIONS]
+    return [p for p in candidates if p.exists()]
+
+
+def _copy(src, dst):
+    """Copies via a `.partial` name so an interrupted copy never looks complete."""
+    partial = dst.with_name(f"{dst.name}.partial")
+    shutil.copy2(src, partial)  # 保留 mtime: 副本的指纹别名到源文件 (见 _prefetch_loop)
+    os.replace(partial, dst)
+
+
+class Stager:
+    """Prefetches inputs into a local scratch directory and publishes outputs back.
+
+    Usage: `schedule(sources)` once, then per source `acquire` -> encode into
+    `output_dir_for(...)` -> `finish`. `close()` waits for pending moves.
+    """
+
+    def __init__(self, scratch_dir, budget_bytes, prefetch=STAGING_PREFETCH):
+        self.root = Path(scratch_dir).expanduser().resolve()
+        self.inputs_dir = self.root / "in"
+        self.outputs_dir = self.root / "out"
+        self.budget = budget_bytes
+        self.prefetch = max(1, int(prefetch))
+        self.used = 0
+        self._condition = threading.Condition()
+        self._items = {}
+        self._queue = []
+        self._ready = 0
+        self._closed = False
+        self._worker = None
+        self._mover = ThreadPoolExecutor(max_workers=1)
+        self._moves = []
+
+        # in/ 只是副本，上次中断留下的直接清掉；out/ 里可能有未搬运的成品或分段，保留
+        shutil.rmtree(self.inputs_dir, ignore_errors=True)
+        self.inputs_dir.mkdir(parents=True, exist_ok=True)
+        self.outputs_dir.mkdir(parents=True, exist_ok=True)
+
+    def schedule(self, sources):
+        """Queues sources for prefetching, in the order they will be acquired."""
+        with self._condition:
+            for source in sources:
+                source = Path(source).resolve()
+                if source in self._items:
+                    continue
+                files = [source] + sidecars(source)
+                size = sum(f.stat().st_size for f in files)
+                self._items[source] = {
+                    "state": "queued",
+                    "files": files,
+                    "size": size,
+                    "staged": self.inputs_dir / _slot(source) / source.name,
+                    # 副本 + 输出估算 (转码结果很少比源文件大)
+                    "reserved": 2 * size,
+                }
+                self._queue.append(source)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._prefetch_loop, daemon=True)
+                self._worker.start()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._condition:
+                if self._closed or not self._queue:
+                    return
+                source = self._queue.pop(0)
+                item = self._items[source]
+                if item["reserved"] > self.budget:
+                    print(f"⚠️  Too large for scratch, reading in place: {source}")
+                    item["state"] = "bypass"
+                    self._condition.notify_all()
+                    continue
+                while not self._closed and (
+                    self._ready >= self.prefetch
+                    or self.used + item["reserved"] > self.budget
+                ):
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self.used += item["reserved"]
+                item["state"] = "copying"
+
+            start = time.perf_counter()
+            staged = item["staged"]
+            try:
+                staged.parent.mkdir(parents=True, exist_ok=True)
+                for f in item["files"]:
+                    _copy(f, staged.with_name(f.name))
+            except OSError as e:
+                print(f"⚠️  Staging failed, reading in place: {source.name} ({e})")
+                shutil.rmtree(staged.parent, ignore_errors=True)
+                with self._condition:
+                    self.used -= item["reserved"]
+                    item["state"] = "bypass"
+                    self._condition.notify_all()
+                continue
+
+            elapsed = max(time.perf_counter() - start, 1e-6)
+            size_mb = item["size"] / (1024 * 1024)
+            rate = size_mb / elapsed
+            print(f"📥 Staged {source.name} ({size_mb:.0f} MB, {rate:.1f} MB/s)")
+            # 指纹包含路径: 副本按源文件计算，probe / idet / cropdetect 缓存照常命中
+            json_cache.alias_fingerprint(staged, source)
+            with self._condition:
+                item["state"] = "ready"
+                self._ready += 1
+                self._condition.notify_all()
+
+    def acquire(self, source):
+        """Waits for the staged copy of a source.
+
+        Returns:
+            Path | None: Local copy, or None if the source must be read in place
+                (not scheduled, larger than the budget, or the copy failed).
+        """
+        with self._condition:
+            item = self._items.get(Path(source).resolve())
+            if item is None:
+                return None
+            while item["state"] in ("queued", "copying"):
+                self._condition.wait()
+            if item["state"] != "ready":
+                return None
+            item["state"] = "acquired"
+            self._ready -= 1
+            self._condition.notify_all()
+            return item["staged"]
+
+    def output_dir_for(self, output_path):
+        """Local directory the outputs of one job are written to before publishing."""
+        local_dir = self.outputs_dir / _slot(output_path)
+        local_dir.mkdir(parents=True, exist_ok=True)
+        return local_dir
+
+    def finish(
+        self, source, local_dir, target_dir, success, keep=(), on_published=None
+    ):
+        """Releases the staged input and publishes (or discards) the local outputs.
+
+        Args:
+            source (Path): Source passed to `acquire`.
+            local_dir (Path): Result of `output_dir_for`.
+            target_dir (Path): Final output directory.
+            success (bool): Whether the encode produced its outputs.
+            keep (list[str]): Names in `local_dir` to keep on failure (resume segments).
+            on_published (callable, optional): Called after every output was moved
+                (e.g. deleting the source); not called if the move fails.
+        """
+        item = self._items[Path(source).resolve()]
+        json_cache.drop_alias(item["staged"])
+        shutil.rmtree(item["staged"].parent, ignore_errors=True)
+
+        if not success:
+            for entry in local_dir.iterdir():
+                if entry.name in keep:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink(missing_ok=True)
+            with self._condition:
+                self.used -= item["reserved"]
+                self._condition.notify_all()
+            return
+
+        # 预留换成输出的实际大小，直到搬运完成
+        actual = _size(local_dir)
+        with self._condition:
+            self.used += actual - item["reserved"]
+            item["reserved"] = actual
+            self._condition.notify_all()
+        self._moves.append(
+            self._mover.submit(
+                self._publish, local_dir, Path(target_dir), actual, on_published
+            )
+        )
+
+    def _publish(self, local_dir, target_dir, size, on_published):
+        start = time.perf_counter()
+        try:
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for entry in sorted(local_dir.iterdir()):
+                if entry.name.startswith("."):
+                    continue
+                staging = target_dir / f".{entry.name}.staging"
+                if staging.is_dir():
+                    shutil.rmtree(staging)
+                elif staging.exists():
+                    staging.unlink()
+                shutil.move(str(entry), str(staging))
+                os.replace(staging, target_dir / entry.name)
+            shutil.rmtree(local_dir, ignore_errors=True)
+            elapsed = max(time.perf_counter() - start, 1e-6)
+            size_mb = size / (1024 * 1024)
+            rate = size_mb / elapsed
+            print(f"📤 Moved {size_mb:.0f} MB to {target_dir} ({rate:.1f} MB/s)")
+            if on_published:
+                on_published()
+        except OSError as e:
+            print(f"❌ Failed to move outputs to {target_dir}: {e}")
+            print(f"   Outputs kept in {local_dir}")
+        finally:
+            with self._condition:
+                self.used -= size
+                self._condition.notify_all()
+
+    def close(self):
+        """Stops prefetching, waits for pending moves and removes the input copies."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+        self._mover.shutdown(wait=True)
+        for future in self._moves:
+            future.result()
+        for item in self._items.values():
+            json_cache.drop_alias(item["staged"])
+        shutil.rmtree(self.inputs_dir, ignore_errors=True)
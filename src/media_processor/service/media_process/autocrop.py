@@ -0,0 +1,165 @@
+import re
+import subprocess
+from collections import Counter
+from pathlib import Path
+
+from media_processor.constant.constant import (
+    CROP_CONSENSUS_RATIO,
+    CROP_MIN_RATIO,
+    CROP_SAMPLE_FRAMES,
+    CROP_SAMPLES,
+)
+from media_processor.service.common import probe, profiler
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+from media_processor.service.media_process import interlace
+
+"""
+Auto Crop (cropdetect):
+很多存档视频是 letterbox (上下/左右黑边)，黑边也被缩放、编码，白白浪费算力和码率。
+在片中均匀取几段 (每段 60 帧) 跑 `cropdetect`，每帧独立检测 (reset=1)，
+取出现次数最多的矩形作为共识:
+- 暗场/淡入淡出会让单帧结果偏小，所以共识矩形至少要占一半的有效帧，否则不裁；
+- 裁掉的面积太小 (< 2%) 也不裁；
+- 坐标和宽高都取偶数 (yuv420 色度对齐)。
+结果按文件指纹缓存，`crop=` 放在去隔行之后、缩放之前。
+"""
+
+_cache = JsonCache("autocrop")
+
+CROP_RE = re.compile(r"crop=(-?\d+):(-?\d+):(-?\d+):(-?\d+)")
+
+
+def build_cropdetect_command(input_path, start, frames=CROP_SAMPLE_FRAMES):
+    """ffmpeg arguments running cropdetect on `frames` frames from `start` seconds."""
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-ss",
+        f"{start:.3f}",
+        "-i",
+        str(input_path),
+        "-map",
+        "0:v:0",
+        "-an",
+        "-sn",
+        "-vf",
+        "cropdetect=limit=24:round=2:reset=1",
+        "-frames:v",
+        str(frames),
+        "-f",
+        "null",
+        "-",
+    ]
+
+
+def parse_cropdetect(stderr):
+    """Parses the per-frame rectangles reported by cropdetect.
+
+    Returns:
+        list[tuple[int, int, int, int]]: (w, h, x, y) per frame; empty/black frames
+            (negative sizes) are dropped.
+    """
+    rects = []
+    for match in CROP_RE.finditer(stderr):
+        w, h, x, y = (int(v) for v in match.groups())
+        if w > 0 and h > 0 and x >= 0 and y >= 0:
+            rects.append((w, h, x, y))
+    return rects
+
+
+def consensus(rects, width, height):
+    """Picks the crop rectangle most frames agree on.
+
+    Args:
+        rects (list[tuple]): `parse_cropdetect` results of all samples.
+        width (int): Source width.
+        height (int): Source height.
+
+    Returns:
+        dict | None: {"w", "h", "x", "y"}, or None if there is no stable rectangle
+            or it would remove less than `CROP_MIN_RATIO` of the frame.
+    """
+    if not rects or not width or not height:
+        return None
+    (w, h, x, y), count = Counter(rects).most_common(1)[0]
+    if count / len(rects) < CROP_CONSENSUS_RATIO:
+        return None
+
+    if x + w > width or y + h > height:
+        # 带旋转元数据的竖屏视频: ffmpeg 先自动旋转再进滤镜
+        width, height = height, width
+        if x + w > width or y + h > height:
+            return None
+
+    x, y, w, h = x - x % 2, y - y % 2, w - w % 2, h - h % 2
+    if 1 - (w * h) / (width * height) < CROP_MIN_RATIO:
+        return None
+    return {"w": w, "h": h, "x": x, "y": y}
+
+
+def _key(input_path):
+    try:
+        return file_fingerprint(input_path)
+    except OSError:
+        return None
+
+
+def lookup(input_path):
+    """Returns the cached detection ({"crop", "frames"}), None if not detected yet.
+
+    Used by plans, which must not sample the input (a None crop means no bars).
+    """
+    key = _key(input_path)
+    return _cache.get(key) if key else None
+
+
+def detect(input_path):
+    """Detects the black bars of a video (cached per file fingerprint).
+
+    Returns:
+        dict | None: Crop rectangle (see `consensus`), None if nothing to crop.
+    """
+    key = _key(input_path)
+    cached = _cache.get(key) if key else None
+    if cached is not None:
+        return cached["crop"]
+
+    info = probe.probe_media(input_path)
+    rects = []
+    for start in interlace.sample_starts(info.get("duration", 0.0), CROP_SAMPLES):
+        try:
+            with profiler.span("cropdetect", file=Path(input_path).name):
+                result = subprocess.run(
+                    build_cropdetect_command(input_path, start),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                )
+        except OSError as e:
+            print(f"  ⚠️  Crop detection failed: {e}")
+            return None
+        if result.returncode:
+            print(f"  ⚠️  Crop detection failed: {result.stderr.strip()[-200:]}")
+            return None
+        rects.extend(parse_cropdetect(result.stderr))
+
+    crop = consensus(rects, info.get("width"), info.get("height"))
+    if key:
+        _cache.set(key, {"crop": crop, "frames": len(rects)})
+    return crop
+
+
+def filters_for(crop):
+    """`crop=` filter for a detected rectangle (empty list if nothing to crop)."""
+    if not crop:
+        return []
+    return [f"crop={crop['w']}:{crop['h']}:{crop['x']}:{crop['y']}"]
+
+
+def label(crop, width=None, height=None):
+    """Human readable result, e.g. `1920x1080 -> 1920x800 (+0+140)`."""
+    if not crop:
+        return "no black bars"
+    source = f"{width}x{height} -> " if width and height else ""
+    return f"{source}{crop['w']}x{crop['h']} (+{crop['x']}+{crop['y']})"
@@ -2,6 +2,9 @@ import os
 import subprocess
 from pathlib import Path
 
+from media_processor.service.common import profiler
+from media_processor.service.media_process import scenes
+
 
 # --- 工具函数 ---
 
@@ -32,16 +35,17 @@ def time_to_ms(time_str):
     """Converts a time string to milliseconds.
 
     Args:
-        time_str (str): Time string in 'MM:SS' or 'HH:MM:SS' format.
+        time_str (str): Time string in 'MM:SS' or 'HH:MM:SS' format; seconds may
+            have a fraction ('01:02:03.250', as written by auto chapters).
 
     Returns:
         int: Time in milliseconds.
     """
-    parts = list(map(int, time_str.split(":")))
+    parts = [float(p) for p in str(time_str).split(":")]
     if len(parts) == 2:  # MM:SS
-        return (parts[0] * 60 + parts[1]) * 1000
+        return round((parts[0] * 60 + parts[1]) * 1000)
     elif len(parts) == 3:  # HH:MM:SS
-        return (parts[0] * 3600 + parts[1] * 60 + parts[2]) * 1000
+        return round((parts[0] * 3600 + parts[1] * 60 + parts[2]) * 1000)
     return 0
 
 
@@ -78,13 +82,44 @@ def create_metadata_file(chapters, duration_sec, temp_file_path):
         f.write(content)
 
 
-def inject_chapters(video_path, output_path, chapters):
+def metadata_path_for(input_file):
+    """Returns the temporary FFMETADATA file used for a video.
+
+    每个视频单独一个文件名，同一目录下的视频可以并发处理。
+    """
+    return input_file.with_name(f".{input_file.stem}_ffmetadata.txt")
+
+
+def build_command(input_file, meta_file, output_file):
+    """Builds the stream-copy command that applies a metadata file's chapters.
+
+    Returns:
+        list[str]: Full ffmpeg command.
+    """
+    # -map_metadata 1 表示使用第2个输入流(即txt文件)作为全局元数据
+    return [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-i", str(input_file), # Input 0: 视频
+        "-i", str(meta_file),  # Input 1: 章节信息
+
+        "-map_metadata", "1",  # 使用 Input 1 的全局元数据 (Title等)
+        "-map_chapters", "1",  # 使用 Input 1 的章节信息 (Chapters)
+        "-codec", "copy",  # 直接流拷贝，速度极快，不损画质
+        # 即使是 MP4，有时也需要重新标记一下品牌格式，让 QuickTime 认为它是一个标准文件
+        "-f", "mp4",
+        str(output_file)
+    ]
+
+
+def inject_chapters(video_path, output_path, chapters=None, auto_chapters=None):
     """Injects chapters into a video file.
 
     Args:
         video_path (Path): Path to the input video.
         output_path (Path): Path to the output video.
-        chapters (list): List of (start_time, title) tuples.
+        chapters (list, optional): List of (start_time, title) tuples.
+        auto_chapters (bool | dict, optional): Without `chapters`, detect them from
+            scene cuts (see `scenes.normalize_options`).
     """
     input_file = Path(video_path).resolve()
     output_file = Path(output_path).resolve()
@@ -100,27 +135,23 @@ def inject_chapters(video_path, output_path, chapters):
     if duration == 0:
         return
 
+    if not chapters:
+        options = scenes.normalize_options(auto_chapters)
+        if not options:
+            print(f"⚠️  No chapters configured for: {input_file.name}")
+            return
+        chapters = scenes.build_chapters(input_file, duration, options)
+        print(f"  🎞️  Detected {len(chapters)} chapters from scene cuts")
+
     # 2. 创建临时 metadata 文件
-    meta_file = input_file.parent / "temp_ffmetadata.txt"
+    meta_file = metadata_path_for(input_file)
     create_metadata_file(chapters, duration, meta_file)
 
     # 3. 执行混流 (Stream Mapping)
-    # -map_metadata 1 表示使用第2个输入流(即txt文件)作为全局元数据
-    cmd = [
-        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-        "-i", str(input_file), # Input 0: 视频
-        "-i", str(meta_file),  # Input 1: 章节信息
-
-        "-map_metadata", "1",  # 使用 Input 1 的全局元数据 (Title等)
-        "-map_chapters", "1",  # 使用 Input 1 的章节信息 (Chapters)
-        "-codec", "copy",  # 直接流拷贝，速度极快，不损画质
-        # 即使是 MP4，有时也需要重新标记一下品牌格式，让 QuickTime 认为它是一个标准文件
-        "-f", "mp4",
-        str(output_file)
-    ]
+    cmd = build_command(input_file, meta_file, output_file)
 
     try:
-        subprocess.run(cmd, check=True)
+        profiler.run_ffmpeg(cmd, "remux")
         print(f"✅ Success! Saved to: {output_file.name}")
     except subprocess.CalledProcessError:
         print(f"❌ FFmpeg Error.")
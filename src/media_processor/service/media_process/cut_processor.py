@@ -0,0 +1,430 @@
+import bisect
+import shutil
+import subprocess
+from pathlib import Path
+
+from media_processor.constant.constant import KEYFRAME_SCAN_SECONDS, SMART_CUT_CRF
+from media_processor.service.common import concat, probe, profiler
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+from media_processor.service.media_process import encoders
+from media_processor.service.media_process.chapter_processor import time_to_ms
+from media_processor.service.media_process.scenes import format_time
+
+"""
+Cut (lossless trim):
+从长录像中取一段，不再需要整段重编码:
+- 关键帧索引: ffprobe 只读切点附近的包 (`-read_intervals`，不解码)，
+  按文件指纹缓存已扫描的窗口与关键帧时间，同一文件再切不再读盘；
+- 默认把起点对齐到之前的关键帧，-ss/-t stream copy 输出 (包含请求的整段)；
+- smart cut: 首尾不完整的 GOP 用同一编码格式重编码 (CRF 18)，中间整 GOP 直接复制，
+  以 MPEG-TS 拼接 (参数集随码流携带) 后再封装，起止时间精确到帧。
+  只支持 H.264 / HEVC 且本机有对应软件编码器，否则回退到关键帧对齐。
+"""
+
+_cache = JsonCache("keyframes")
+
+# 对齐到关键帧时的容差 (pts 打印精度)
+EPSILON = 0.001
+
+# 找不到前后关键帧时扩大扫描窗口的次数 (每次 x4)
+KEYFRAME_SCAN_ROUNDS = 4
+
+# 拷贝所有视频/音频/字幕流 (数据流如 GoPro gpmd 多数容器放不下)
+COPY_MAPS = ["-map", "0:v", "-map", "0:a?", "-map", "0:s?"]
+
+
+def parse_time(value):
+    """Parses a range bound: seconds (number) or "MM:SS" / "HH:MM:SS(.mmm)"."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return time_to_ms(value) / 1000
+
+
+def normalize_ranges(ranges):
+    """Parses [[start, end], ...] (end None / "end" = to the end of the file).
+
+    Returns:
+        list[tuple[float, float | None]]: Ranges in seconds.
+
+    Raises:
+        ValueError: If a range ends before it starts.
+    """
+    parsed = []
+    for start, end in ranges:
+        start = parse_time(start)
+        end = None if end in (None, "", "end") else parse_time(end)
+        if end is not None and end <= start:
+            raise ValueError(f"Range ends before it starts: {start}s -> {end}s")
+        parsed.append((start, end))
+    return parsed
+
+
+def output_path_for(source_path, index, output_root=None):
+    """Returns the output of the index-th range (原文件名_cut01.mp4)."""
+    source_path = Path(source_path)
+    name = f"{source_path.stem}_cut{index:02d}{source_path.suffix}"
+    return (Path(output_root) if output_root else source_path.parent) / name
+
+
+def processing_path_for(output_path):
+    """Returns the in-progress name of an output (如 video_cut01_processing.mp4)."""
+    return output_path.with_name(f"{output_path.stem}_processing{output_path.suffix}")
+
+
+# --- Keyframe index ---
+
+
+def build_keyframe_command(video_path, intervals):
+    """ffprobe arguments listing video packets (pts, flags) inside the intervals."""
+    return [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-read_intervals",
+        ",".join(f"{a:.3f}%{b:.3f}" for a, b in intervals),
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-of",
+        "csv=p=0",
+        str(video_path),
+    ]
+
+
+def parse_keyframes(stdout):
+    """Parses `pts_time,flags` lines into sorted keyframe times."""
+    times = set()
+    for line in stdout.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) >= 2 and "K" in fields[1] and fields[0] not in ("", "N/A"):
+            times.add(round(float(fields[0]), 6))
+    return sorted(times)
+
+
+def _covered(windows, start, end):
+    return any(a <= start and end <= b for a, b in windows)
+
+
+def _merge_windows(windows):
+    merged = []
+    for a, b in sorted(windows):
+        if merged and a <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+
+def keyframe_index(video_path, times, window=KEYFRAME_SCAN_SECONDS):
+    """Returns the keyframes around the given times (a partial, cached index).
+
+    Only `window` seconds around each time are read (packets, no decoding); the
+    window grows when the GOP is longer. Scanned windows are cached per file
+    fingerprint, so later cuts of the same file reuse them.
+
+    Packet pts are absolute, while `-ss` is relative to the container start_time
+    (often non-zero for MPEG-TS and camera files), so times are shifted by it.
+
+    Args:
+        video_path (Path): Video file.
+        times (list[float]): Times (from the start of the file) that need their
+            neighbouring keyframes.
+        window (float): Seconds scanned before and after each time.
+
+    Returns:
+        list[float]: Sorted keyframe times relative to the start_time (at least
+            those around `times`).
+    """
+    try:
+        key = file_fingerprint(video_path)
+    except OSError:
+        key = None
+    offset = probe.probe_media(video_path).get("start_time", 0.0)
+    entry = _cache.get(key) if key else None
+    if not entry or entry.get("start_time") != offset:
+        entry = {"windows": [], "keyframes": []}
+    windows = [list(w) for w in entry["windows"]]
+    keyframes = set(entry["keyframes"])
+
+    changed = False
+    for t in times:
+        span = window
+        for _ in range(KEYFRAME_SCAN_ROUNDS):
+            a, b = max(0.0, t - span), t + span
+            if not _covered(windows, a, b):
+                try:
+                    with profiler.span("keyframes", file=Path(video_path).name):
+                        result = subprocess.run(
+                            build_keyframe_command(
+                                video_path, [(a + offset, b + offset)]
+                            ),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            text=True,
+                        )
+                except OSError as e:
+                    print(f"  ⚠️  Keyframe scan failed: {e}")
+                    break
+                if result.returncode:
+                    print(f"  ⚠️  Keyframe scan failed: {result.stderr.strip()}")
+                    break
+                keyframes.update(
+                    round(k - offset, 6) for k in parse_keyframes(result.stdout)
+                )
+                windows = _merge_windows(windows + [[a, b]])
+                changed = True
+            # 需要 t 之前 (或文件开头) 与之后的关键帧，GOP 比窗口长时扩大窗口
+            before = a == 0.0 or any(a <= k <= t + EPSILON for k in keyframes)
+            after = any(t - EPSILON <= k <= b for k in keyframes)
+            if before and after:
+                break
+            span *= 4
+
+    keyframes = sorted(keyframes)
+    if key and changed:
+        entry = {"start_time": offset, "windows": windows, "keyframes": keyframes}
+        _cache.set(key, entry)
+    return keyframes
+
+
+def snap_start(keyframes, start):
+    """Last keyframe at or before `start`.
+
+    Without a known keyframe, `start` itself (ffmpeg's input seek then lands on the
+    previous keyframe anyway, the cut just isn't reported as snapped).
+    """
+    i = bisect.bisect_right(keyframes, start + EPSILON)
+    return keyframes[i - 1] if i else start
+
+
+def next_keyframe(keyframes, t):
+    """First keyframe at or after `t`, or None."""
+    i = bisect.bisect_left(keyframes, t - EPSILON)
+    return keyframes[i] if i < len(keyframes) else None
+
+
+def plan_smart_segments(keyframes, start, end):
+    """Splits a range into re-encoded edges and a stream-copied middle.
+
+    Returns:
+        list[tuple[str, float, float | None]]: ("encode" | "copy", start, end)
+            pieces in order; end None = to the end of the file.
+    """
+    first = next_keyframe(keyframes, start)
+    last = snap_start(keyframes, end) if end is not None else None
+    if first is None or (end is not None and first >= end):
+        # 整段都在一个 GOP 内
+        return [("encode", start, end)]
+    if last is not None and last <= first:
+        last = first
+
+    segments = []
+    if first - start > EPSILON:
+        segments.append(("encode", start, first))
+    if last is None or last - first > EPSILON:
+        segments.append(("copy", first, last))
+    if last is not None and end - last > EPSILON:
+        segments.append(("encode", last, end))
+    return segments
+
+
+# --- Commands ---
+
+
+def full_command(cmd):
+    """Prepends the global ffmpeg flags."""
+    return ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
+
+
+def _duration_args(start, end):
+    """`-t` of a range (nothing when it runs to the end of the file)."""
+    return [] if end is None else ["-t", f"{end - start:.3f}"]
+
+
+def build_copy_command(source_path, start, end, output_path):
+    """Stream-copies [start, end) (`start` should be a keyframe)."""
+    return (
+        ["-ss", f"{start:.3f}", "-i", str(source_path)]
+        + _duration_args(start, end)
+        + COPY_MAPS
+        + ["-c", "copy", "-avoid_negative_ts", "make_zero", str(output_path)]
+    )
+
+
+def smart_encoder_args(codec):
+    """Encoder arguments matching the source codec (None: smart cut not possible)."""
+    if codec not in ("h264", "hevc"):
+        return None
+    name = encoders.resolve(codec)
+    info = encoders.ENCODERS[name]
+    if info["family"] != codec or info["hardware"]:
+        return None
+    args = ["-c:v", name, "-crf", SMART_CUT_CRF, "-preset", "medium"]
+    if name == "libx265":
+        args.extend(["-x265-params", "log-level=error"])
+    return args
+
+
+def build_piece_command(source_path, kind, start, end, encoder_args, piece_path):
+    """Video-only MPEG-TS piece of a smart cut (encoded edge or copied middle)."""
+    # 输入端 -ss: 转码时是精确定位 (解码后丢弃 start 之前的帧)，复制时 start 是关键帧
+    codec_args = ["-c", "copy"] if kind == "copy" else encoder_args
+    return (
+        ["-ss", f"{start:.3f}", "-i", str(source_path)]
+        + _duration_args(start, end)
+        + ["-map", "0:v:0"]
+        + codec_args
+        + ["-f", "mpegts", str(piece_path)]
+    )
+
+
+def build_join_args(source_path, start, end, output_path, codec):
+    """Output arguments after the concatenated pieces: source audio, container flags.
+
+    Input #0 是拼接后的视频，#1 是源文件 (音频包都是关键帧，可以精确 stream copy)。
+    """
+    args = ["-ss", f"{start:.3f}"] + _duration_args(start, end)
+    args.extend(["-i", str(source_path)])
+    args.extend(["-map", "0:v", "-map", "1:a?", "-c", "copy"])
+    if codec == "hevc" and output_path.suffix.lower() != ".mkv":
+        args.extend(["-tag:v", "hvc1"])
+    return args
+
+
+def _range_times(ranges):
+    """Times whose neighbouring keyframes a cut needs."""
+    return [t for r in ranges for t in r if t is not None]
+
+
+def build_commands(source_path, ranges, output_paths, smart_cut=False):
+    """Full ffmpeg commands of a cut job (for plans; reads the keyframe index).
+
+    Returns:
+        list[list[str]]: Commands in execution order (pieces, then the join, for
+            smart cuts).
+    """
+    source_path = Path(source_path)
+    ranges = normalize_ranges(ranges)
+    keyframes = keyframe_index(source_path, _range_times(ranges))
+    codec = probe.probe_media(source_path).get("codec") if smart_cut else None
+    encoder_args = smart_encoder_args(codec) if smart_cut else None
+
+    commands = []
+    for (start, end), output_path in zip(ranges, output_paths):
+        work_dir = smart_work_dir(Path(output_path))
+        output_path = processing_path_for(Path(output_path))
+        if not encoder_args:
+            snapped = snap_start(keyframes, start)
+            commands.append(
+                full_command(build_copy_command(source_path, snapped, end, output_path))
+            )
+            continue
+        segments = plan_smart_segments(keyframes, start, end)
+        for i, (kind, a, b) in enumerate(segments):
+            piece = work_dir / f"piece_{i:02d}.ts"
+            commands.append(
+                full_command(
+                    build_piece_command(source_path, kind, a, b, encoder_args, piece)
+                )
+            )
+        join_args = build_join_args(source_path, start, end, output_path, codec)
+        commands.append(full_command(concat.build_args(output_path, join_args)))
+    return commands
+
+
+def smart_work_dir(output_path):
+    """Directory of a smart cut's temporary pieces (如 .video_cut01_smartcut/)."""
+    return output_path.with_name(f".{output_path.stem}_smartcut")
+
+
+def _run(cmd, **kwargs):
+    profiler.run_ffmpeg(full_command(cmd), "remux", **kwargs)
+
+
+def _smart_cut(
+    source_path, start, end, output_path, work_dir, keyframes, encoder_args, codec
+):
+    """Writes a frame-accurate cut: edges re-encoded, middle stream-copied."""
+    segments = plan_smart_segments(keyframes, start, end)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        pieces = []
+        for i, (kind, a, b) in enumerate(segments):
+            piece = work_dir / f"piece_{i:02d}.ts"
+            _run(build_piece_command(source_path, kind, a, b, encoder_args, piece))
+            pieces.append(piece)
+        encoded = sum((b or a) - a for kind, a, b in segments if kind == "encode")
+        print(f"  🎯 Smart cut: re-encoded {encoded:.2f}s at the edges")
+        join_args = build_join_args(source_path, start, end, output_path, codec)
+        _run(concat.build_args(output_path, join_args), input=concat.manifest(pieces))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def cut_file(video_path, ranges, output_paths, smart_cut=False):
+    """Extracts time ranges of a video without re-encoding it.
+
+    Args:
+        video_path (Path): Source video.
+        ranges (list): [[start, end], ...]; seconds or "HH:MM:SS(.mmm)", end None
+            for the end of the file.
+        output_paths (list[Path]): One output per range.
+        smart_cut (bool): Frame-accurate bounds by re-encoding only the partial GOPs
+            at the edges (H.264 / HEVC). Otherwise the start snaps to the previous
+            keyframe.
+    """
+    source_path = Path(video_path).resolve()
+    if not source_path.exists():
+        print(f"❌ Input file not found: {source_path}")
+        return
+
+    ranges = normalize_ranges(ranges)
+    print(f"\n✂️  Cutting: {source_path.name} ({len(ranges)} ranges)")
+
+    encoder_args = None
+    codec = None
+    if smart_cut:
+        codec = probe.probe_media(source_path).get("codec")
+        encoder_args = smart_encoder_args(codec)
+        if not encoder_args:
+            print(f"  ⚠️  Smart cut needs H.264 / HEVC ({codec or 'unknown'})")
+
+    keyframes = keyframe_index(source_path, _range_times(ranges))
+    if encoder_args and not keyframes:
+        print("  ⚠️  No keyframe index, smart cut disabled")
+        encoder_args = None
+
+    for (start, end), output_path in zip(ranges, output_paths):
+        output_path = Path(output_path)
+        if output_path.exists():
+            print(f"⏭️  Skipping (Exists): {output_path.name}")
+            continue
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        processing_path = processing_path_for(output_path)
+        label = f"{format_time(start)} -> {format_time(end) if end else 'end'}"
+        try:
+            if encoder_args:
+                print(f"  🎬 {label} (smart cut)")
+                _smart_cut(
+                    source_path,
+                    start,
+                    end,
+                    processing_path,
+                    smart_work_dir(output_path),
+                    keyframes,
+                    encoder_args,
+                    codec,
+                )
+            else:
+                snapped = snap_start(keyframes, start)
+                if start - snapped > EPSILON:
+                    print(f"  🎬 {label} (snapped to keyframe {format_time(snapped)})")
+                else:
+                    print(f"  🎬 {label}")
+                _run(build_copy_command(source_path, snapped, end, processing_path))
+            processing_path.rename(output_path)
+            print(f"  ✅ Created: {output_path}")
+        except subprocess.CalledProcessError:
+            print(f"❌ FFmpeg failed: {output_path.name}")
+            processing_path.unlink(missing_ok=True)
@@ -0,0 +1,279 @@
+import re
+import shutil
+import subprocess
+
+from media_processor.constant.constant import (
+    VIDEO_QUALITY_DEFAULT,
+    VIDEO_SPEED_DEFAULT,
+)
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+
+"""
+Encoder Registry:
+不同编码器通过同一套 quality / speed 档位选择 (不再在各处写死 libx264 / VideoToolbox)。
+
+- quality: "high" / "standard" / "compact"  -> 各编码器的 CRF / -q:v
+- speed:   "fast" / "medium" / "slow"       -> 各编码器的 preset / cpu-used
+- 可用编码器通过 `ffmpeg -encoders` 探测 (每个进程一次，按 ffmpeg 可执行文件指纹持久缓存)；
+  请求的编码器不可用时自动回退 (例如 Linux 上 use_gpu -> libx264)。
+"""
+
+QUALITY_LEVELS = ("high", "standard", "compact")
+SPEED_LEVELS = ("fast", "medium", "slow")
+
+# family: 同族编码器可以互相回退；hardware: 硬件编码 (use_gpu 时优先)
+ENCODERS = {
+    "libx264": {
+        "family": "h264",
+        "hardware": False,
+        "quality": {"high": "24", "standard": "28", "compact": "32"},
+        "speed": {"fast": "fast", "medium": "medium", "slow": "slow"},
+    },
+    "libx265": {
+        "family": "hevc",
+        "hardware": False,
+        "quality": {"high": "24", "standard": "28", "compact": "32"},
+        "speed": {"fast": "fast", "medium": "medium", "slow": "slow"},
+    },
+    "libsvtav1": {
+        "family": "av1",
+        "hardware": False,
+        "quality": {"high": "30", "standard": "36", "compact": "44"},
+        "speed": {"fast": "10", "medium": "8", "slow": "6"},
+    },
+    "libvpx-vp9": {
+        "family": "vp9",
+        "hardware": False,
+        "quality": {"high": "31", "standard": "36", "compact": "42"},
+        "speed": {"fast": "5", "medium": "3", "slow": "1"},
+    },
+    "h264_videotoolbox": {
+        "family": "h264",
+        "hardware": True,
+        "quality": {"high": "60", "standard": "50", "compact": "40"},
+        "speed": {},
+    },
+    "hevc_videotoolbox": {
+        "family": "hevc",
+        "hardware": True,
+        "quality": {"high": "60", "standard": "50", "compact": "40"},
+        "speed": {},
+    },
+}
+
+# `encoder` 也可以写编码格式，按 use_gpu 选硬件或软件实现
+FAMILIES = ("h264", "hevc", "av1", "vp9")
+
+DEFAULT_ENCODER = "libx264"
+
+_cache = JsonCache("ffmpeg_encoders")
+_available = None
+_warned = set()
+
+
+def parse_encoders(stdout):
+    """Parses `ffmpeg -encoders` output into the names of the video encoders."""
+    names = set()
+    for line in stdout.splitlines():
+        # " V....D libx264              libx264 H.264 / AVC ..."
+        match = re.match(r"\s*V[A-Z.]{5}\s+([\w-]+)\s", line)
+        if match:
+            names.add(match.group(1))
+    return names
+
+
+def available_encoders():
+    """Returns the video encoders of the local ffmpeg (probed once, cached).
+
+    Returns:
+        set[str] | None: Encoder names, or None if ffmpeg could not be probed.
+    """
+    global _available
+    if _available is not None:
+        return _available or None
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        _available = set()
+        return None
+
+    key = file_fingerprint(ffmpeg)
+    cached = _cache.get(key)
+    if cached is not None:
+        _available = set(cached)
+        return _available
+
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        _available = set()
+        return None
+
+    _available = parse_encoders(result.stdout)
+    _cache.set(key, sorted(_available))
+    return _available
+
+
+def _candidates(family, use_gpu):
+    names = [n for n, spec in ENCODERS.items() if spec["family"] == family]
+    # use_gpu: 硬件实现优先；否则只考虑软件实现 (硬件实现放最后兜底)
+    return sorted(names, key=lambda n: ENCODERS[n]["hardware"] != use_gpu)
+
+
+def resolve(encoder=None, use_gpu=False, compatibility_mode=False, available=None):
+    """Picks the encoder to use, falling back when the requested one is missing.
+
+    Args:
+        encoder (str, optional): Encoder name (e.g. "libx265") or family ("hevc").
+            None keeps the legacy choice: H.264 via VideoToolbox with use_gpu, else libx264.
+        use_gpu (bool): Prefer a hardware implementation of the family.
+        compatibility_mode (bool): Old TVs only decode H.264, so other families are replaced.
+        available (set[str], optional): Known encoders (defaults to `available_encoders()`).
+
+    Returns:
+        str: An encoder name from ENCODERS.
+
+    Raises:
+        ValueError: If `encoder` is neither a known encoder nor a family.
+    """
+    if available is None:
+        available = available_encoders()
+
+    requested = encoder or "h264"
+    if requested in ENCODERS:
+        family = ENCODERS[requested]["family"]
+        candidates = [requested] + [
+            n for n in _candidates(family, use_gpu) if n != requested
+        ]
+    elif requested in FAMILIES:
+        family = requested
+        candidates = _candidates(family, use_gpu)
+        if not use_gpu:
+            candidates = [n for n in candidates if not ENCODERS[n]["hardware"]]
+    else:
+        raise ValueError(f"Unknown encoder: {encoder}")
+
+    if compatibility_mode and family != "h264":
+        _warn(f"compatibility_mode requires H.264, ignoring encoder '{requested}'")
+        candidates = _candidates("h264", use_gpu)
+
+    # 探测失败 (没有 ffmpeg) 时按请求使用
+    if not available:
+        return candidates[0]
+
+    for name in candidates + [DEFAULT_ENCODER]:
+        if name in available:
+            if name != candidates[0]:
+                _warn(f"Encoder '{candidates[0]}' not available, using '{name}'")
+            return name
+
+    # 连 libx264 都没有: 任选一个可用的软件编码器
+    for name, spec in ENCODERS.items():
+        if name in available and not spec["hardware"]:
+            _warn(f"Encoder '{candidates[0]}' not available, using '{name}'")
+            return name
+    return candidates[0]
+
+
+def _warn(message):
+    if message not in _warned:
+        _warned.add(message)
+        print(f"⚠️  {message}")
+
+
+def select(encoder=None, use_gpu=False, quality=None, speed=None, compatibility_mode=False):
+    """Resolves the encoder and validates the quality / speed levels.
+
+    Returns:
+        dict: {"name", "quality", "speed"}.
+
+    Raises:
+        ValueError: On an unknown encoder, quality or speed.
+    """
+    quality = quality or VIDEO_QUALITY_DEFAULT
+    speed = speed or VIDEO_SPEED_DEFAULT
+    if quality not in QUALITY_LEVELS:
+        raise ValueError(f"Unknown quality: {quality} (use {', '.join(QUALITY_LEVELS)})")
+    if speed not in SPEED_LEVELS:
+        raise ValueError(f"Unknown speed: {speed} (use {', '.join(SPEED_LEVELS)})")
+    return {
+        "name": resolve(encoder, use_gpu, compatibility_mode),
+        "quality": quality,
+        "speed": speed,
+    }
+
+
+def build_args(spec, compatibility_mode=False, output_suffix=".mp4"):
+    """Builds the video codec arguments of an encoder selection.
+
+    Args:
+        spec (dict): Result of `select` (optionally with "tuning", see `tuning.tune`).
+        compatibility_mode (bool): Add the H.264 High@L4.1 constraints.
+        output_suffix (str): Output container extension.
+
+    Returns:
+        list[str]: `-c:v ...` and its rate control / speed options.
+    """
+    name = spec["name"]
+    info = ENCODERS[name]
+    quality = info["quality"][spec["quality"]]
+    tuning = spec.get("tuning") or {}
+    speed = tuning.get("preset") or info["speed"].get(spec["speed"])
+    x264_params = dict(tuning.get("x264_params") or {})
+    args = ["-c:v", name]
+
+    if info["hardware"]:
+        args.extend(["-q:v", quality])
+    elif name == "libvpx-vp9":
+        # 恒定质量模式: -crf 配合 -b:v 0
+        args.extend(["-crf", quality, "-b:v", "0", "-deadline", "good"])
+        args.extend(["-cpu-used", speed, "-row-mt", "1"])
+    else:
+        args.extend(["-crf", quality, "-preset", speed])
+
+    if info["family"] == "hevc" and output_suffix.lower() != ".mkv":
+        # hvc1 标签: Apple 播放器 (QuickTime / Safari) 只认 hvc1
+        args.extend(["-tag:v", "hvc1"])
+    if name == "libx265":
+        args.extend(["-x265-params", "log-level=error"])
+
+    if compatibility_mode and info["family"] == "h264":
+        args.extend(["-profile:v", "high"])
+        if name == "libx264":
+            # 强制 Level 4.1 的同时，限制参考帧数量，这是电视硬解的物理上限
+            args.extend(["-level", "4.1"])
+            x264_params = {"ref": "4", "bframes": "3", **x264_params}
+
+    # -x264-params 只能出现一次 (后者覆盖前者)，兼容模式与线程参数合并
+    if x264_params:
+        params = ":".join(f"{k}={v}" for k, v in x264_params.items())
+        args.extend(["-x264-params", params])
+    if tuning.get("threads"):
+        args.extend(["-threads", str(tuning["threads"])])
+    return args
+
+
+def describe(spec):
+    """Encoder settings for performance history: {"encoder", "preset", "crf"}."""
+    info = ENCODERS[spec["name"]]
+    tuning = spec.get("tuning") or {}
+    if info["hardware"]:
+        # 硬件编码没有 preset，-q:v 对速度影响也很小
+        return {"encoder": spec["name"], "preset": None, "crf": None}
+    return {
+        "encoder": spec["name"],
+        "preset": tuning.get("preset") or info["speed"][spec["speed"]],
+        "crf": info["quality"][spec["quality"]],
+    }
+
+
+def label(spec):
+    """Human readable mode, e.g. "GPU (h264_videotoolbox)" or "CPU (libx265)"."""
+    mode = "GPU" if ENCODERS[spec["name"]]["hardware"] else "CPU"
+    return f"{mode} ({spec['name']})"
@@ -1,27 +1,148 @@
-import os
+import glob
 import subprocess
 from pathlib import Path
+from media_processor.constant.constant import MERGE_SPLIT_MARGIN
 from media_processor.constant.extensions import VIDEO_EXTENSIONS
+from media_processor.service.common import concat, probe, profiler
 
 
-def run_ffmpeg(cmd):
-    """Executes FFmpeg command."""
+def full_command(cmd):
+    """Prepends the global ffmpeg flags used by `run_ffmpeg`."""
+    # -loglevel error to keep output clean
+    return ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
+
+
+def run_ffmpeg(cmd, **kwargs):
+    """Executes FFmpeg command (kwargs go to `subprocess.run`, e.g. `input=`)."""
     try:
-        # -loglevel error to keep output clean
-        full_cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
-        subprocess.run(full_cmd, check=True)
+        full_cmd = full_command(cmd)
+        profiler.run_ffmpeg(full_cmd, "remux", **kwargs)
         return True
     except subprocess.CalledProcessError:
         print(f"❌ FFmpeg failed.")
         return False
 
 
-def merge_videos(video_files, output_path):
+# Stream copy (-c copy) is fast and lossless but requires identical codecs
+COPY_ARGS = ["-c", "copy"]
+
+
+def part_path_for(output_path, number=None):
+    """Returns a split part of a merged file (如 Trip_part001.mp4).
+
+    Without `number`, returns the segment muxer pattern (Trip_part%03d.mp4).
+    """
+    index = "%03d" if number is None else f"{number:03d}"
+    return output_path.with_name(f"{output_path.stem}_part{index}{output_path.suffix}")
+
+
+def existing_parts(output_path):
+    """Lists split parts already written for a merged file."""
+    pattern = f"{glob.escape(output_path.stem)}_part[0-9][0-9][0-9]{output_path.suffix}"
+    return sorted(output_path.parent.glob(pattern))
+
+
+def plan_split_times(clips, max_part_size_mb=None, max_part_duration=None):
+    """Picks the cut times of size / duration capped parts.
+
+    Sizes are interpolated with each clip's own average bitrate, so clips from
+    different cameras are accounted for. Cuts are placed `MERGE_SPLIT_MARGIN` early,
+    because the segment muxer cuts at the first keyframe after each time.
+
+    Args:
+        clips (list[tuple[float, int]]): (duration seconds, bytes) per clip, in order.
+        max_part_size_mb (float, optional): Size limit per part.
+        max_part_duration (float, optional): Duration limit per part in seconds.
+
+    Returns:
+        list[float]: Cut times in seconds of the merged timeline (empty: one part).
+    """
+    max_bytes = max_seconds = None
+    if max_part_size_mb:
+        max_bytes = max_part_size_mb * 1024 * 1024 * MERGE_SPLIT_MARGIN
+    if max_part_duration:
+        max_seconds = max_part_duration * MERGE_SPLIT_MARGIN
+
+    cuts = []
+    time, part_start, part_bytes = 0.0, 0.0, 0.0
+    for duration, size in clips:
+        if duration <= 0:
+            # 时长未知的片段只计入大小
+            part_bytes += size
+            continue
+        rate = size / duration
+        clip_end = time + duration
+        while True:
+            limits = []
+            if max_bytes:
+                limits.append(time + (max_bytes - part_bytes) / rate)
+            if max_seconds:
+                limits.append(part_start + max_seconds)
+            cut = max(min(limits), time) if limits else clip_end
+            if cut >= clip_end or cut <= part_start:
+                break
+            cuts.append(round(cut, 3))
+            time, part_start, part_bytes = cut, cut, 0.0
+        part_bytes += (clip_end - time) * rate
+        time = clip_end
+    return cuts
+
+
+def build_split_args(split_times):
+    """Output arguments writing numbered, keyframe-aligned MP4 parts (segment muxer)."""
+    return COPY_ARGS + [
+        "-f",
+        "segment",
+        "-segment_format",
+        "mp4",
+        "-segment_times",
+        ",".join(f"{t:.3f}" for t in split_times),
+        "-segment_start_number",
+        "1",
+        "-reset_timestamps",
+        "1",
+    ]
+
+
+def build_command(output_path, split_times=None):
+    """Builds the concat (stream copy) arguments; the clip list is read from stdin.
+
+    Args:
+        output_path (Path): Merged file.
+        split_times (list[float], optional): Cut times; writes `part_path_for` parts.
+
+    Returns:
+        list[str]: ffmpeg arguments (without global flags).
+    """
+    if split_times:
+        return concat.build_args(
+            part_path_for(output_path), build_split_args(split_times)
+        )
+    return concat.build_args(output_path, COPY_ARGS)
+
+
+def split_times_for(video_files, max_part_size_mb=None, max_part_duration=None):
+    """Cut times of a folder's merge (probes clip durations, cached), or None."""
+    if not max_part_size_mb and not max_part_duration:
+        return None
+    clips = [
+        (probe.probe_media(v).get("duration", 0.0), v.stat().st_size)
+        for v in video_files
+    ]
+    return plan_split_times(clips, max_part_size_mb, max_part_duration)
+
+
+def merge_videos(video_files, output_path, split_times=None):
     """Merges multiple video files into one using FFmpeg concat demuxer (stream copy).
 
+    The clip list is streamed to ffmpeg over a pipe (no temp file); very large folders
+    are merged in groups first (see `concat.merge`).
+
     Args:
         video_files (list[Path]): List of video file paths to merge.
         output_path (Path): Path for the output merged video.
+        split_times (list[float], optional): Write parts cut at these times
+            (`<name>_part001.mp4`, ...) instead of a single file, in the same pass.
 
     Returns:
         bool: True if successful, False otherwise.
@@ -29,35 +150,39 @@ def merge_videos(video_files, output_path):
     if not video_files:
         return False
 
-    # Create temporary concat list file
-    list_filename = output_path.parent / f"temp_concat_list_{output_path.stem}.txt"
+    target = output_path
+    output_args = COPY_ARGS
+    if split_times is not None:
+        # 重新拆分时旧的分段数可能更多，先清掉
+        for part in existing_parts(output_path):
+            part.unlink()
+        if split_times:
+            target = part_path_for(output_path)
+            output_args = build_split_args(split_times)
+        else:
+            target = part_path_for(output_path, 1)
 
     try:
-        with open(list_filename, "w", encoding="utf-8") as f:
-            for video in video_files:
-                # Escape single quotes for ffmpeg concat file
-                safe_path = str(video.resolve()).replace("'", "'\\''")
-                f.write(f"file '{safe_path}'\n")
-
-        print(f"  🔗 Merging {len(video_files)} clips -> {output_path.name}")
-
-        # Stream copy (-c copy) is fast and lossless but requires identical codecs
-        cmd = [
-            "-f",
-            "concat",
-            "-safe",
-            "0",
-            "-i",
-            str(list_filename),
-            "-c",
-            "copy",
-            str(output_path),
-        ]
-
-        result = run_ffmpeg(cmd)
-
-        if result:
+        print(f"  🔗 Merging {len(video_files)} clips -> {target.name}")
+        if split_times:
+            print(f"  ✂️  Splitting into {len(split_times) + 1} parts")
+
+        result = concat.merge(
+            video_files,
+            target,
+            output_args,
+            lambda cmd, manifest: run_ffmpeg(cmd, input=manifest),
+        )
+
+        if result and split_times is not None:
+            for part in existing_parts(output_path):
+                print(f"  ✅ Created: {part}")
+        elif result:
             print(f"  ✅ Created: {output_path}")
+        elif split_times is not None:
+            # 失败时不留下不完整的分段
+            for part in existing_parts(output_path):
+                part.unlink()
 
         return result
 
@@ -65,34 +190,46 @@ def merge_videos(video_files, output_path):
         print(f"❌ Error during merge: {e}")
         return False
 
-    finally:
-        # Cleanup
-        if list_filename.exists():
-            try:
-                os.remove(list_filename)
-            except OSError:
-                pass
+
+def output_path_for(input_dir, output_root):
+    """Returns the merged file of a folder: output_root/<folder>/<folder>.mp4."""
+    folder_name = Path(input_dir).resolve().name
+    return Path(output_root) / folder_name / f"{folder_name}.mp4"
+
+
+def list_videos(input_dir):
+    """Lists the videos of a folder in merge order (hidden files excluded)."""
+    # Supported video extensions
+    extensions = VIDEO_EXTENSIONS
+    videos = [
+        p
+        for p in Path(input_dir).iterdir()
+        if p.is_file() and p.suffix.lower() in extensions and not p.name.startswith(".")
+    ]
+    videos.sort()  # Ensure order (e.g. 001.mp4, 002.mp4)
+    return videos
 
 
-def process_folder(input_dir, output_root):
+def process_folder(
+    input_dir, output_root, max_part_size_mb=None, max_part_duration=None
+):
     """Processes a single folder: merges all videos inside into one file.
 
     Args:
         input_dir (Path): Source directory containing videos.
         output_root (Path): Directory where output will be saved.
+        max_part_size_mb (float, optional): Split the merge into parts of at most
+            this size (`<folder>_part001.mp4`, ...), cut at keyframes.
+        max_part_duration (float, optional): Split into parts of at most this many
+            seconds (combinable with `max_part_size_mb`).
+
+    Returns:
+        bool | None: Result of `merge_videos`, None if there was nothing to merge.
     """
     input_path = Path(input_dir).resolve()
 
-    # Supported video extensions
-    extensions = VIDEO_EXTENSIONS
-
     # 1. Gather video files
-    videos = [
-        p
-        for p in input_path.iterdir()
-        if p.is_file() and p.suffix.lower() in extensions and not p.name.startswith(".")
-    ]
-    videos.sort()  # Ensure order (e.g. 001.mp4, 002.mp4)
+    videos = list_videos(input_path)
 
     if not videos:
         return
@@ -100,11 +237,8 @@ def process_folder(input_dir, output_root):
     # 2. Determine output filename (Folder Name.mp4)
     # Output path structure: output_root / input_dir_name / input_dir_name.mp4
     # This keeps things organized similar to audio processor
-    target_dir = output_root / input_path.name
-    target_dir.mkdir(parents=True, exist_ok=True)
-
-    output_filename = f"{input_path.name}.mp4"
-    output_path = target_dir / output_filename
+    output_path = output_path_for(input_path, output_root)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Avoid re-merging if exists? Or overwrite?
     # Logic: if output exists in input dir (recursive hazard), skip?
@@ -113,9 +247,13 @@ def process_folder(input_dir, output_root):
     # Check if we are trying to merge the output file itself if folders overlap
     if output_path in videos:
         videos.remove(output_path)
+    for part in existing_parts(output_path):
+        if part in videos:
+            videos.remove(part)
 
     if not videos:
         return
 
     print(f"\n🎞️  Merging Folder: {input_path.name}")
-    merge_videos(videos, output_path)
+    split_times = split_times_for(videos, max_part_size_mb, max_part_duration)
+    return merge_videos(videos, output_path, split_times)
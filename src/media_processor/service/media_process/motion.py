@@ -0,0 +1,211 @@
+import math
+import subprocess
+from pathlib import Path
+
+from media_processor.constant.constant import (
+    MOTION_ACTIVE_SCORE,
+    MOTION_ANALYSIS_FPS,
+    MOTION_ANALYSIS_HEIGHT,
+    MOTION_ANALYSIS_WIDTH,
+    MOTION_SMOOTH_SECONDS,
+    MOTION_STATIC_SCORE,
+    TIMELAPSE_FRAMERATE,
+)
+from media_processor.service.common import profiler
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+
+"""
+Motion-Adaptive Timelapse (adaptive):
+行车记录仪素材里有大量停车 / 等红灯的片段，统一 20 倍速后仍是好几秒的静止画面。
+
+1. 分析: ffmpeg 以低帧率输出缩小的灰度 rawvideo 到 pipe，NumPy 向量化计算相邻帧的
+   平均绝对差 (每个源文件只分析一次，按指纹缓存)。
+2. 变速: 画面静止处用最高倍速 (max_speed_ratio)，有运动处回到 speed_ratio，
+   中间按运动量在对数尺度上插值，相同倍速的相邻区间合并。
+3. 编码: 分段线性的 setpts 表达式写入 filter script (-filter_script:v)，
+   输出端 -r 30 丢掉多余的帧，静止片段编码的帧数随之大幅减少。
+
+NumPy 是可选依赖 (`uv sync --extra motion`)，未安装时回退到统一倍速。
+"""
+
+_cache = JsonCache("motion_scores")
+
+# 倍速按 2^(1/2) 的档位量化，减少区间数 (setpts 表达式的项数)
+SPEED_STEPS_PER_OCTAVE = 2
+
+
+def build_analysis_command(video_path):
+    """ffmpeg arguments that write downscaled grayscale frames to stdout."""
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        str(video_path),
+        "-an",
+        "-sn",
+        "-vf",
+        f"fps={MOTION_ANALYSIS_FPS},"
+        f"scale={MOTION_ANALYSIS_WIDTH}:{MOTION_ANALYSIS_HEIGHT},format=gray",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "gray",
+        "-",
+    ]
+
+
+def frame_difference_scores(stream, frame_size, np, chunk_frames=1024):
+    """Mean absolute difference between consecutive frames of a raw gray stream.
+
+    Frames are read in chunks, so memory stays bounded for hour-long sources.
+
+    Args:
+        stream (BinaryIO): Raw `gray` frames.
+        frame_size (int): Bytes per frame.
+        np (module): The numpy module.
+        chunk_frames (int): Frames per read.
+
+    Returns:
+        list[float]: One score per frame transition (0 = identical, 255 = inverted).
+    """
+    scores = []
+    previous = None
+    while True:
+        data = stream.read(frame_size * chunk_frames)
+        count = len(data) // frame_size
+        if not count:
+            break
+        frames = np.frombuffer(data[: count * frame_size], dtype=np.uint8)
+        frames = frames.reshape(count, frame_size).astype(np.int16)
+        if previous is not None:
+            frames = np.vstack([previous, frames])
+        diffs = np.abs(np.diff(frames, axis=0)).mean(axis=1)
+        scores.extend(diffs.tolist())
+        previous = frames[-1:]
+    return scores
+
+
+def analyze(video_path):
+    """Returns the motion scores of a source (cached per file fingerprint).
+
+    Returns:
+        list[float] | None: Scores sampled at MOTION_ANALYSIS_FPS, or None if numpy
+            is missing or the analysis failed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        print("  ⚠️  numpy is not installed (uv sync --extra motion), using a fixed ratio")
+        return None
+
+    key = file_fingerprint(video_path)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    frame_size = MOTION_ANALYSIS_WIDTH * MOTION_ANALYSIS_HEIGHT
+    cmd = build_analysis_command(video_path)
+    with profiler.span("motion", file=Path(video_path).name):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        try:
+            scores = frame_difference_scores(proc.stdout, frame_size, np)
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+    if returncode:
+        print(f"  ⚠️  Motion analysis failed for {Path(video_path).name}")
+        return None
+
+    scores = [round(s, 2) for s in scores]
+    _cache.set(key, scores)
+    return scores
+
+
+def smooth(scores, window):
+    """Centered moving average (short bursts of motion don't break a static stretch)."""
+    if window <= 1 or not scores:
+        return list(scores)
+    half = window // 2
+    prefix = [0.0]
+    for s in scores:
+        prefix.append(prefix[-1] + s)
+    result = []
+    for i in range(len(scores)):
+        lo, hi = max(0, i - half), min(len(scores), i + half + 1)
+        result.append((prefix[hi] - prefix[lo]) / (hi - lo))
+    return result
+
+
+def speed_for(score, speed_ratio, max_speed_ratio):
+    """Maps a motion score to a speed-up between max (static) and base (moving)."""
+    span = MOTION_ACTIVE_SCORE - MOTION_STATIC_SCORE
+    activity = min(max((score - MOTION_STATIC_SCORE) / span, 0.0), 1.0)
+    # 对数尺度插值，再量化到档位
+    octaves = math.log2(max_speed_ratio / speed_ratio) * (1 - activity)
+    octaves = round(octaves * SPEED_STEPS_PER_OCTAVE) / SPEED_STEPS_PER_OCTAVE
+    return speed_ratio * 2**octaves
+
+
+def build_runs(scores, duration, speed_ratio, max_speed_ratio):
+    """Turns motion scores into constant-speed source intervals.
+
+    Args:
+        scores (list[float]): Frame transition scores at MOTION_ANALYSIS_FPS.
+        duration (float): Source duration in seconds.
+        speed_ratio (float): Speed-up where there is motion.
+        max_speed_ratio (float): Speed-up of static stretches.
+
+    Returns:
+        list[tuple[float, float, float]]: (start, end, speed), covering [0, duration].
+    """
+    step = 1 / MOTION_ANALYSIS_FPS
+    scores = smooth(scores, round(MOTION_SMOOTH_SECONDS * MOTION_ANALYSIS_FPS))
+    runs = []
+    for i, score in enumerate(scores or [MOTION_ACTIVE_SCORE]):
+        start = i * step
+        if start >= duration:
+            break
+        speed = speed_for(score, speed_ratio, max_speed_ratio)
+        if runs and runs[-1][2] == speed:
+            runs[-1][1] = start + step
+        else:
+            runs.append([start, start + step, speed])
+    runs[-1][1] = duration
+    return [tuple(r) for r in runs]
+
+
+def output_duration(runs):
+    """Length of the timelapse produced by `runs`, in seconds."""
+    return sum((end - start) / speed for start, end, speed in runs)
+
+
+def build_setpts_expr(runs):
+    """Piecewise-linear setpts expression mapping source time to output time.
+
+    每个区间一项: gte(T,start)*lt(T,end)*(offset+(T-start)/speed)，
+    用加法串联 (不嵌套 if，项数多时也不会超出表达式解析的递归深度)。
+    """
+    terms = []
+    offset = 0.0
+    for i, (start, end, speed) in enumerate(runs):
+        bounds = f"gte(T,{start:.3f})"
+        if i < len(runs) - 1:
+            bounds += f"*lt(T,{end:.3f})"
+        terms.append(f"{bounds}*({offset:.4f}+(T-{start:.3f})/{speed:.4f})")
+        offset += (end - start) / speed
+    return "setpts='(" + "+".join(terms) + ")/TB'"
+
+
+def script_path_for(output_path):
+    """Filter script written next to the output (deleted after the encode)."""
+    output_path = Path(output_path)
+    return output_path.with_name(f".{output_path.stem}_motion.txt")
+
+
+def write_filter_script(runs, path):
+    """Writes the adaptive filter chain for `-filter_script:v`."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{build_setpts_expr(runs)},fps={TIMELAPSE_FRAMERATE}\n")
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+
+from media_processor.constant.constant import VIDEO_AUDIO_BITRATE
+from media_processor.service.common import concat
+from media_processor.service.common.json_cache import file_fingerprint
+from media_processor.service.media_process import encoders
+
+"""
+Resumable Encode (resumable):
+长视频编码到 90% 时崩溃 (OOM、重启、Ctrl-C)，普通模式会删除 _processing 文件，下次从零开始。
+
+可恢复模式把视频按固定时长切成片段逐段编码，放在输出旁边的任务目录
+(`.<stem>_resume/`) 中，每完成一段就写入 checkpoint.json (原子替换)。
+中断后重新运行，从最后一个完整片段之后继续；全部完成后:
+- 视频片段通过 concat 无损拼接 (stream copy)，
+- 音频一次性从源文件编码 (避免每段 AAC 起始填充在拼接处累积)，
+- 字幕在这一步封装。
+源文件或编码参数变化时，旧的片段作废，重新开始。
+"""
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_NAME = "checkpoint.json"
+SEGMENT_SUFFIX = ".mkv"
+
+
+def job_dir_for(output_path):
+    """Returns the segment directory of an output (如 .video_resume/)."""
+    output_path = Path(output_path)
+    return output_path.with_name(f".{output_path.stem}_resume")
+
+
+def plan_segments(duration, segment_seconds):
+    """Splits a duration into (start, length) segments of `segment_seconds`."""
+    count = max(1, math.ceil(duration / segment_seconds))
+    return [
+        (i * segment_seconds, min(segment_seconds, duration - i * segment_seconds))
+        for i in range(count)
+    ]
+
+
+def segment_path(job_dir, index):
+    return Path(job_dir) / f"seg_{index:05d}{SEGMENT_SUFFIX}"
+
+
+def build_segment_command(
+    input_path, start, length, video_filter, video_encoder, compatibility_mode, output
+):
+    """Builds the ffmpeg arguments (without global flags) of one video-only segment.
+
+    -ss 放在 -i 之前: 快速定位到附近的关键帧，再解码丢弃到精确位置 (转码时是帧精确的)。
+    """
+    cmd = ["-ss", f"{start:.3f}", "-i", str(input_path), "-t", f"{length:.3f}"]
+    cmd.extend(["-map", "0:v", "-an", "-sn"])
+    if video_filter:
+        cmd.extend(["-vf", video_filter])
+    if compatibility_mode:
+        cmd.extend(["-vsync", "cfr", "-pix_fmt", "yuv420p"])
+    cmd.extend(encoders.build_args(video_encoder, compatibility_mode, SEGMENT_SUFFIX))
+    cmd.append(str(output))
+    return cmd
+
+
+def build_final_args(input_path, sub_path, output_suffix, compatibility_mode, duration):
+    """Arguments after the concatenated video input: source audio, subtitle, flags.
+
+    Input #0 是拼接后的视频，#1 是源文件 (音频)，#2 是字幕 (如果有)。
+    """
+    args = ["-i", str(input_path)]
+    if sub_path:
+        args.extend(["-i", str(sub_path)])
+    args.extend(["-map", "0:v", "-map", "1:a"])
+    if sub_path:
+        sub_codec = (
+            "mov_text" if output_suffix.lower() in [".mp4", ".mov", ".m4v"] else "copy"
+        )
+        args.extend(
+            [
+                "-map",
+                "2:0",
+                "-c:s",
+                sub_codec,
+                "-metadata:s:s:0",
+                "title=默认字幕",
+                "-disposition:s:0",
+                "default",
+            ]
+        )
+    args.extend(
+        [
+            "-c:v",
+            "copy",
+            "-af",
+            "aformat=channel_layouts=stereo",
+            "-c:a",
+            "aac",
+            "-b:a",
+            VIDEO_AUDIO_BITRATE,
+            "-t",
+            f"{duration:.3f}",
+        ]
+    )
+    if output_suffix.lower() in [".mp4", ".mov", ".m4v"]:
+        args.extend(["-movflags", "+faststart"])
+    return args
+
+
+def signature(input_path, segments, segment_args):
+    """Identifies the source version and encode settings a checkpoint belongs to."""
+    raw = json.dumps(
+        {
+            "source": file_fingerprint(input_path),
+            "segments": segments,
+            "args": segment_args,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def load_checkpoint(job_dir, expected_signature):
+    """Returns the completed segment indexes recorded in the job directory.
+
+    Returns:
+        set[int] | None: Indexes whose segment file exists (empty if there is no
+            checkpoint yet), or None if the checkpoint belongs to another source
+            version or other settings.
+    """
+    try:
+        with open(Path(job_dir) / CHECKPOINT_NAME, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return set()
+    if (
+        checkpoint.get("version") != CHECKPOINT_VERSION
+        or checkpoint.get("signature") != expected_signature
+    ):
+        return None
+    # 只信任文件仍然存在的片段
+    return {
+        i for i in checkpoint.get("done", []) if segment_path(job_dir, i).exists()
+    }
+
+
+def save_checkpoint(job_dir, expected_signature, done):
+    """Writes the checkpoint atomically (a crash never leaves a half-written file)."""
+    path = Path(job_dir) / CHECKPOINT_NAME
+    tmp_path = path.with_name(f"{CHECKPOINT_NAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": CHECKPOINT_VERSION,
+                "signature": expected_signature,
+                "done": sorted(done),
+            },
+            f,
+        )
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def encode(
+    input_path,
+    output_path,
+    processing_path,
+    duration,
+    segment_seconds,
+    video_filter,
+    video_encoder,
+    compatibility_mode,
+    sub_path,
+    run,
+):
+    """Encodes in checkpointed segments, then concatenates them into `processing_path`.
+
+    Args:
+        input_path (Path): Source video.
+        output_path (Path): Final output (names the job directory).
+        processing_path (Path): In-progress output written by the final concat.
+        duration (float): Seconds to encode (source duration, or 180 in test mode).
+        segment_seconds (int): Length of each segment.
+        video_filter (str): `-vf` chain.
+        video_encoder (dict): Encoder selection (see `encoders.select`).
+        compatibility_mode (bool): Whether to enable compatibility mode.
+        sub_path (Path | None): Subtitle to embed in the final output.
+        run (callable): `run(cmd, name, **kwargs)` executes ffmpeg arguments
+            (without global flags); raises `subprocess.CalledProcessError` on failure.
+
+    The job directory is kept when anything fails, so the next run resumes.
+    """
+    job_dir = job_dir_for(output_path)
+    segments = plan_segments(duration, segment_seconds)
+    template = build_segment_command(
+        input_path, 0, 0, video_filter, video_encoder, compatibility_mode, "{segment}"
+    )
+    expected = signature(input_path, segments, template)
+
+    done = load_checkpoint(job_dir, expected)
+    if done is None:
+        print("   ♻️  Source or settings changed, discarding old segments")
+        shutil.rmtree(job_dir, ignore_errors=True)
+        done = set()
+    job_dir.mkdir(parents=True, exist_ok=True)
+    if done:
+        print(f"   ⏯️  Resuming: {len(done)}/{len(segments)} segments already encoded")
+
+    for index, (start, length) in enumerate(segments):
+        if index in done:
+            continue
+        target = segment_path(job_dir, index)
+        partial = target.with_name(f"{target.stem}.partial{SEGMENT_SUFFIX}")
+        print(f"   🧩 Segment {index + 1}/{len(segments)} ({start:.0f}s +{length:.0f}s)")
+        run(
+            build_segment_command(
+                input_path,
+                start,
+                length,
+                video_filter,
+                video_encoder,
+                compatibility_mode,
+                partial,
+            ),
+            "encode",
+        )
+        partial.rename(target)
+        done.add(index)
+        save_checkpoint(job_dir, expected, done)
+
+    def run_concat(cmd, data):
+        run(cmd, "remux", input=data)
+        return True
+
+    print(f"   🔗 Concatenating {len(segments)} segments (stream copy)")
+    concat.merge(
+        [segment_path(job_dir, i) for i in range(len(segments))],
+        processing_path,
+        build_final_args(
+            input_path, sub_path, processing_path.suffix, compatibility_mode, duration
+        ),
+        run_concat,
+        intermediate_suffix=SEGMENT_SUFFIX,
+    )
+    shutil.rmtree(job_dir, ignore_errors=True)
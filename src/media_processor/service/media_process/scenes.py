@@ -0,0 +1,165 @@
+import re
+import subprocess
+from pathlib import Path
+
+from media_processor.constant.constant import (
+    CHAPTER_MIN_SECONDS,
+    SCENE_ANALYSIS_WIDTH,
+    SCENE_THRESHOLD,
+)
+from media_processor.service.common import profiler
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+
+"""
+Auto Chapters (scene detection):
+大量存档视频没有人工写的章节列表。这里用一次低成本的场景检测生成章节:
+- 只解码关键帧 (-skip_frame nokey)，缩小到 160 宽再算 scene 分数，
+  `select='gt(scene,T)'` 选出镜头切换，`metadata=print` 把时间点和分数输出到 stdout；
+- 按分数从高到低挑选切点，保证每章不短于最小时长；
+- 检测结果按文件指纹 + 阈值缓存，重复运行 (或调整最小时长) 不再解码。
+"""
+
+_cache = JsonCache("scene_cuts")
+
+PTS_TIME_RE = re.compile(r"pts_time:([\d.]+)")
+SCENE_SCORE_RE = re.compile(r"lavfi\.scene_score=([\d.]+)")
+
+
+def normalize_options(auto_chapters):
+    """Normalizes the `auto_chapters` config value.
+
+    Args:
+        auto_chapters (bool | dict | None): True for defaults, or
+            {"threshold": 0.4, "min_length": 60}.
+
+    Returns:
+        dict | None: {"threshold", "min_length"}, or None when disabled.
+    """
+    if not auto_chapters:
+        return None
+    options = auto_chapters if isinstance(auto_chapters, dict) else {}
+    return {
+        "threshold": float(options.get("threshold", SCENE_THRESHOLD)),
+        "min_length": float(options.get("min_length", CHAPTER_MIN_SECONDS)),
+    }
+
+
+def build_detect_command(video_path, threshold):
+    """ffmpeg arguments printing (pts_time, scene score) of each scene cut to stdout."""
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-loglevel",
+        "error",
+        "-skip_frame",
+        "nokey",
+        "-i",
+        str(video_path),
+        "-an",
+        "-sn",
+        "-vf",
+        f"scale={SCENE_ANALYSIS_WIDTH}:-2,"
+        f"select='gt(scene,{threshold})',metadata=print:file=-",
+        "-f",
+        "null",
+        "-",
+    ]
+
+
+def parse_cuts(stdout):
+    """Parses `metadata=print` output into [(seconds, score)]."""
+    cuts = []
+    time = None
+    for line in stdout.splitlines():
+        match = PTS_TIME_RE.search(line)
+        if match:
+            time = float(match.group(1))
+            continue
+        match = SCENE_SCORE_RE.search(line)
+        if match and time is not None:
+            cuts.append((round(time, 3), round(float(match.group(1)), 4)))
+            time = None
+    return cuts
+
+
+def detect_cuts(video_path, threshold=SCENE_THRESHOLD):
+    """Detects scene cuts of a video (cached per file fingerprint and threshold).
+
+    Returns:
+        list[tuple[float, float]]: (seconds, score) per cut, or [] if detection failed.
+    """
+    try:
+        key = f"{file_fingerprint(video_path)}|{threshold}"
+    except OSError:
+        key = None
+    if key:
+        cached = _cache.get(key)
+        if cached is not None:
+            return [tuple(c) for c in cached]
+
+    try:
+        with profiler.span("scenedetect", file=Path(video_path).name):
+            result = subprocess.run(
+                build_detect_command(video_path, threshold),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+    except OSError as e:
+        print(f"  ⚠️  Scene detection failed: {e}")
+        return []
+    if result.returncode:
+        print(f"  ⚠️  Scene detection failed: {result.stderr.strip()}")
+        return []
+
+    cuts = parse_cuts(result.stdout)
+    if key:
+        _cache.set(key, cuts)
+    return cuts
+
+
+def select_chapter_starts(cuts, duration, min_length):
+    """Picks chapter starts: strongest cuts first, no chapter shorter than `min_length`.
+
+    Args:
+        cuts (list[tuple[float, float]]): (seconds, score) scene cuts.
+        duration (float): Video duration in seconds.
+        min_length (float): Minimum chapter length in seconds.
+
+    Returns:
+        list[float]: Chapter start times, starting with 0.
+    """
+    starts = [0.0]
+    for time, _score in sorted(cuts, key=lambda c: -c[1]):
+        if time < min_length or duration - time < min_length:
+            continue
+        if all(abs(time - s) >= min_length for s in starts):
+            starts.append(time)
+    return sorted(starts)
+
+
+def format_time(seconds):
+    """Formats seconds as HH:MM:SS.mmm (readable by `chapter_processor.time_to_ms`)."""
+    ms = round(seconds * 1000)
+    hours, ms = divmod(ms, 3600_000)
+    minutes, ms = divmod(ms, 60_000)
+    return f"{hours:02d}:{minutes:02d}:{ms / 1000:06.3f}"
+
+
+def build_chapters(video_path, duration, options):
+    """Detects scene cuts and turns them into a chapter list.
+
+    Args:
+        video_path (Path): Video to analyse.
+        duration (float): Video duration in seconds.
+        options (dict): Result of `normalize_options`.
+
+    Returns:
+        list[tuple[str, str]]: (start time, title) pairs, like a hand-written config.
+    """
+    cuts = detect_cuts(video_path, options["threshold"])
+    starts = select_chapter_starts(cuts, duration, options["min_length"])
+    return [
+        (format_time(start), f"Chapter {i:02d}") for i, start in enumerate(starts, 1)
+    ]
@@ -0,0 +1,170 @@
+from pathlib import Path
+
+from media_processor.constant.constant import (
+    STREAMING_SEGMENT_DURATION,
+    STREAMING_SEGMENT_TYPE,
+)
+
+"""
+Streaming Package (HLS / DASH):
+编码时直接输出分片 + 清单，而不是先写渐进式 MP4 再单独打包一遍。
+
+- 关键帧对齐: -force_key_frames 在每个分片边界强制 I 帧，所有档位用同一表达式，
+  因此多档位之间的分片边界也是对齐的 (可做自适应码率切换)。
+- HLS + DASH 同时输出: 使用 tee muxer，同一份编码结果分别封装成两套分片
+  (<package>/hls/index.m3u8, <package>/dash/manifest.mpd)，不重复编码。
+- 多档位 HLS: 额外生成 <stem>_master.m3u8 引用各档位的 index.m3u8。
+"""
+
+STREAMING_FORMATS = ("hls", "dash", "both")
+
+
+def normalize_options(streaming):
+    """Normalises the `streaming` config value.
+
+    Args:
+        streaming (bool | str | dict | None): True / "hls" / "dash" / "both", or a dict
+            with `format`, `segment_duration`, `segment_type` ("fmp4" or "mpegts").
+
+    Returns:
+        dict | None: Options with defaults, or None if disabled.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if not streaming:
+        return None
+    options = {
+        "format": "hls",
+        "segment_duration": STREAMING_SEGMENT_DURATION,
+        "segment_type": STREAMING_SEGMENT_TYPE,
+    }
+    if isinstance(streaming, str):
+        options["format"] = streaming
+    elif isinstance(streaming, dict):
+        options.update(streaming)
+
+    if options["format"] not in STREAMING_FORMATS:
+        raise ValueError(f"Unknown streaming format: {options['format']}")
+    return options
+
+
+def package_dir_for(output_path):
+    """Returns the package directory for an output (`a_720p.mp4` -> `a_720p/`)."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem)
+
+
+def _escape(value, chars):
+    for ch in "\\" + chars:
+        value = value.replace(ch, "\\" + ch)
+    return value
+
+
+def _hls_options(options, hls_dir):
+    segment_ext = "m4s" if options["segment_type"] == "fmp4" else "ts"
+    return {
+        "hls_time": str(options["segment_duration"]),
+        "hls_playlist_type": "vod",
+        "hls_segment_type": options["segment_type"],
+        "hls_segment_filename": str(hls_dir / f"seg_%05d.{segment_ext}"),
+    }
+
+
+def _dash_options(options):
+    return {
+        "seg_duration": str(options["segment_duration"]),
+        "use_template": "1",
+        "use_timeline": "1",
+    }
+
+
+def build_package_args(options, package_dir):
+    """Builds the output arguments that replace the progressive MP4 path.
+
+    Args:
+        options (dict): Result of `normalize_options`.
+        package_dir (Path): Directory receiving playlists and segments.
+
+    Returns:
+        list[str]: ffmpeg output arguments, ending with the output target.
+    """
+    package_dir = Path(package_dir)
+    hls_dir = package_dir / "hls"
+    dash_dir = package_dir / "dash"
+    duration = options["segment_duration"]
+
+    # 分片边界强制关键帧 (HLS/DASH 分片只能从关键帧开始)
+    args = ["-force_key_frames", f"expr:gte(t,n_forced*{duration})"]
+
+    if options["format"] == "hls":
+        args.extend(["-f", "hls"])
+        for key, value in _hls_options(options, hls_dir).items():
+            args.extend([f"-{key}", value])
+        args.append(str(hls_dir / "index.m3u8"))
+
+    elif options["format"] == "dash":
+        args.extend(["-f", "dash"])
+        for key, value in _dash_options(options).items():
+            args.extend([f"-{key}", value])
+        args.append(str(dash_dir / "manifest.mpd"))
+
+    else:
+        # tee: 一次编码，两套封装
+        # 选项值先按 ":" 层转义，整个 slave 再按 "|" 层转义
+        slaves = []
+        for fmt, opts, target in [
+            ("hls", _hls_options(options, hls_dir), hls_dir / "index.m3u8"),
+            ("dash", _dash_options(options), dash_dir / "manifest.mpd"),
+        ]:
+            opt_str = ":".join(
+                [f"f={fmt}"] + [f"{k}={_escape(v, ':')}" for k, v in opts.items()]
+            )
+            slave = f"[{opt_str}]{target}"
+            slaves.append(_escape(slave, "|"))
+        args.extend(["-f", "tee", "|".join(slaves)])
+
+    return args
+
+
+def create_package_dirs(options, package_dir):
+    """Creates the playlist directories (the hls muxer does not create them)."""
+    package_dir = Path(package_dir)
+    if options["format"] in ("hls", "both"):
+        (package_dir / "hls").mkdir(parents=True, exist_ok=True)
+    if options["format"] in ("dash", "both"):
+        (package_dir / "dash").mkdir(parents=True, exist_ok=True)
+
+
+def write_master_playlist(variants, master_path):
+    """Writes an HLS master playlist for a rendition ladder.
+
+    Args:
+        variants (list[tuple[Path, str]]): (package dir, name such as "720p") per rendition.
+        master_path (Path): Destination `.m3u8` (variant paths are relative to it).
+    """
+    master_path = Path(master_path)
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7"]
+    for package_dir, name in variants:
+        playlist = Path(package_dir) / "hls" / "index.m3u8"
+        if not playlist.exists():
+            continue
+        bandwidth = _estimate_bandwidth(playlist)
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},NAME=\"{name}\"")
+        lines.append(str(playlist.relative_to(master_path.parent)))
+    master_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _estimate_bandwidth(playlist):
+    """Peak-ish bandwidth (bits/s) from segment sizes and EXTINF durations."""
+    peak = 0
+    duration = None
+    for line in playlist.read_text(encoding="utf-8").splitlines():
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:") :].split(",")[0])
+        elif line and not line.startswith("#") and duration:
+            segment = playlist.parent / line
+            if segment.exists():
+                peak = max(peak, int(segment.stat().st_size * 8 / duration))
+            duration = None
+    return peak or 1
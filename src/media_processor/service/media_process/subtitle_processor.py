@@ -4,70 +4,43 @@ import subprocess
 import time
 from pathlib import Path
 
+from media_processor.service.common import profiler
+
 """
 Subtitle Processor:
 Embeds external subtitles into video files using Stream Copy (no transcoding).
 """
 
 
+def full_command(cmd):
+    """Prepends the global ffmpeg flags used by `run_ffmpeg`."""
+    # -loglevel error: Keep it clean
+    return ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
+
+
 def run_ffmpeg(cmd):
     try:
-        # -loglevel error: Keep it clean
-        full_cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
+        full_cmd = full_command(cmd)
         print(f"🚀 Running FFmpeg [Stream Copy]...")
-        subprocess.run(full_cmd, check=True)
+        profiler.run_ffmpeg(full_cmd, "remux")
     except subprocess.CalledProcessError:
         print(f"\n❌ FFmpeg process failed.")
         raise
 
 
-def process_subtitle_embedding(
-    input_path,
-    output_path,
-    remove_subtitle=True,
-):
-    """Embeds subtitle into video without transcoding (Stream Copy).
-
-    Args:
-        input_path (Path): Path to the source video file.
-        output_path (Path): Path to the destination video file.
-        delete_source (bool): Whether to delete the source file after success.
-    """
-    input_path = Path(input_path).resolve()
-    output_path = Path(output_path).resolve()
-
-    if output_path.exists() and output_path != input_path:
-        print(f"⏭️  Skipping (Exists): {output_path.name}")
-        return
-
-    # Ensure output directory exists
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    print(f"🎬 Processing Subtitle Embed: {input_path.name}")
-    print(f"   Input:  {input_path}")
-    print(f"   Output: {output_path}")
-
-    # --- 1. Subtitle Detection ---
+def find_subtitle(input_path):
+    """Returns the sidecar subtitle (same name, .srt/.ass/.vtt) of a video, or None."""
     possible_subs = [input_path.with_suffix(ext) for ext in [".srt", ".ass", ".vtt"]]
-    sub_path = next((p for p in possible_subs if p.exists()), None)
+    return next((p for p in possible_subs if p.exists()), None)
 
-    if not sub_path:
-        print(f"⏭️  Skipping (No Subtitle Found): {input_path.name}")
-        return
 
-    print(f"   Subtitle: {sub_path.name} (Embedding as soft-sub)")
+def build_command(input_path, output_path, sub_path):
+    """Builds the stream-copy subtitle embedding command.
 
-    # --- 1.1 Validation: Check Container Support ---
-    # Many containers (avi, rmvb, wmv) do not support modern soft-sub embedding nicely or at all via this method.
-    supported_extensions = [".mp4", ".mov", ".m4v", ".mkv"]
-    if output_path.suffix.lower() not in supported_extensions:
-        print(
-            f"❌ Error: Container '{output_path.suffix}' ({input_path.name}) does not support in-place subtitle embedding."
-        )
-        print(f"   Supported formats: {supported_extensions}")
-        return
-
-    # --- 2. Build FFmpeg Command ---
+    Returns:
+        tuple[list[str], Path]: ffmpeg arguments (without global flags) and the
+            in-progress output path they write to.
+    """
     # Inputs
     cmd = ["-i", str(input_path), "-i", str(sub_path)]
 
@@ -112,13 +85,65 @@ def process_subtitle_embedding(
     processing_output_path = output_path.with_name(f"{stem}_processing{suffix}")
     cmd.append(str(processing_output_path))
 
+    return cmd, processing_output_path
+
+
+def process_subtitle_embedding(
+    input_path,
+    output_path,
+    remove_subtitle=True,
+):
+    """Embeds subtitle into video without transcoding (Stream Copy).
+
+    Args:
+        input_path (Path): Path to the source video file.
+        output_path (Path): Path to the destination video file.
+        delete_source (bool): Whether to delete the source file after success.
+    """
+    input_path = Path(input_path).resolve()
+    output_path = Path(output_path).resolve()
+
+    if output_path.exists() and output_path != input_path:
+        print(f"⏭️  Skipping (Exists): {output_path.name}")
+        return
+
+    # Ensure output directory exists
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"🎬 Processing Subtitle Embed: {input_path.name}")
+    print(f"   Input:  {input_path}")
+    print(f"   Output: {output_path}")
+
+    # --- 1. Subtitle Detection ---
+    sub_path = find_subtitle(input_path)
+
+    if not sub_path:
+        print(f"⏭️  Skipping (No Subtitle Found): {input_path.name}")
+        return
+
+    print(f"   Subtitle: {sub_path.name} (Embedding as soft-sub)")
+
+    # --- 1.1 Validation: Check Container Support ---
+    # Many containers (avi, rmvb, wmv) do not support modern soft-sub embedding nicely or at all via this method.
+    supported_extensions = [".mp4", ".mov", ".m4v", ".mkv"]
+    if output_path.suffix.lower() not in supported_extensions:
+        print(
+            f"❌ Error: Container '{output_path.suffix}' ({input_path.name}) does not support in-place subtitle embedding."
+        )
+        print(f"   Supported formats: {supported_extensions}")
+        return
+
+    # --- 2. Build FFmpeg Command ---
+    cmd, processing_output_path = build_command(input_path, output_path, sub_path)
+
     try:
         start_time = time.time()
         run_ffmpeg(cmd)
         duration = time.time() - start_time
 
         if processing_output_path.exists():
-            processing_output_path.rename(output_path)
+            with profiler.span("rename"):
+                processing_output_path.rename(output_path)
 
         file_size = output_path.stat().st_size / (1024 * 1024)
         print(
@@ -0,0 +1,184 @@
+from pathlib import Path
+
+from media_processor.constant.constant import (
+    THUMBNAIL_SPRITE_INTERVAL,
+    THUMBNAIL_SPRITE_TILE,
+    THUMBNAIL_SPRITE_WIDTH,
+    THUMBNAIL_PREVIEW_CRF,
+    THUMBNAIL_PREVIEW_DURATION,
+    THUMBNAIL_PREVIEW_HEIGHT,
+    THUMBNAIL_PREVIEW_PRESET,
+    THUMBNAIL_POSTER_POSITION,
+)
+
+"""
+Catalog Artifacts (poster / sprite sheet / preview clip):
+和转码共用同一次解码 —— 主滤镜链 (yadif, scale) 之后用 split 分出几路:
+  [vmain]      -> 正常编码输出
+  [vsprite]    -> fps=1/N,scale,tile     -> <stem>_sprite_001.jpg ...
+  [vpreview]   -> trim,setpts,scale      -> <stem>_preview.mp4
+  [vposter]    -> trim (单帧)            -> <stem>_poster.jpg
+作为同一个 ffmpeg 进程的额外输出写出，不需要再解码一遍成品。
+"""
+
+DEFAULTS = {
+    "sprite_interval": THUMBNAIL_SPRITE_INTERVAL,
+    "sprite_tile": THUMBNAIL_SPRITE_TILE,
+    "sprite_width": THUMBNAIL_SPRITE_WIDTH,
+    "preview_duration": THUMBNAIL_PREVIEW_DURATION,
+    "preview_start": None,
+    "poster": True,
+}
+
+
+def normalize_options(thumbnails):
+    """Normalises the `thumbnails` config value.
+
+    Args:
+        thumbnails (bool | dict | None): True for defaults, a dict to override them.
+            Set `sprite_interval` / `preview_duration` to 0 or `poster` to false to
+            disable an artifact.
+
+    Returns:
+        dict | None: Options with defaults filled in, or None if disabled.
+    """
+    if not thumbnails:
+        return None
+    options = dict(DEFAULTS)
+    if isinstance(thumbnails, dict):
+        options.update(thumbnails)
+    if not (
+        options["sprite_interval"] or options["preview_duration"] or options["poster"]
+    ):
+        return None
+    return options
+
+
+def build_branches(options, output_path, media_duration=0.0):
+    """Builds the extra filter branches and outputs.
+
+    Args:
+        options (dict): Result of `normalize_options`.
+        output_path (Path): Main output path (artifacts are written next to it).
+        media_duration (float): Source duration, used to place the poster/preview.
+
+    Returns:
+        tuple[list[tuple[str, str]], list[str], list[Path]]:
+            (label, filter chain) per branch, ffmpeg output arguments for the extra
+            outputs (to append after the main output), and the artifact paths.
+    """
+    output_path = Path(output_path)
+    stem = output_path.stem
+    branches = []
+    output_args = []
+    artifacts = []
+
+    if options["sprite_interval"]:
+        cols, rows = options["sprite_tile"].lower().split("x")
+        sprite_pattern = output_path.with_name(f"{stem}_sprite_%03d.jpg")
+        branches.append(
+            (
+                "vsprite",
+                f"fps=1/{options['sprite_interval']},"
+                f"scale={options['sprite_width']}:-2,"
+                f"tile={cols}x{rows}",
+            )
+        )
+        # vfr: tile 每 cols*rows 帧才输出一张，不要按帧率补帧
+        output_args.extend(
+            [
+                "-map",
+                "[vsprite]",
+                "-fps_mode:v",
+                "vfr",
+                "-q:v",
+                "3",
+                str(sprite_pattern),
+            ]
+        )
+        artifacts.append(sprite_pattern)
+
+    if options["preview_duration"]:
+        start = options["preview_start"]
+        if start is None:
+            # 默认从 10% 处开始，跳过片头黑场
+            start = round(media_duration * 0.1, 2)
+        preview_path = output_path.with_name(f"{stem}_preview.mp4")
+        branches.append(
+            (
+                "vpreview",
+                f"trim=start={start}:duration={options['preview_duration']},"
+                "setpts=PTS-STARTPTS,"
+                f"scale=-2:'min({THUMBNAIL_PREVIEW_HEIGHT},ih)'",
+            )
+        )
+        output_args.extend(
+            [
+                "-map",
+                "[vpreview]",
+                "-an",
+                "-c:v",
+                "libx264",
+                "-crf",
+                THUMBNAIL_PREVIEW_CRF,
+                "-preset",
+                THUMBNAIL_PREVIEW_PRESET,
+                "-pix_fmt",
+                "yuv420p",
+                "-movflags",
+                "+faststart",
+                str(preview_path),
+            ]
+        )
+        artifacts.append(preview_path)
+
+    if options["poster"]:
+        poster_path = output_path.with_name(f"{stem}_poster.jpg")
+        position = round(media_duration * THUMBNAIL_POSTER_POSITION, 2)
+        branches.append(("vposter", f"trim=start={position}"))
+        output_args.extend(
+            [
+                "-map",
+                "[vposter]",
+                "-frames:v",
+                "1",
+                "-update",
+                "1",
+                "-q:v",
+                "2",
+                str(poster_path),
+            ]
+        )
+        artifacts.append(poster_path)
+
+    return branches, output_args, artifacts
+
+
+def build_filter_complex(main_chain, branches, input_label="[0:v]"):
+    """Combines the main chain and extra branches into one filter graph.
+
+    Args:
+        main_chain (str): Main `-vf` chain (deinterlace, scale).
+        branches (list[tuple[str, str]]): (label, chain) per extra output.
+        input_label (str): Graph input the main chain reads from.
+
+    Returns:
+        str: Filter graph whose main output is labelled `[vmain]`.
+    """
+    graph = f"{input_label}{main_chain},split={len(branches) + 1}[vmain]"
+    graph += "".join(f"[{label}_in]" for label, _ in branches)
+    for label, chain in branches:
+        graph += f";[{label}_in]{chain}[{label}]"
+    return graph
+
+
+def remove_artifacts(artifacts):
+    """Deletes partially written artifacts (sprite patterns expanded)."""
+    for path in artifacts:
+        path = Path(path)
+        if "%" in path.name:
+            prefix = path.name.split("%")[0]
+            for f in path.parent.glob(f"{prefix}*"):
+                f.unlink(missing_ok=True)
+        else:
+            path.unlink(missing_ok=True)
@@ -2,9 +2,13 @@ import subprocess
 import time
 from pathlib import Path
 from media_processor.constant.extensions import VIDEO_EXTENSIONS
+from media_processor.service.common import metrics, probe, profiler
+from media_processor.service.media_process import encoders, motion
 from media_processor.constant.constant import (
-    TIMELAPSE_CRF,
-    TIMELAPSE_PRESET,
+    TIMELAPSE_ADAPTIVE_MAX_FACTOR,
+    TIMELAPSE_QUALITY,
+    TIMELAPSE_HW_QUALITY,
+    TIMELAPSE_SPEED,
     TIMELAPSE_FRAMERATE,
     DEFAULT_SPEED_RATIO,
 )
@@ -13,53 +17,82 @@ from media_processor.constant.constant import (
 延迟摄影 (Timelapse/Hyperlapse) 的核心本质是 "抽帧" (Dropping Frames)。
 20:1 的比例意味着：每 20 帧里只保留 1 帧，或者把时间戳 (PTS) 压缩到原来的 1/20。
 音频处理：通常延迟摄影会直接丢弃音频 (-an)，因为加速 20 倍的声音全是尖锐的噪音，不可用。
+adaptive: 按运动量变速，静止片段 (停车、等红灯) 加速更多 (见 motion.py)。
 """
 
 
 # --- 工具函数 ---
 
 
-def run_ffmpeg(cmd, use_gpu):
+def full_command(cmd):
+    """Prepends the global ffmpeg flags used by `run_ffmpeg`."""
+    # -loglevel error: 保持清爽
+    return [
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-stats",
+    ] + cmd
+
+
+def run_ffmpeg(cmd, video_encoder):
     try:
-        # -loglevel error: 保持清爽
-        full_cmd = [
-            "ffmpeg",
-            "-y",
-            "-hide_banner",
-            "-loglevel",
-            "error",
-            "-stats",
-        ] + cmd
-        # full_cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
-
-        mode_str = "GPU" if use_gpu else "CPU"
-        print(f"  🚀 Processing ({mode_str})...")
-        subprocess.run(full_cmd, check=True)
+        full_cmd = full_command(cmd)
+
+        print(f"  🚀 Processing ({encoders.label(video_encoder)})...")
+        profiler.run_ffmpeg(full_cmd, "encode")
     except subprocess.CalledProcessError:
         print(f"❌ FFmpeg failed.")
         # 不中断，让上层决定是否继续
         pass
 
 
-def create_timelapse(video_path, output_path, speed_ratio, use_gpu):
-    """Creates a timelapse video from the input video.
+def select_encoder(use_gpu, encoder=None, quality=None, speed=None):
+    """Resolves the timelapse encoder (higher quality than convert by default)."""
+    # 延迟摄影建议画质稍微好一点 (默认28可能有点糊)
+    spec = encoders.select(
+        encoder, use_gpu, quality or TIMELAPSE_QUALITY, speed or TIMELAPSE_SPEED
+    )
+    if not quality and encoders.ENCODERS[spec["name"]]["hardware"]:
+        # 硬件编码一直用 -q:v 50 ("high" 是 60)，未指定 quality 时保持原有输出
+        spec["quality"] = TIMELAPSE_HW_QUALITY
+    return spec
 
-    Args:
-        video_path (Path): Path to the input video.
-        output_path (Path): Path to the output video.
-        speed_ratio (int): Speed multiplier (e.g., 20 for 20x speed).
-        use_gpu (bool): Whether to use GPU acceleration.
+
+def build_command(
+    video_path,
+    output_path,
+    speed_ratio,
+    use_gpu,
+    encoder=None,
+    quality=None,
+    speed=None,
+    adaptive=False,
+    max_speed_ratio=None,
+):
+    """Builds the timelapse encode arguments (without global ffmpeg flags).
+
+    With `adaptive`, the variable-speed filter chain is read from the filter script
+    next to the output (written by `create_timelapse`, see `motion.py`).
+
+    Returns:
+        list[str]: ffmpeg arguments.
     """
-    # 计算 PTS 缩放因子 (例如 20倍速 = 0.05)
-    pts_multiplier = 1 / speed_ratio
+    if adaptive:
+        # 分段 setpts 表达式可能很长，放在 filter script 中 (不受命令行长度限制)
+        video_filter = ["-filter_script:v", str(motion.script_path_for(output_path))]
+    else:
+        # 计算 PTS 缩放因子 (例如 20倍速 = 0.05)
+        # setpts: 修改时间戳，实现加速
+        video_filter = ["-vf", f"setpts={1 / speed_ratio}*PTS"]
 
     cmd = [
         "-i",
         str(video_path),
         # --- 核心滤镜 ---
-        # setpts: 修改时间戳，实现加速
-        "-vf",
-        f"setpts={pts_multiplier}*PTS",
+        *video_filter,
         # --- 丢弃音频 (延迟摄影通常不需要) ---
         "-an",
         # --- 强制帧率 ---
@@ -68,39 +101,102 @@ def create_timelapse(video_path, output_path, speed_ratio, use_gpu):
         TIMELAPSE_FRAMERATE,
     ]
 
-    # --- 编码器分支 ---
-    if use_gpu:
-        cmd.extend(
-            [
-                "-c:v",
-                "h264_videotoolbox",
-                "-q:v",
-                "50",  # 硬件编码质量控制
-                # "-b:v", "5000k" # 延迟摄影信息量大，如果画质不够好可以给高码率
-            ]
-        )
-    else:
-        cmd.extend(
-            [
-                "-c:v",
-                "libx264",
-                "-crf",
-                TIMELAPSE_CRF,  # 延迟摄影建议画质稍微好一点 (默认28可能有点糊)
-                "-preset",
-                TIMELAPSE_PRESET,
-            ]
-        )
+    # --- 编码器 ---
+    # use_gpu 时优先硬件编码，不可用 (如 Linux) 时自动回退到 CPU 编码器
+    video_encoder = select_encoder(use_gpu, encoder, quality, speed)
+    cmd.extend(encoders.build_args(video_encoder, output_suffix=Path(output_path).suffix))
 
     cmd.append(str(output_path))
+    return cmd
+
+
+def plan_adaptive(video_path, speed_ratio, max_speed_ratio=None):
+    """Analyses the motion of a source and returns its constant-speed intervals.
 
-    run_ffmpeg(cmd, use_gpu)
+    Returns:
+        list[tuple] | None: (start, end, speed) intervals, or None to use the fixed
+            ratio (numpy missing, analysis failed or unknown duration).
+    """
+    max_speed_ratio = max_speed_ratio or speed_ratio * TIMELAPSE_ADAPTIVE_MAX_FACTOR
+    duration = probe.get_duration(video_path)
+    if not duration:
+        return None
+    scores = motion.analyze(video_path)
+    if scores is None:
+        return None
+    runs = motion.build_runs(scores, duration, speed_ratio, max_speed_ratio)
+    print(
+        f"  🏃 Adaptive: {speed_ratio}x-{max_speed_ratio}x, "
+        f"{motion.output_duration(runs):.0f}s (fixed ratio: {duration / speed_ratio:.0f}s)"
+    )
+    return runs
+
+
+def create_timelapse(
+    video_path,
+    output_path,
+    speed_ratio,
+    use_gpu,
+    encoder=None,
+    quality=None,
+    speed=None,
+    adaptive=False,
+    max_speed_ratio=None,
+):
+    """Creates a timelapse video from the input video.
+
+    Args:
+        video_path (Path): Path to the input video.
+        output_path (Path): Path to the output video.
+        speed_ratio (int): Speed multiplier (e.g., 20 for 20x speed).
+        use_gpu (bool): Prefer a hardware encoder (falls back to CPU if unavailable).
+        encoder (str, optional): Encoder or codec family (see `encoders.resolve`).
+        quality (str, optional): "high" (default), "standard" or "compact".
+        speed (str, optional): "fast" (default), "medium" or "slow".
+        adaptive (bool): Speed up static stretches more than moving ones.
+        max_speed_ratio (int, optional): Speed-up of static stretches
+            (default: speed_ratio * TIMELAPSE_ADAPTIVE_MAX_FACTOR).
+    """
+    runs = plan_adaptive(video_path, speed_ratio, max_speed_ratio) if adaptive else None
+    cmd = build_command(
+        video_path, output_path, speed_ratio, use_gpu, encoder, quality, speed, bool(runs)
+    )
+    if not runs:
+        run_ffmpeg(cmd, select_encoder(use_gpu, encoder, quality, speed))
+        return
+
+    script_path = motion.script_path_for(output_path)
+    motion.write_filter_script(runs, script_path)
+    try:
+        run_ffmpeg(cmd, select_encoder(use_gpu, encoder, quality, speed))
+    finally:
+        script_path.unlink(missing_ok=True)
+
+
+def output_path_for(video_path, output_root, speed_ratio):
+    """Returns the timelapse output path for a source video.
+
+    Results go to `output_root/<source folder name>/<stem>_<ratio>x.mp4`.
+    """
+    video_path = Path(video_path)
+    target_dir = Path(output_root).resolve() / video_path.parent.name
+    return target_dir / f"{video_path.stem}_{speed_ratio}x.mp4"
 
 
 # --- 核心入口 ---
 
 
 def process_folder(
-    input_dir, output_root, speed_ratio=DEFAULT_SPEED_RATIO, use_gpu=True
+    input_dir,
+    output_root,
+    speed_ratio=DEFAULT_SPEED_RATIO,
+    use_gpu=True,
+    skip_files=None,
+    encoder=None,
+    quality=None,
+    speed=None,
+    adaptive=False,
+    max_speed_ratio=None,
 ):
     """Processes all videos in the directory to create timelapse videos.
 
@@ -108,7 +204,13 @@ def process_folder(
         input_dir (Path): Input directory containing videos.
         output_root (Path): Output root directory.
         speed_ratio (int): Speed multiplier.
-        use_gpu (bool): Whether to use GPU acceleration.
+        use_gpu (bool): Prefer a hardware encoder.
+        skip_files (set[Path], optional): Videos to leave out (e.g. duplicates).
+        encoder (str, optional): Encoder or codec family.
+        quality (str, optional): Quality level.
+        speed (str, optional): Speed level.
+        adaptive (bool): Motion-adaptive speed (see `create_timelapse`).
+        max_speed_ratio (int, optional): Speed-up of static stretches.
     """
     input_path = Path(input_dir).resolve()
     output_root_path = Path(output_root).resolve()
@@ -119,21 +221,24 @@ def process_folder(
 
     extensions = VIDEO_EXTENSIONS
     videos = [p for p in input_path.iterdir() if p.suffix.lower() in extensions]
+    if skip_files:
+        videos = [p for p in videos if p not in skip_files]
     videos.sort()
 
     if not videos:
         return
 
     print(f"\n⏩ Timelapse Task: {input_path.name}")
-    print(f"   Ratio: {speed_ratio}:1 | Mode: {'GPU' if use_gpu else 'CPU'}")
+    video_encoder = select_encoder(use_gpu, encoder, quality, speed)
+    print(f"   Ratio: {speed_ratio}:1 | Mode: {encoders.label(video_encoder)}")
 
     success_count = 0
     start_time = time.time()
 
     for v in videos:
         # 生成后缀，例如 _20x.mp4
-        output_name = f"{v.stem}_{speed_ratio}x.mp4"
-        output_file = target_dir / output_name
+        output_file = output_path_for(v, output_root_path, speed_ratio)
+        output_name = output_file.name
 
         # 1. 检查是否已经存在
         if output_file.exists():
@@ -147,8 +252,24 @@ def process_folder(
         print(f"  🎬 {v.name} -> {output_name}")
 
         try:
-            create_timelapse(v, output_file, speed_ratio, use_gpu)
+            video_start = time.time()
+            create_timelapse(
+                v,
+                output_file,
+                speed_ratio,
+                use_gpu,
+                encoder,
+                quality,
+                speed,
+                adaptive,
+                max_speed_ratio,
+            )
             success_count += 1
+            if metrics.is_enabled():
+                metrics.observe_encode(
+                    probe.get_duration(v), time.time() - video_start
+                )
+                metrics.add_bytes(v.stat().st_size, output_file.stat().st_size)
         except Exception as e:
             print(f"  ❌ Failed: {v.name}")
 
@@ -0,0 +1,286 @@
+import os
+import shutil
+import subprocess
+import time
+
+from media_processor.constant.constant import (
+    CALIBRATION_SECONDS,
+    VIDEO_QUALITY_DEFAULT,
+)
+from media_processor.service.common.json_cache import JsonCache, file_fingerprint
+from media_processor.service.media_process import encoders
+
+"""
+Encoder Auto-Tuning (auto_tune):
+ffmpeg 默认让每个 libx264 进程占满所有核心。
+- 480p 这类小画面的帧线程扩展性很差，多开线程只会互相等待；
+- 同时跑多个任务 (jobs) 时，每个进程都开满线程会严重超订；
+- 4K 画面在核心不多时，fast preset 太慢。
+
+按 主机核心数 / 实际编码分辨率 / 并发任务数 选择 `-threads`、`-x264-params`
+(lookahead-threads, sliced-threads) 和 preset，目标是整批任务的总吞吐最高。
+
+`main.py calibrate` 在本机用 testsrc2 实测各组合的吞吐，结果缓存后优先于内置规则。
+"""
+
+# 编码分辨率档位: (名称, 宽, 高)，按像素数从小到大
+SIZE_CLASSES = (
+    ("480p", 854, 480),
+    ("720p", 1280, 720),
+    ("1080p", 1920, 1080),
+    ("2160p", 3840, 2160),
+)
+
+# 帧线程数上限: 超过后 x264 的帧线程互相等待参考帧，吞吐不再增加
+FRAME_THREAD_CAP = {"480p": 4, "720p": 8, "1080p": 12, "2160p": 16}
+
+# 4K 且每个任务分到的核心少于此数时，preset 提速一档
+FAST_PRESET_MIN_THREADS = 8
+
+X264_PRESETS = (
+    "ultrafast",
+    "superfast",
+    "veryfast",
+    "faster",
+    "fast",
+    "medium",
+    "slow",
+    "slower",
+    "veryslow",
+)
+
+_cache = JsonCache("encoder_tuning")
+
+
+def size_class(width, height):
+    """Returns the name of the size class closest to (and not below) a frame size."""
+    pixels = (width or 0) * (height or 0)
+    for name, w, h in SIZE_CLASSES:
+        if pixels <= w * h:
+            return name
+    return SIZE_CLASSES[-1][0]
+
+
+def encode_size(info, max_width=None):
+    """Frame size that reaches the encoder (after the output scale filter).
+
+    Args:
+        info (dict): `probe.probe_media` result of the input.
+        max_width (int, optional): Width limit of the scale filter.
+
+    Returns:
+        tuple[int, int]: (width, height); (0, 0) if unknown.
+    """
+    width, height = info.get("width") or 0, info.get("height") or 0
+    if max_width and width > max_width:
+        height = round(height * max_width / width)
+        width = max_width
+    return width, height
+
+
+def _calibration_key():
+    ffmpeg = shutil.which("ffmpeg")
+    fingerprint = file_fingerprint(ffmpeg) if ffmpeg else "none"
+    return f"{fingerprint}|{os.cpu_count()}"
+
+
+def calibrated(size, jobs):
+    """Returns the calibrated x264 settings for a size class and concurrency, if any."""
+    entries = _cache.get(_calibration_key()) or {}
+    return entries.get(f"{size}|{jobs}")
+
+
+def _shift_preset(preset, steps):
+    if preset not in X264_PRESETS:
+        return preset
+    index = X264_PRESETS.index(preset) + steps
+    return X264_PRESETS[min(max(index, 0), len(X264_PRESETS) - 1)]
+
+
+def heuristic(size, jobs, cores=None):
+    """Built-in rule for libx264 threading.
+
+    Args:
+        size (str): Size class (see `size_class`).
+        jobs (int): Encodes running at the same time.
+        cores (int, optional): Logical CPUs (defaults to `os.cpu_count()`).
+
+    Returns:
+        dict: {"threads", "lookahead_threads", "sliced_threads", "preset_shift"}.
+    """
+    cores = cores or os.cpu_count() or 1
+    budget = max(1, cores // max(1, jobs))
+    threads = min(budget, FRAME_THREAD_CAP[size])
+    return {
+        "threads": threads,
+        # x264 默认 lookahead 线程数为 threads/6，小线程数时 lookahead 成为瓶颈
+        "lookahead_threads": max(1, threads // 4),
+        # 片线程只降低延迟，批处理吞吐不如帧线程
+        "sliced_threads": 0,
+        "preset_shift": -1
+        if size == "2160p" and budget < FAST_PRESET_MIN_THREADS
+        else 0,
+    }
+
+
+def tune(spec, width, height, jobs=1, cores=None):
+    """Adds threading (and possibly a faster preset) to an encoder selection.
+
+    Args:
+        spec (dict): Result of `encoders.select`.
+        width (int): Encoded frame width (see `encode_size`).
+        height (int): Encoded frame height.
+        jobs (int): Encodes running at the same time.
+        cores (int, optional): Logical CPUs (defaults to `os.cpu_count()`).
+
+    Returns:
+        dict: A copy of `spec` with a "tuning" entry (read by `encoders.build_args`).
+    """
+    info = encoders.ENCODERS[spec["name"]]
+    if info["hardware"]:
+        # 硬件编码不占 CPU 编码线程
+        return spec
+
+    jobs = max(1, jobs or 1)
+    size = size_class(width, height)
+    if spec["name"] != "libx264":
+        # 其他软件编码器只避免超订
+        cores = cores or os.cpu_count() or 1
+        if jobs == 1:
+            return spec
+        return {**spec, "tuning": {"threads": max(1, cores // jobs)}}
+
+    settings = calibrated(size, jobs) if cores is None else None
+    settings = settings or heuristic(size, jobs, cores)
+    preset = info["speed"][spec["speed"]]
+    tuning = {
+        "threads": settings["threads"],
+        "x264_params": {
+            "lookahead-threads": str(settings["lookahead_threads"]),
+            "sliced-threads": str(settings["sliced_threads"]),
+        },
+    }
+    if settings.get("preset_shift"):
+        tuning["preset"] = _shift_preset(preset, settings["preset_shift"])
+    return {**spec, "tuning": tuning}
+
+
+# --- Calibration ---
+
+
+def calibration_candidates(size, jobs, cores=None):
+    """Thread layouts worth measuring for a size class and concurrency."""
+    cores = cores or os.cpu_count() or 1
+    budget = max(1, cores // max(1, jobs))
+    base = heuristic(size, jobs, cores)
+    thread_options = sorted({budget, base["threads"], max(1, budget // 2)})
+    candidates = []
+    for threads in thread_options:
+        for sliced in (0, 1):
+            candidates.append(
+                {
+                    "threads": threads,
+                    "lookahead_threads": max(1, threads // 4),
+                    "sliced_threads": sliced,
+                    # preset 是画质取舍，不由吞吐决定 (保留内置规则)
+                    "preset_shift": base["preset_shift"],
+                }
+            )
+    return candidates
+
+
+def build_benchmark_command(width, height, settings, seconds, preset):
+    """ffmpeg arguments encoding a synthetic clip with the given settings to null."""
+    spec = {
+        "name": "libx264",
+        "quality": VIDEO_QUALITY_DEFAULT,
+        "speed": "fast",
+        "tuning": {
+            "threads": settings["threads"],
+            "x264_params": {
+                "lookahead-threads": str(settings["lookahead_threads"]),
+                "sliced-threads": str(settings["sliced_threads"]),
+            },
+            "preset": preset,
+        },
+    }
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-f",
+        "lavfi",
+        "-i",
+        f"testsrc2=size={width}x{height}:rate=30",
+        "-t",
+        str(seconds),
+        "-pix_fmt",
+        "yuv420p",
+        *encoders.build_args(spec),
+        "-f",
+        "null",
+        "-",
+    ]
+
+
+def measure(cmd, jobs):
+    """Runs `jobs` copies of a benchmark at once.
+
+    Returns:
+        float: Wall seconds until all of them finished.
+
+    Raises:
+        subprocess.CalledProcessError: If any copy failed.
+    """
+    start = time.perf_counter()
+    procs = [
+        subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        for _ in range(jobs)
+    ]
+    for proc in procs:
+        _, stderr = proc.communicate()
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+    return time.perf_counter() - start
+
+
+def calibrate(jobs=1, seconds=CALIBRATION_SECONDS, sizes=None, speed="fast"):
+    """Benchmarks the thread layouts on this machine and caches the fastest.
+
+    Args:
+        jobs (int): Concurrency to calibrate for (the convert `jobs` setting).
+        seconds (int): Length of the synthetic clip per run.
+        sizes (list[str], optional): Size classes to calibrate (default: all).
+        speed (str): Speed level whose preset is used while measuring.
+
+    Returns:
+        dict: "<size>|<jobs>" -> best settings (with measured "fps").
+    """
+    jobs = max(1, jobs)
+    frames = 30 * seconds * jobs
+    results = {}
+    for name, width, height in SIZE_CLASSES:
+        if sizes and name not in sizes:
+            continue
+        best = None
+        for settings in calibration_candidates(name, jobs):
+            preset = _shift_preset(
+                encoders.ENCODERS["libx264"]["speed"][speed], settings["preset_shift"]
+            )
+            cmd = build_benchmark_command(width, height, settings, seconds, preset)
+            elapsed = measure(cmd, jobs)
+            fps = frames / elapsed
+            print(
+                f"  {name} x{jobs}: threads={settings['threads']} "
+                f"sliced={settings['sliced_threads']} -> {fps:.1f} fps"
+            )
+            if best is None or fps > best["fps"]:
+                best = {**settings, "fps": round(fps, 1)}
+        results[f"{name}|{jobs}"] = best
+        print(f"✅ {name} x{jobs}: threads={best['threads']} ({best['fps']} fps total)")
+
+    key = _calibration_key()
+    _cache.set(key, {**(_cache.get(key) or {}), **results})
+    _cache.flush()
+    return results
@@ -1,14 +1,30 @@
 import datetime
 import os
+import shutil
 import subprocess
 import time
 from pathlib import Path
 
 from media_processor.constant.constant import (
-    VIDEO_CRF_DEFAULT,
-    VIDEO_PRESET_DEFAULT,
+    RESUMABLE_SEGMENT_SECONDS,
     VIDEO_AUDIO_BITRATE,
 )
+from media_processor.service.common import (
+    artifact_cache,
+    metrics,
+    perf_history,
+    probe,
+    profiler,
+)
+from media_processor.service.media_process import (
+    autocrop,
+    encoders,
+    interlace,
+    resumable,
+)
+from media_processor.service.media_process import streaming as packaging
+from media_processor.service.media_process import thumbnails as catalog
+from media_processor.service.media_process import tuning
 
 """
 先合并, 后压缩
@@ -17,7 +33,11 @@ from media_processor.constant.constant import (
 比如，前5分钟是静态画面（少给点数据），后5分钟是剧烈运动（多给点数据）。
 如果分开压缩，每一段都只能基于局部优化，合并后的整体积往往比"一次性压缩"要大，或者画质不均匀。
 
-压缩: 使用 H.264 编码，CRF=28 (数值越大文件越小，画质越差，23是默认，28是比较明显的压缩)
+压缩: 默认使用 H.264 编码，CRF=28 (数值越大文件越小，画质越差，23是默认，28是比较明显的压缩)
+     也可选 libx265 / libsvtav1 / libvpx-vp9 (见 encoders.py 的 quality / speed 档位)
+     auto_tune: 按核心数 / 编码分辨率 / 并发数选择线程与 preset (见 tuning.py)
+     resumable: 分段编码 + checkpoint，中断后从最后一个完整片段继续 (见 resumable.py)
+     auto_crop: cropdetect 检测黑边，缩放前先裁掉 (见 autocrop.py)
 分辨率限制: 根据用户选择, 限制最大宽度为 720p 或 1080p
 """
 
@@ -25,122 +45,216 @@ from enum import Enum
 
 
 class VideoResolution(Enum):
+    P480 = "480p"
     P720 = "720p"
     P1080 = "1080p"
 
 
+# 各档位的最大宽度
+MAX_WIDTH = {
+    VideoResolution.P480: 854,
+    VideoResolution.P720: 1280,
+    VideoResolution.P1080: 1920,
+}
+
+
 # --- 封装好的工具函数 ---
 
 
-def run_ffmpeg(cmd, use_gpu):
+def full_command(cmd):
+    """Prepends the global ffmpeg flags used by `run_ffmpeg`."""
+    return ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
+
+
+def run_ffmpeg(cmd, video_encoder):
     try:
         # -loglevel error: 保持清爽
         # -stats: 显示进度条
         #         但日志高概率卡死Pycharm的UI
         #         如果是在系统Terminal执行 python3 batch_runner.py , 可以加上-stats
         # full_cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-stats"] + cmd
-        full_cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + cmd
-        mode_str = "GPU (VideoToolbox)" if use_gpu else "CPU (libx264)"
-        print(f"🚀 Running FFmpeg [{mode_str}]...")
-        subprocess.run(full_cmd, check=True)
+        full_cmd = full_command(cmd)
+        print(f"🚀 Running FFmpeg [{encoders.label(video_encoder)}]...")
+        profiler.run_ffmpeg(full_cmd, "encode")
     except subprocess.CalledProcessError:
         print(f"\n❌ FFmpeg process failed.")
         raise
 
 
-def process_video(
-    input_path,
-    output_path,
-    use_gpu=False,
-    resolution: VideoResolution = VideoResolution.P720,
-    delete_source=False,
-    compatibility_mode=False,
-    embed_subtitles=False,
-    remove_subtitle=False,
-    test_mode=False,
-):
-    """Transcodes a single video file.
+def build_deinterlace_filters(compatibility_mode=False, field_order=None):
+    """Builds the filters applied before scaling (shared by all renditions).
 
     Args:
-        input_path (Path): Path to the source video file.
-        output_path (Path): Path to the destination video file.
-        use_gpu (bool): Whether to use GPU acceleration.
-        resolution (VideoResolution): Target resolution.
-        delete_source (bool): Whether to delete the source file after success.
-        compatibility_mode (bool): Whether to enable compatibility mode for older devices.
+        compatibility_mode (bool): Deinterlace for older devices.
+        field_order (str, optional): `interlace.detect` result of the input;
+            None keeps the unconditional `yadif=1:-1:0`.
     """
-    input_path = Path(input_path).resolve()
-    output_path = Path(output_path).resolve()
+    # (A) Deinterlacing (仅在兼容模式下)
+    # yadif=1:-1:0 -> 启用 bob 去隔行 (1), 自动检测 (-1), 总是输出一帧 (0)
+    # 这对老电视播放 1080i 隔行视频非常重要，防止拉丝。
+    # 检测过的输入: 逐行不处理，隔行指定场序，telecine 用 fieldmatch 还原 (见 interlace)
+    if not compatibility_mode:
+        return []
+    return interlace.filters_for(field_order)
 
-    if output_path.exists():
-        print(f"⏭️  Skipping (Exists): {output_path.name}")
-        return
 
-    # 确保输出目录存在
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+def build_pre_scale_filters(compatibility_mode=False, field_order=None, crop=None):
+    """Filters before scaling: deinterlace first (crop 会打乱场序), then crop."""
+    return build_deinterlace_filters(compatibility_mode, field_order) + (
+        autocrop.filters_for(crop)
+    )
 
-    print(f"🎬 Processing Video: {input_path.name}")
-    print(f"   Input:  {input_path}")
-    print(f"   Output: {output_path}")
-    if compatibility_mode:
-        print(
-            f"   Mode:   🛡️ Compatibility Mode Enabled (Deinterlace, YUV420P, High@4.1)"
-        )
 
-    # 1. 构建 Filter Chain
-    filters = []
+def build_scale_filter(resolution):
+    """Builds the scale filter for a rendition.
 
-    # (A) Deinterlacing (仅在兼容模式下)
-    # yadif=1:-1:0 -> 启用 bob 去隔行 (1), 自动检测 (-1), 总是输出一帧 (0)
-    # 这对老电视播放 1080i 隔行视频非常重要，防止拉丝。
-    if compatibility_mode:
-        filters.append("yadif=1:-1:0")
+    强制截断为偶数，防止硬件对齐错误
+    """
+    width = MAX_WIDTH[resolution]
+    return f"scale='trunc(min({width},iw)/2)*2:trunc(ih/2)*2'"
 
-    # (B) Scaling - 强制截断为偶数，防止硬件对齐错误
-    scale_filter = "scale='trunc(min(1280,iw)/2)*2:trunc(ih/2)*2'"
-    if resolution == VideoResolution.P1080:
-        scale_filter = "scale='trunc(min(1920,iw)/2)*2:trunc(ih/2)*2'"
-    filters.append(scale_filter)
 
-    # 组合滤见链: "filter1,filter2"
-    vf_chain = ",".join(filters)
+def build_filters(resolution, compatibility_mode=False, field_order=None, crop=None):
+    """Builds the video filter list.
 
-    # --- 1. Subtitle Detection ---
-    # Try to find a subtitle file with the same name
-    possible_subs = [input_path.with_suffix(ext) for ext in [".srt", ".ass", ".vtt"]]
-    sub_path = next((p for p in possible_subs if p.exists()), None)
+    Args:
+        resolution (VideoResolution): Target resolution.
+        compatibility_mode (bool): Whether to deinterlace for older devices.
+        field_order (str, optional): Detected field order (see `interlace.detect`).
+        crop (dict, optional): Black bar crop rectangle (see `autocrop.detect`).
 
-    if sub_path:
-        print(f"   Subtitle: {sub_path.name} (Embedding as soft-sub)")
+    Returns:
+        list[str]: Filters in application order.
+    """
+    # (B) Scaling
+    return build_pre_scale_filters(compatibility_mode, field_order, crop) + [
+        build_scale_filter(resolution)
+    ]
 
-        # Validation
-        supported_extensions = [".mp4", ".mov", ".m4v", ".mkv"]
-        if output_path.suffix.lower() not in supported_extensions:
-            print(
-                f"❌ Error: Target Container '{output_path.suffix}' does not support subtitle embedding. Skipping subtitle."
-            )
-            # We don't return here, we just unset sub_path so it continues without subtitle
-            sub_path = None
 
-    # --- 2. Build FFmpeg Command ---
-    # Base inputs
-    cmd = ["-i", str(input_path)]
+def describe_settings(
+    use_gpu,
+    resolution,
+    compatibility_mode=False,
+    thumbnails=None,
+    extra_resolutions=None,
+    streaming=None,
+    encoder=None,
+    quality=None,
+    speed=None,
+    field_order=None,
+    crop=None,
+):
+    """Summarises the encode settings that affect throughput.
 
-    # Add subtitle input if exists (Input #1)
-    if sub_path:
-        cmd.extend(["-i", str(sub_path)])
+    Used as the key for performance history (ETA & reports).
+
+    Returns:
+        dict: encoder, preset, crf, filters, resolution, compatibility_mode,
+            thumbnails, renditions, streaming.
+    """
+    filters = build_filters(resolution, compatibility_mode, field_order, crop)
+    filters = [f.split("=")[0] for f in filters]
+    thumbnails = catalog.normalize_options(thumbnails)
+    streaming = packaging.normalize_options(streaming)
+    extra_resolutions = list(extra_resolutions or [])
+    if thumbnails or extra_resolutions:
+        filters.append("split")
+    video_encoder = encoders.select(
+        encoder, use_gpu, quality, speed, compatibility_mode
+    )
+    return {
+        **encoders.describe(video_encoder),
+        "filters": filters,
+        "resolution": resolution.value,
+        "compatibility_mode": compatibility_mode,
+        "thumbnails": bool(thumbnails),
+        "renditions": [resolution.value] + [r.value for r in extra_resolutions],
+        "streaming": streaming["format"] if streaming else None,
+    }
+
+
+def build_filter_graph(
+    compatibility_mode,
+    resolution,
+    extra_resolutions,
+    thumb_branches,
+    field_order=None,
+    crop=None,
+):
+    """Builds a single filter graph: decode once, branch per rendition/artifact.
+
+    [0:v] -> (yadif, crop) -> split -> scale(main) -> [vmain] (+ split for thumbnails)
+                              -> scale(r1)   -> [r1]
+                              -> ...
 
+    Returns:
+        tuple[str, list[str]]: The graph and the output label of each extra rendition.
+    """
+    pre_filters = build_pre_scale_filters(compatibility_mode, field_order, crop)
+    main_scale = build_scale_filter(resolution)
+    rendition_labels = [f"r{i}" for i in range(1, len(extra_resolutions) + 1)]
+
+    parts = []
+    if extra_resolutions:
+        source = ",".join(pre_filters + [f"split={len(extra_resolutions) + 1}"])
+        split_outputs = "".join(f"[{label}_src]" for label in rendition_labels)
+        parts.append(f"[0:v]{source}[main_src]{split_outputs}")
+        main_chain_input = "[main_src]"
+        main_chain = main_scale
+    else:
+        main_chain_input = "[0:v]"
+        main_chain = ",".join(pre_filters + [main_scale])
+
+    if thumb_branches:
+        # catalog 产物取自主输出的缩放结果
+        parts.append(
+            catalog.build_filter_complex(main_chain, thumb_branches, main_chain_input)
+        )
+    else:
+        parts.append(f"{main_chain_input}{main_chain}[vmain]")
+
+    for label, res in zip(rendition_labels, extra_resolutions):
+        parts.append(f"[{label}_src]{build_scale_filter(res)}[{label}]")
+
+    return ";".join(parts), rendition_labels
+
+
+def build_output_args(
+    video_map,
+    sub_path,
+    output_suffix,
+    video_encoder,
+    compatibility_mode,
+    test_mode,
+    video_filter=None,
+    streaming=False,
+):
+    """Builds the per-output arguments (maps, codecs, flags) of one rendition.
+
+    Args:
+        video_map (str): `-map` target for video (`0:v` or a filter graph label).
+        sub_path (Path | None): Subtitle file (input #1) to embed.
+        output_suffix (str): Output container extension.
+        video_encoder (dict): Encoder selection (see `encoders.select`).
+        compatibility_mode (bool): Whether to enable compatibility mode.
+        test_mode (bool): Whether to limit the output to 180s.
+        video_filter (str, optional): `-vf` chain (when not using a filter graph).
+        streaming (bool): Output is an HLS/DASH package (no MP4-only flags).
+
+    Returns:
+        list[str]: ffmpeg arguments to put before the output path.
+    """
     # Map Streams
     # -map 0:v -> Select all video streams from Input #0
     # -map 0:a -> Select all audio streams from Input #0
-    cmd.extend(["-map", "0:v", "-map", "0:a"])
+    cmd = ["-map", video_map, "-map", "0:a"]
 
     # Map Subtitle if exists
     # -map 1:0 -> Select the first subtitle stream from Input #1
     # -c:s mov_text -> Convert to MP4 compatible text format
     if sub_path:
-        output_suffix = output_path.suffix.lower()
-        if output_suffix in [".mp4", ".mov", ".m4v"]:
+        if output_suffix.lower() in [".mp4", ".mov", ".m4v"]:
             sub_codec = "mov_text"
         else:
             sub_codec = "copy"
@@ -159,10 +273,10 @@ def process_video(
         )
 
     # --- 3. Filters & Encoders ---
+    if video_filter:
+        cmd.extend(["-vf", video_filter])
     cmd.extend(
         [
-            "-vf",
-            vf_chain,
             "-af",
             "aformat=channel_layouts=stereo",  # Apply stereo format to audio streams
             "-c:a",
@@ -177,77 +291,567 @@ def process_video(
         # -vsync cfr: 强制恒定帧率 (解决 VFR 音画同步问题)
         # -movflags +faststart: 优化 MP4 头部，利于流媒体/电视播放加载
         # -pix_fmt yuv420p: 强制 8-bit YUV420，电视解码必选 (防止 yuv444/10-bit 不兼容)
-        cmd.extend(["-vsync", "cfr", "-movflags", "+faststart", "-pix_fmt", "yuv420p"])
+        # (HLS/DASH 分片没有 moov 头，不需要 faststart)
+        cmd.extend(["-vsync", "cfr"])
+        if not streaming:
+            cmd.extend(["-movflags", "+faststart"])
+        cmd.extend(["-pix_fmt", "yuv420p"])
+
+    # 编码器 (兼容模式下 H.264 限制为 High@L4.1，见 encoders.build_args)
+    cmd.extend(encoders.build_args(video_encoder, compatibility_mode, output_suffix))
+
+    # Test Mode: Only process first 3 minutes (180 seconds)
+    # (输入上也有 -t，这里再限制一次，防止字幕输入 #1 拉长输出)
+    if test_mode:
+        cmd.extend(["-t", "180"])
+
+    return cmd
+
+
+def _remove_output(path):
+    """Removes a (partial) output file or streaming package directory."""
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        os.remove(path)
+
+
+def _output_size(path):
+    """Size of an output file or streaming package directory, in bytes."""
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+
+def processing_path_for(output_path, package=False):
+    """Returns the in-progress name of an output (如 video_processing.mp4).
+
+    Package directories have no extension (`2024.01.05 trip/` 中的点不是后缀):
+    the whole name gets the `_processing` suffix.
+    """
+    if package:
+        return output_path.with_name(f"{output_path.name}_processing")
+    return output_path.with_name(f"{output_path.stem}_processing{output_path.suffix}")
+
+
+def cleanup_sources(
+    input_path, output_path, sub_path, delete_source, remove_subtitle
+):
+    """Deletes source/subtitle files after a successful transcode (if configured)."""
+    # 删除源文件 (如果配置了且新文件存在)
+    if delete_source and output_path.exists():
+        print(f"🗑️ Deleting source: {input_path}")
+        with profiler.span("delete", file=input_path.name):
+            os.remove(input_path)
+
+    # 删除字幕文件 (如果配置了且新文件生成成功)
+    if remove_subtitle and sub_path and sub_path.exists():
+        print(f"🗑️ Deleting subtitle: {sub_path.name}")
+        os.remove(sub_path)
+
+
+def build_command(
+    input_path,
+    output_path,
+    use_gpu=False,
+    resolution: VideoResolution = VideoResolution.P720,
+    compatibility_mode=False,
+    test_mode=False,
+    thumbnails=None,
+    extra_renditions=None,
+    streaming=None,
+    encoder=None,
+    quality=None,
+    speed=None,
+    auto_tune=False,
+    parallel_jobs=1,
+    auto_crop=False,
+    detect=True,
+    resolved=None,
+):
+    """Builds the ffmpeg arguments of a transcode without touching the output side.
+
+    Nothing is created or encoded (used by `process_video` and by `plan`).
+    With `detect=False` (plans) the input is not sampled: only cached interlace /
+    black bar results are used, the others are listed in `undetected`.
+    `resolved` (the `resolved` of a planned job, see `resolved_settings`) pins the
+    encoder, its tuning and the detection results chosen at plan time.
+
+    Returns:
+        dict: `cmd` (arguments after the global flags), final `output_path`,
+            pending `extra_renditions`, `processing_paths` (final -> in-progress),
+            `sub_path`, `ignored_sub` (sidecar subtitle left out, with the reason),
+            `thumb_artifacts`, `stream_options`, `video_encoder`, `video_filter`
+            (the `-vf` chain of the main output), `field_order` (interlace
+            detection, compatibility mode only), `crop` (`auto_crop` result) and
+            `undetected` (detections skipped because of `detect=False`).
+    """
+    input_path = Path(input_path).resolve()
+    output_path = Path(output_path).resolve()
+
+    # 流媒体打包: 输出路径已经是包目录 (由 runner 用 package_dir_for 映射，只映射一次)
+    stream_options = packaging.normalize_options(streaming)
+
+    # 已存在的额外档位不再重复编码
+    extra_renditions = {
+        res: Path(p).resolve()
+        for res, p in (extra_renditions or {}).items()
+        if not Path(p).exists()
+    }
+
+    resolved = resolved or {}
+    if "video_encoder" in resolved:
+        # 计划里已选定 (含回退与 auto_tune)，不按执行机器重新选择
+        video_encoder = resolved["video_encoder"]
+    else:
+        video_encoder = encoders.select(
+            encoder, use_gpu, quality, speed, compatibility_mode
+        )
+    # 黑边检测 (按文件缓存)；不检测时 (plan) 只用缓存结果，未检测过的先不裁剪
+    undetected = []
+    crop = None
+    if auto_crop and "crop" in resolved:
+        crop = resolved["crop"]
+    elif auto_crop and detect:
+        crop = autocrop.detect(input_path)
+    elif auto_crop:
+        cached = autocrop.lookup(input_path)
+        if cached is None:
+            undetected.append("crop")
+        else:
+            crop = cached["crop"]
+
+    if auto_tune and "video_encoder" not in resolved:
+        # 线程按实际进入编码器的画面大小 (裁剪、缩放之后) 选择
+        info = probe.probe_media(input_path)
+        if crop:
+            info = dict(info, width=crop["w"], height=crop["h"])
+        width, height = tuning.encode_size(info, MAX_WIDTH[resolution])
+        video_encoder = tuning.tune(video_encoder, width, height, parallel_jobs)
+
+    # 兼容模式: 先用 idet 采样判断是否真的需要去隔行 (按文件缓存)
+    # 不检测时 (plan) 只用缓存结果，未检测过的按原来的 yadif=1:-1:0 生成命令
+    field_order = None
+    if compatibility_mode and "field_order" in resolved:
+        field_order = resolved["field_order"]
+    elif compatibility_mode:
+        field_order = interlace.detect(input_path, cached_only=not detect)
+        if field_order is None:
+            undetected.append("interlace")
+
+    # 1. 构建 Filter Chain
+    filters = build_filters(resolution, compatibility_mode, field_order, crop)
+
+    # 组合滤见链: "filter1,filter2"
+    vf_chain = ",".join(filters)
+
+    # (C) Catalog artifacts: 同一次解码 split 出雪碧图/预览/封面
+    thumb_options = catalog.normalize_options(thumbnails)
+    thumb_branches, thumb_outputs, thumb_artifacts = [], [], []
+    if thumb_options:
+        media_duration = probe.get_duration(input_path)
+        if test_mode:
+            # 输入只读前 180s，封面/预览的位置也要落在这段之内
+            media_duration = min(media_duration, 180)
+        thumb_branches, thumb_outputs, thumb_artifacts = catalog.build_branches(
+            thumb_options, output_path, media_duration
+        )
+
+    # --- 1. Subtitle Detection ---
+    # Try to find a subtitle file with the same name
+    possible_subs = [input_path.with_suffix(ext) for ext in [".srt", ".ass", ".vtt"]]
+    sub_path = next((p for p in possible_subs if p.exists()), None)
+    ignored_sub = None
+
+    if sub_path and stream_options:
+        # mov_text 不能放进 HLS/DASH 分片
+        ignored_sub = (sub_path, "not supported in streaming mode")
+        sub_path = None
+
+    # Validation
+    supported_extensions = [".mp4", ".mov", ".m4v", ".mkv"]
+    if sub_path and output_path.suffix.lower() not in supported_extensions:
+        # We don't fail here, we just unset sub_path so it continues without subtitle
+        ignored_sub = (
+            sub_path,
+            f"target container '{output_path.suffix}' does not support subtitle embedding",
+        )
+        sub_path = None
+
+    # --- 2. Build FFmpeg Command ---
+    # Base inputs
+    # Test Mode: 在输入上限制 180s，所有输出 (含封面/雪碧图/预览分支) 都只解码这一段
+    cmd = ["-t", "180"] if test_mode else []
+    cmd.extend(["-i", str(input_path)])
+
+    # Add subtitle input if exists (Input #1)
+    if sub_path:
+        cmd.extend(["-i", str(sub_path)])
+
+    # 多档位 / 额外产物: 单个 filter graph，一次解码分出多路
+    # 否则保持简单的 -vf (对所有视频流生效)
+    rendition_labels = []
+    if thumb_branches or extra_renditions:
+        graph, rendition_labels = build_filter_graph(
+            compatibility_mode,
+            resolution,
+            list(extra_renditions),
+            thumb_branches,
+            field_order,
+            crop,
+        )
+        cmd.extend(["-filter_complex", graph])
+        video_map, video_filter = "[vmain]", None
+    else:
+        video_map, video_filter = "0:v", vf_chain
+
+    cmd.extend(
+        build_output_args(
+            video_map,
+            sub_path,
+            output_path.suffix,
+            video_encoder,
+            compatibility_mode,
+            test_mode,
+            video_filter,
+            streaming=bool(stream_options),
+        )
+    )
 
-    if use_gpu:
-        cmd.extend(["-c:v", "h264_videotoolbox", "-q:v", "50"])
-        # 在 VideoToolbox 中，通常通过 Profile 限制。
-        if compatibility_mode:
-            cmd.extend(["-profile:v", "high"])
+    # Output path
+    # 使用 _processing 后缀 (如 video_processing.mp4)
+    processing_output_path = processing_path_for(output_path, bool(stream_options))
+    if stream_options:
+        cmd.extend(packaging.build_package_args(stream_options, processing_output_path))
     else:
+        cmd.append(str(processing_output_path))
+
+    # 额外档位: 每个档位一个输出 (各自编码)
+    processing_paths = {output_path: processing_output_path}
+    for label, rendition_path in zip(rendition_labels, extra_renditions.values()):
         cmd.extend(
-            [
-                "-c:v",
-                "libx264",
-                "-crf",
-                VIDEO_CRF_DEFAULT,
-                "-preset",
-                VIDEO_PRESET_DEFAULT,
-            ]
+            build_output_args(
+                f"[{label}]",
+                sub_path,
+                rendition_path.suffix,
+                video_encoder,
+                compatibility_mode,
+                test_mode,
+                streaming=bool(stream_options),
+            )
         )
-        if compatibility_mode:
-            # 强制 Level 4.1 的同时，限制参考帧数量，这是电视硬解的物理上限
+        processing_paths[rendition_path] = processing_path_for(
+            rendition_path, bool(stream_options)
+        )
+        if stream_options:
             cmd.extend(
-                [
-                    "-profile:v",
-                    "high",
-                    "-level",
-                    "4.1",
-                    "-x264-params",
-                    "ref=4:bframes=3",
-                ]
+                packaging.build_package_args(
+                    stream_options, processing_paths[rendition_path]
+                )
             )
+        else:
+            cmd.append(str(processing_paths[rendition_path]))
+
+    # 额外产物作为同一进程的附加输出
+    cmd.extend(thumb_outputs)
+
+    return {
+        "cmd": cmd,
+        "output_path": output_path,
+        "extra_renditions": extra_renditions,
+        "processing_paths": processing_paths,
+        "sub_path": sub_path,
+        "ignored_sub": ignored_sub,
+        "thumb_artifacts": thumb_artifacts,
+        "stream_options": stream_options,
+        "video_encoder": video_encoder,
+        "video_filter": vf_chain,
+        "field_order": field_order,
+        "crop": crop,
+        "undetected": undetected,
+    }
+
+
+def resolved_settings(spec):
+    """Settings of a `build_command` result to pin in a plan (JSON-serialisable).
+
+    Detections that were skipped (`undetected`) are left out, the executing host
+    runs them.
+    """
+    resolved = {"video_encoder": spec["video_encoder"]}
+    if "interlace" not in spec["undetected"]:
+        resolved["field_order"] = spec["field_order"]
+    if "crop" not in spec["undetected"]:
+        resolved["crop"] = spec["crop"]
+    return resolved
 
-    # Test Mode: Only process first 3 minutes (180 seconds)
+
+def process_video(
+    input_path,
+    output_path,
+    use_gpu=False,
+    resolution: VideoResolution = VideoResolution.P720,
+    delete_source=False,
+    compatibility_mode=False,
+    embed_subtitles=False,
+    remove_subtitle=False,
+    test_mode=False,
+    reuse_cache=False,
+    thumbnails=None,
+    extra_renditions=None,
+    streaming=None,
+    encoder=None,
+    quality=None,
+    speed=None,
+    auto_tune=False,
+    parallel_jobs=1,
+    resumable_mode=False,
+    auto_crop=False,
+    resolved=None,
+):
+    """Transcodes a single video file.
+
+    Args:
+        input_path (Path): Path to the source video file.
+        output_path (Path): Path to the destination video file (the package
+            directory with `streaming`, see `streaming.package_dir_for`).
+        use_gpu (bool): Whether to use GPU acceleration.
+        resolution (VideoResolution): Target resolution.
+        delete_source (bool): Whether to delete the source file after success.
+        compatibility_mode (bool): Whether to enable compatibility mode for older devices.
+        reuse_cache (bool): Reuse a cached output of an identical earlier transcode.
+        thumbnails (bool | dict): Also write poster / sprite sheets / preview clip
+            from the same decode (see `thumbnails.normalize_options`).
+        extra_renditions (dict[VideoResolution, Path], optional): Additional
+            resolutions encoded from the same decode, in the same ffmpeg process.
+        streaming (bool | str | dict): Write an HLS/DASH package directory
+            (`<output_path>/hls/index.m3u8`, `<output_path>/dash/manifest.mpd`)
+            instead of an MP4 (see `streaming.normalize_options`).
+        encoder (str, optional): Encoder or codec family ("libx265", "av1", ...);
+            falls back automatically if unavailable (see `encoders.resolve`).
+        quality (str, optional): "high", "standard" (default) or "compact".
+        speed (str, optional): "fast" (default), "medium" or "slow".
+        auto_tune (bool): Pick libx264 threads / preset for this input and machine
+            (see `tuning.tune`).
+        parallel_jobs (int): Encodes running at the same time (for `auto_tune`).
+        resumable_mode (bool): Encode in checkpointed segments that survive a crash
+            and are concatenated losslessly at the end (see `resumable.encode`).
+        auto_crop (bool): Crop black bars found by sampling `cropdetect`
+            (see `autocrop.detect`).
+        resolved (dict, optional): Settings pinned by a plan (see
+            `resolved_settings`).
+    """
+    # 先检查输出是否已存在: 构建命令会跑 idet / cropdetect 采样
+    if Path(output_path).exists():
+        print(f"⏭️  Skipping (Exists): {Path(output_path).name}")
+        return
+
+    spec = build_command(
+        input_path,
+        output_path,
+        use_gpu,
+        resolution,
+        compatibility_mode,
+        test_mode,
+        thumbnails,
+        extra_renditions,
+        streaming,
+        encoder,
+        quality,
+        speed,
+        auto_tune,
+        parallel_jobs,
+        auto_crop,
+        resolved=resolved,
+    )
+    input_path = Path(input_path).resolve()
+    output_path = spec["output_path"]
+    extra_renditions = spec["extra_renditions"]
+    processing_paths = spec["processing_paths"]
+    processing_output_path = processing_paths[output_path]
+    sub_path = spec["sub_path"]
+    thumb_artifacts = spec["thumb_artifacts"]
+    stream_options = spec["stream_options"]
+    cmd = spec["cmd"]
+
+    # 确保输出目录存在
+    for final_path, processing_path in processing_paths.items():
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        if stream_options:
+            packaging.create_package_dirs(stream_options, processing_path)
+
+    print(f"🎬 Processing Video: {input_path.name}")
+    print(f"   Input:  {input_path}")
+    print(f"   Output: {output_path}")
+    for res, p in extra_renditions.items():
+        print(f"   Output: {p} ({res.value})")
+    if compatibility_mode:
+        print(f"   Mode:   🛡️ Compatibility Mode Enabled (YUV420P, High@4.1)")
+        print(f"   Interlace: {interlace.LABELS[spec['field_order']]}")
+    if auto_crop:
+        info = probe.probe_media(input_path)
+        crop_label = autocrop.label(spec["crop"], info.get("width"), info.get("height"))
+        print(f"   Crop:   ✂️ {crop_label}")
+    if stream_options:
+        print(
+            f"   Package: 📡 {stream_options['format'].upper()} "
+            f"({stream_options['segment_duration']}s segments)"
+        )
+    if thumb_artifacts:
+        print(f"   Extras: {', '.join(p.name for p in thumb_artifacts)}")
+    if spec["ignored_sub"]:
+        ignored_path, reason = spec["ignored_sub"]
+        print(f"   Subtitle: {ignored_path.name} (Skipped, {reason})")
+    if sub_path:
+        print(f"   Subtitle: {sub_path.name} (Embedding as soft-sub)")
     if test_mode:
         print("   🧪 Test Mode: Limiting duration to 180s")
-        cmd.extend(["-t", "180"])
 
-    # Output path
-    # 使用 _processing 后缀 (如 video_processing.mp4)
-    stem = output_path.stem
-    suffix = output_path.suffix
-    processing_output_path = output_path.with_name(f"{stem}_processing{suffix}")
-    cmd.append(str(processing_output_path))
+    # 可恢复模式只支持单个输出文件
+    resume_duration = 0.0
+    if resumable_mode and (thumb_artifacts or extra_renditions or stream_options):
+        print("   ⏯️  Resumable mode skipped (multiple outputs requested)")
+    elif resumable_mode:
+        resume_duration = probe.get_duration(input_path)
+        if test_mode:
+            resume_duration = min(resume_duration, 180)
+        if resume_duration:
+            print(
+                f"   Mode:   ⏯️ Resumable ({RESUMABLE_SEGMENT_SECONDS}s segments, "
+                f"{resumable.job_dir_for(output_path).name}/)"
+            )
+        else:
+            print("   ⏯️  Resumable mode skipped (unknown duration)")
+
+    # 复用缓存: 同一源内容 + 同一参数之前编码过，直接取结果
+    # (缓存只保存单个文件，需要额外产物/多档位/流媒体包时不走缓存)
+    cache_key = None
+    if reuse_cache and (thumb_artifacts or extra_renditions or stream_options):
+        print("   ♻️  Artifact cache skipped (multiple outputs requested)")
+    elif reuse_cache:
+        placeholders = {"{input}": input_path, "{output}": processing_output_path}
+        if sub_path:
+            placeholders["{subtitle}"] = sub_path
+        # 可恢复模式分段编码 (音频单独编码、重新封装)，产物与单次 cmd 不同
+        mode = f"resumable:{RESUMABLE_SEGMENT_SECONDS}" if resume_duration else None
+        try:
+            cache_key = artifact_cache.make_key(input_path, cmd, placeholders, mode)
+            method = artifact_cache.lookup(cache_key, output_path)
+        except OSError as e:
+            print(f"⚠️  Artifact cache unavailable: {e}")
+            method = None
+        if method:
+            print(f"♻️  Reused cached output ({method}), no encode needed.")
+            try:
+                cleanup_sources(
+                    input_path, output_path, sub_path, delete_source, remove_subtitle
+                )
+            except OSError as e:
+                print(f"⚠️  Failed to delete sources: {e}")
+            return
 
     try:
         start_time = time.time()
-        run_ffmpeg(cmd, use_gpu)
+        if resume_duration:
+            print(f"🚀 Running FFmpeg [{encoders.label(spec['video_encoder'])}]...")
+            resumable.encode(
+                input_path,
+                output_path,
+                processing_output_path,
+                resume_duration,
+                RESUMABLE_SEGMENT_SECONDS,
+                spec["video_filter"],
+                spec["video_encoder"],
+                compatibility_mode,
+                sub_path,
+                lambda args, name, **kwargs: profiler.run_ffmpeg(
+                    full_command(args), name, **kwargs
+                ),
+            )
+        else:
+            run_ffmpeg(cmd, spec["video_encoder"])
         duration = time.time() - start_time
 
         # 重命名回正式目标名
-        if processing_output_path.exists():
-            processing_output_path.rename(output_path)
+        with profiler.span("rename"):
+            for final_path, processing_path in processing_paths.items():
+                if processing_path.exists():
+                    processing_path.rename(final_path)
 
-        file_size = output_path.stat().st_size / (1024 * 1024)
+    except Exception as e:
+        print(f"❌ Failed to process {input_path.name}: {e}")
+        if resume_duration:
+            print("   ⏯️  Encoded segments are kept, run again to resume.")
+        # 如果失败，清理可能生成的半成品
+        for final_path, processing_path in processing_paths.items():
+            _remove_output(processing_path)
+            # 理论上这时候output_path应该还没生成，但为了保险
+            _remove_output(final_path)
+        catalog.remove_artifacts(thumb_artifacts)
+        return
+
+    # 以下步骤失败只警告: 输出已经完成，不能因为记录/缓存出错而删除
+    try:
+        # 多档位 HLS: 生成 master playlist 供播放器自适应切换
+        if (
+            stream_options
+            and stream_options["format"] != "dash"
+            and len(processing_paths) > 1
+        ):
+            master_path = output_path.with_name(f"{input_path.stem}_master.m3u8")
+            variants = [(output_path, resolution.value)] + [
+                (p, res.value) for res, p in extra_renditions.items()
+            ]
+            packaging.write_master_playlist(variants, master_path)
+            print(f"   Master Playlist: {master_path.name}")
+    except OSError as e:
+        print(f"⚠️  Failed to write the master playlist: {e}")
+
+    try:
+        output_bytes = sum(_output_size(p) for p in processing_paths)
+        file_size = output_bytes / (1024 * 1024)
         print(
             f"✅ Done! Time: {duration:.1f}s | Size: {file_size:.2f} MB | DateTime: {datetime.datetime.now()}"
         )
 
-        # 删除源文件 (如果配置了且新文件存在)
-        if delete_source and output_path.exists():
-            print(f"🗑️ Deleting source: {input_path}")
-            os.remove(input_path)
+        # 记录性能历史 (用于 ETA 估算与设置对比)
+        input_info = probe.probe_media(input_path)
+        media_duration = input_info.get("duration", 0.0)
+        if test_mode:
+            media_duration = min(media_duration, 180)
+        # auto_tune 可能改了 preset，记录实际使用的编码参数
+        perf_history.record_run(
+            input_info,
+            {
+                **describe_settings(
+                    use_gpu,
+                    resolution,
+                    compatibility_mode,
+                    thumbnails,
+                    list(extra_renditions),
+                    streaming,
+                    encoder,
+                    quality,
+                    speed,
+                    spec["field_order"],
+                    spec["crop"],
+                ),
+                **encoders.describe(spec["video_encoder"]),
+            },
+            media_duration,
+            duration,
+        )
+        metrics.observe_encode(media_duration, duration)
+        metrics.add_bytes(input_path.stat().st_size, output_bytes)
+    except Exception as e:
+        print(f"⚠️  Failed to record the run: {e}")
 
-        # 删除字幕文件 (如果配置了且新文件生成成功)
-        if remove_subtitle and sub_path and sub_path.exists():
-            print(f"🗑️ Deleting subtitle: {sub_path.name}")
-            os.remove(sub_path)
+    if cache_key:
+        artifact_cache.store(cache_key, output_path)
 
-    except Exception as e:
-        print(f"❌ Failed to process {input_path.name}: {e}")
-        # 如果失败，清理可能生成的半成品
-        if processing_output_path.exists():
-            os.remove(processing_output_path)
-        if output_path.exists():  # 理论上这时候output_path应该还没生成，但为了保险
-            os.remove(output_path)
+    try:
+        cleanup_sources(
+            input_path, output_path, sub_path, delete_source, remove_subtitle
+        )
+    except OSError as e:
+        print(f"⚠️  Failed to delete sources: {e}")
@@ -0,0 +1,100 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from media_processor.service.common import artifact_cache, dedup, fileops
+
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        # 每个测试使用独立的缓存目录与索引，避免写入用户目录
+        self.index = artifact_cache.JsonCache("artifacts_index", self.root / "cache")
+        self.hashes = dedup.JsonCache("dedup_hashes", self.root / "cache")
+        self.store_dir = self.root / "store"
+        for patcher in (
+            mock.patch.object(artifact_cache, "_index", self.index),
+            mock.patch.object(artifact_cache, "ARTIFACT_CACHE_DIR", self.store_dir),
+            mock.patch.object(dedup, "_cache", self.hashes),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.index.flush()
+        self.hashes.flush()
+        self.tmp.cleanup()
+
+    def _write(self, name, data):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+    def test_make_key(self):
+        source = self._write("a.mp4", b"video")
+        sub = self._write("a.srt", b"1\n")
+        copy = self._write("b/a.mp4", b"video")
+
+        def key(input_path, output, mode=None):
+            cmd = ["-i", str(input_path), "-i", str(sub), "-crf", "28", str(output)]
+            placeholders = {
+                "{input}": input_path,
+                "{output}": output,
+                "{subtitle}": sub,
+            }
+            return artifact_cache.make_key(input_path, cmd, placeholders, mode)
+
+        base = key(source, self.root / "out1.mp4")
+        # 输入/输出路径被替换掉: 同内容、不同位置命中同一条缓存
+        self.assertEqual(key(copy, self.root / "out2.mp4"), base)
+        self.assertNotEqual(key(source, self.root / "out1.mp4", "resumable:600"), base)
+
+        # 字幕等附加输入按内容计入
+        sub.write_bytes(b"2\n")
+        self.assertNotEqual(key(source, self.root / "out1.mp4"), base)
+
+    def test_store_and_lookup(self):
+        output = self._write("out/a.mp4", b"encoded")
+        artifact_cache.store("k1", output)
+
+        restored = self.root / "again/a.mp4"
+        self.assertIn(artifact_cache.lookup("k1", restored), ("reflink", "copy"))
+        self.assertEqual(restored.read_bytes(), b"encoded")
+        # 不共用 inode: 修改交付的文件不影响缓存
+        cached = self.store_dir / "k1.mp4"
+        self.assertNotEqual(restored.stat().st_ino, cached.stat().st_ino)
+
+        cached.unlink()
+        self.assertIsNone(artifact_cache.lookup("k1", self.root / "third.mp4"))
+        self.assertIsNone(self.index.get("k1"))
+
+    def test_lru_eviction(self):
+        for i, key in enumerate(("old", "mid", "new")):
+            output = self._write(f"{key}.mp4", b"x" * 1024)
+            artifact_cache.store(key, output)
+            self.index.set(key, dict(self.index.get(key), last_used=i))
+
+        # 上限只够两个条目: 最久未使用的被淘汰
+        artifact_cache.evict(max_gb=2048 / 1024**3)
+        self.assertIsNone(self.index.get("old"))
+        self.assertFalse((self.store_dir / "old.mp4").exists())
+        self.assertIsNotNone(self.index.get("new"))
+
+    def test_clone_file_without_hardlink(self):
+        src = self._write("src.bin", b"data")
+        dst = self.root / "nested" / "dst.bin"
+        method = fileops.clone_file(src, dst, allow_hardlink=False)
+        self.assertIn(method, ("reflink", "copy"))
+        self.assertEqual(dst.read_bytes(), b"data")
+        self.assertNotEqual(src.stat().st_ino, dst.stat().st_ino)
+
+        linked = self.root / "linked.bin"
+        if fileops.clone_file(src, linked) == "hardlink":
+            self.assertEqual(src.stat().st_ino, linked.stat().st_ino)
+
+
+if __name__ == "__main__":
+    unittest.main()
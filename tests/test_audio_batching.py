@@ -0,0 +1,43 @@
+import unittest
+from pathlib import Path
+
+from media_processor.service.audio_abstracter import audio_processor
+
+
+class TestDurationBatching(unittest.TestCase):
+    def test_packs_consecutive_clips_near_target(self):
+        items = [(Path(f"{i}.wav"), d) for i, d in enumerate([20, 30, 25, 40, 10])]
+        batches = audio_processor.split_batches_by_duration(items, 60)
+        lengths = [sum(d for p, d in items if (p, None, None) in b) for b in batches]
+        self.assertEqual(lengths, [50, 65, 10])
+
+    def test_cuts_long_clip_at_silence(self):
+        clip = Path("long.wav")
+        batches = audio_processor.split_batches_by_duration(
+            [(Path("a.wav"), 10), (clip, 200)], 60, {clip: [30, 55, 118, 170]}
+        )
+        self.assertEqual(
+            batches,
+            [
+                [(Path("a.wav"), None, None), (clip, None, 55)],
+                [(clip, 55, 118)],
+                [(clip, 118, 170)],
+                [(clip, 170, None)],
+            ],
+        )
+        self.assertEqual(audio_processor.output_name_for(batches[1]), "long_t00055.mp3")
+
+    def test_codec_changes_extension_and_encoder(self):
+        batch = [(Path("001.wav"), None, None)]
+        self.assertEqual(audio_processor.output_name_for(batch, "opus"), "001.opus")
+        self.assertEqual(audio_processor.output_name_for(batch, "aac"), "001.m4a")
+        args = audio_processor.build_merge_command(Path("001.opus"), None, "opus")
+        self.assertIn("libopus", args)
+        # libopus 不支持 44.1kHz
+        self.assertEqual(args[args.index("-ar") + 1], "48000")
+        with self.assertRaises(ValueError):
+            audio_processor.codec_spec("flac")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from media_processor.service.media_process import autocrop, video_processor
+from media_processor.service.media_process.video_processor import VideoResolution
+
+CROPDETECT_STDERR = """
+[Parsed_cropdetect_0 @ 0x1] x1:0 x2:1919 y1:140 y2:939 w:1920 h:800 x:0 y:140 pts:1 t:0.04 crop=1920:800:0:140
+[Parsed_cropdetect_0 @ 0x1] x1:0 x2:1919 y1:140 y2:939 w:1920 h:800 x:0 y:140 pts:2 t:0.08 crop=1920:800:0:140
+[Parsed_cropdetect_0 @ 0x1] x1:2 x2:1917 y1:300 y2:779 w:1916 h:480 x:2 y:300 pts:3 t:0.12 crop=1916:480:2:300
+[Parsed_cropdetect_0 @ 0x1] x1:1919 x2:0 y1:1079 y2:0 w:-1904 h:-1072 x:1912 y:1076 pts:4 t:0.16 crop=-1904:-1072:1912:1076
+"""
+
+
+class TestAutoCrop(unittest.TestCase):
+    def test_consensus(self):
+        rects = autocrop.parse_cropdetect(CROPDETECT_STDERR)
+        # 全黑帧 (负宽高) 被丢弃
+        self.assertEqual(len(rects), 3)
+        crop = autocrop.consensus(rects, 1920, 1080)
+        self.assertEqual(crop, {"w": 1920, "h": 800, "x": 0, "y": 140})
+
+        # 没有稳定的多数 / 几乎没有黑边: 不裁
+        unstable = rects[1:] + [(1920, 1000, 0, 40)]
+        self.assertIsNone(autocrop.consensus(unstable, 1920, 1080))
+        self.assertIsNone(autocrop.consensus([(1920, 1076, 0, 2)] * 3, 1920, 1080))
+        # 竖屏 (旋转元数据): probe 的宽高与滤镜看到的相反
+        portrait = autocrop.consensus([(1080, 1600, 0, 160)] * 3, 1920, 1080)
+        self.assertEqual(portrait, {"w": 1080, "h": 1600, "x": 0, "y": 160})
+
+    def test_crop_before_scale(self):
+        crop = {"w": 1920, "h": 800, "x": 0, "y": 140}
+        self.assertEqual(
+            video_processor.build_filters(VideoResolution.P720, True, "tff", crop),
+            [
+                "yadif=1:0:0",
+                "crop=1920:800:0:140",
+                "scale='trunc(min(1280,iw)/2)*2:trunc(ih/2)*2'",
+            ],
+        )
+        graph, _ = video_processor.build_filter_graph(
+            False, VideoResolution.P1080, [VideoResolution.P480], [], crop=crop
+        )
+        self.assertTrue(graph.startswith("[0:v]crop=1920:800:0:140,split=2"))
+
+    def test_plan_uses_cached_crop_only(self):
+        crop = {"w": 1920, "h": 800, "x": 0, "y": 140}
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "a.mp4"
+            source.write_bytes(b"v")
+            output = Path(tmp) / "a_1080p.mp4"
+            with mock.patch.object(autocrop.subprocess, "run") as run:
+                with mock.patch.object(autocrop._cache, "get", return_value=None):
+                    pending = video_processor.build_command(
+                        source, output, auto_crop=True, detect=False
+                    )
+                cached = {"crop": crop, "frames": 10}
+                with mock.patch.object(autocrop._cache, "get", return_value=cached):
+                    known = video_processor.build_command(
+                        source, output, auto_crop=True, detect=False
+                    )
+        run.assert_not_called()
+        self.assertEqual((pending["crop"], pending["undetected"]), (None, ["crop"]))
+        self.assertEqual((known["crop"], known["undetected"]), (crop, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.service.common import concat
+
+
+class TestConcat(unittest.TestCase):
+    def test_manifest_escapes_quotes(self):
+        data = concat.manifest([Path("/clips/it's.mp4")])
+        self.assertEqual(data, b"file '/clips/it'\\''s.mp4'\n")
+
+    def test_pipe_input(self):
+        args = concat.build_args(Path("/out/a.mp4"), ["-c", "copy"])
+        self.assertEqual(args[args.index("-i") + 1], "-")
+        self.assertEqual(args[-3:], ["-c", "copy", "/out/a.mp4"])
+
+    def test_hierarchical_merge(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "all.mp4"
+            clips = [Path(tmp) / f"{i:03d}.mp4" for i in range(5)]
+            calls = []
+
+            def run(cmd, manifest):
+                calls.append((Path(cmd[-1]), manifest.decode().count("file ")))
+                Path(cmd[-1]).touch()
+                return True
+
+            self.assertTrue(
+                concat.merge(clips, output, ["-c", "copy"], run, group_size=2)
+            )
+
+            # 5 clips -> 3 groups -> 2 groups -> final
+            self.assertEqual([n for _, n in calls], [2, 2, 1, 2, 1, 2])
+            self.assertEqual(calls[-1][0], output)
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], ["all.mp4"])
+
+    def test_single_pass_below_limit(self):
+        calls = []
+        concat.merge(
+            [Path("/a.wav"), Path("/b.wav")],
+            Path("/out/x.mp3"),
+            [],
+            lambda cmd, manifest: calls.append(cmd) or True,
+            group_size=2,
+        )
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
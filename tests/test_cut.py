@@ -0,0 +1,71 @@
+import subprocess
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from media_processor.service.common import probe
+from media_processor.service.media_process import cut_processor
+
+PACKETS = """0.000000,K__
+0.033367,___
+2.002000,K__
+4.004000,K__
+5.005000,___
+"""
+
+
+class TestCut(unittest.TestCase):
+    def test_parse_keyframes_and_snap(self):
+        keyframes = cut_processor.parse_keyframes(PACKETS)
+        self.assertEqual(keyframes, [0.0, 2.002, 4.004])
+        self.assertEqual(cut_processor.snap_start(keyframes, 3.5), 2.002)
+        self.assertEqual(cut_processor.snap_start(keyframes, 4.004), 4.004)
+
+    def test_smart_segments_encode_only_edges(self):
+        keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+        self.assertEqual(
+            cut_processor.plan_smart_segments(keyframes, 1.5, 7.0),
+            [("encode", 1.5, 2.0), ("copy", 2.0, 6.0), ("encode", 6.0, 7.0)],
+        )
+        self.assertEqual(
+            cut_processor.plan_smart_segments(keyframes, 2.0, None),
+            [("copy", 2.0, None)],
+        )
+        self.assertEqual(
+            cut_processor.plan_smart_segments(keyframes, 2.5, 3.5),
+            [("encode", 2.5, 3.5)],
+        )
+
+    def test_ranges_and_copy_command(self):
+        ranges = cut_processor.normalize_ranges([["01:00:00", "01:10:00"], [90, None]])
+        self.assertEqual(ranges, [(3600.0, 4200.0), (90.0, None)])
+        with self.assertRaises(ValueError):
+            cut_processor.normalize_ranges([["05:00", "04:00"]])
+
+        cmd = cut_processor.build_copy_command(
+            Path("/v/a.mp4"), 3598.0, 4200.0, Path("/v/a_cut01.mp4")
+        )
+        self.assertEqual(cmd[:4], ["-ss", "3598.000", "-i", "/v/a.mp4"])
+        self.assertEqual(cmd[cmd.index("-t") + 1], "602.000")
+        self.assertEqual(
+            cut_processor.output_path_for(Path("/v/a.mp4"), 2), Path("/v/a_cut02.mp4")
+        )
+
+    def test_keyframes_relative_to_start_time(self):
+        # MPEG-TS 常见: 容器 start_time = 1.4s，包 pts 是绝对时间
+        packets = "1.400000,K__\n3.402000,K__\n5.404000,K__\n"
+        result = subprocess.CompletedProcess([], 0, stdout=packets, stderr="")
+        with mock.patch.object(
+            probe, "probe_media", return_value={"start_time": 1.4}
+        ), mock.patch.object(subprocess, "run", return_value=result) as run:
+            keyframes = cut_processor.keyframe_index(Path("/missing/a.ts"), [3.0])
+
+        self.assertEqual(keyframes, [0.0, 2.002, 4.004])
+        self.assertEqual(cut_processor.snap_start(keyframes, 3.0), 2.002)
+        cmd = run.call_args[0][0]
+        # 扫描窗口按绝对时间读取
+        self.assertEqual(cmd[cmd.index("-read_intervals") + 1], "1.400%34.400")
+
+
+if __name__ == "__main__":
+    unittest.main()
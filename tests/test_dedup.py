@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from media_processor.service.common import dedup
+
+
+class TestDedup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        # 每个测试使用独立缓存，避免写入用户目录
+        self.cache = dedup.JsonCache("dedup_hashes", self.root / "cache")
+        patcher = mock.patch.object(dedup, "_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.flush()
+        self.tmp.cleanup()
+
+    def _write(self, name, data):
+        path = self.root / name
+        path.write_bytes(data)
+        return path
+
+    def test_duplicates_detected_across_names(self):
+        payload = b"x" * (dedup.BLOCK_SIZE * 4)
+        a = self._write("a.mp4", payload)
+        b = self._write("copy_of_a.mp4", payload)
+        c = self._write("c.mp4", b"y" * 100)
+
+        index = dedup.build_index([a, b, c])
+        self.assertEqual(index.duplicates, {b: a})
+        self.assertEqual(index.duplicates_of(a), [b])
+
+    def test_partial_collision_confirmed_by_full_hash(self):
+        """Same size/head/middle/tail but different content elsewhere."""
+        size = dedup.BLOCK_SIZE * 8
+        base = bytearray(size)
+        other = bytearray(size)
+        other[dedup.BLOCK_SIZE * 2] = 1  # outside the sampled blocks
+        a = self._write("a.mp4", bytes(base))
+        b = self._write("b.mp4", bytes(other))
+
+        self.assertEqual(dedup.partial_hash(a), dedup.partial_hash(b))
+        index = dedup.build_index([a, b])
+        self.assertEqual(index.duplicates, {})
+
+    def test_link_or_copy(self):
+        src = self._write("out.mp4", b"data")
+        dst = self.root / "nested" / "dup.mp4"
+        self.assertTrue(dedup.link_or_copy(src, dst))
+        self.assertEqual(dst.read_bytes(), b"data")
+        self.assertFalse(dedup.link_or_copy(self.root / "missing.mp4", self.root / "x.mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
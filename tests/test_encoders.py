@@ -0,0 +1,63 @@
+import unittest
+
+from media_processor.service.media_process import encoders, timelapse_processor
+
+
+ENCODERS_STDOUT = """Encoders:
+ V..... = Video
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC (codec h264)
+ V....D libx265              libx265 H.265 / HEVC (codec hevc)
+ V....D libvpx-vp9           libvpx VP9 (codec vp9)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+
+class TestEncoders(unittest.TestCase):
+    def test_parse_encoders_keeps_video_only(self):
+        self.assertEqual(
+            encoders.parse_encoders(ENCODERS_STDOUT),
+            {"libx264", "libx265", "libvpx-vp9"},
+        )
+
+    def test_gpu_falls_back_to_cpu(self):
+        available = encoders.parse_encoders(ENCODERS_STDOUT)
+        self.assertEqual(encoders.resolve(None, True, available=available), "libx264")
+        self.assertEqual(encoders.resolve("hevc", True, available=available), "libx265")
+        self.assertEqual(encoders.resolve("av1", available=available), "libx264")
+
+    def test_compatibility_mode_forces_h264(self):
+        self.assertEqual(
+            encoders.resolve("libx265", compatibility_mode=True, available={"libx264"}),
+            "libx264",
+        )
+
+    def test_quality_speed_map_per_encoder(self):
+        spec = {"name": "libvpx-vp9", "quality": "standard", "speed": "slow"}
+        args = encoders.build_args(spec)
+        self.assertEqual(args[:4], ["-c:v", "libvpx-vp9", "-crf", "36"])
+        self.assertIn("-b:v", args)
+        self.assertEqual(args[args.index("-cpu-used") + 1], "1")
+
+        spec = {"name": "libx264", "quality": "standard", "speed": "fast"}
+        self.assertEqual(
+            encoders.describe(spec),
+            {"encoder": "libx264", "preset": "fast", "crf": "28"},
+        )
+
+    def test_timelapse_keeps_videotoolbox_default(self):
+        saved = encoders._available
+        encoders._available = {"h264_videotoolbox", "libx264"}
+        try:
+            gpu = timelapse_processor.select_encoder(True)
+            cpu = timelapse_processor.select_encoder(False)
+            explicit = timelapse_processor.select_encoder(True, quality="high")
+        finally:
+            encoders._available = saved
+        self.assertEqual(encoders.build_args(gpu)[2:], ["-q:v", "50"])
+        self.assertEqual(encoders.build_args(cpu)[2:4], ["-crf", "24"])
+        self.assertEqual(encoders.build_args(explicit)[2:], ["-q:v", "60"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from media_processor.service.media_process import interlace, video_processor
+from media_processor.service.media_process.video_processor import VideoResolution
+
+IDET_STDERR = """
+[Parsed_idet_0 @ 0x1] Repeated Fields: Neither:   190 Top:     5 Bottom:     5
+[Parsed_idet_0 @ 0x1] Single frame detection: TFF:   150 BFF:     0 Progressive:    40 Undetermined:    10
+[Parsed_idet_0 @ 0x1] Multi frame detection: TFF:   160 BFF:     0 Progressive:    38 Undetermined:     2
+"""
+
+
+class TestInterlace(unittest.TestCase):
+    def test_parse_and_classify(self):
+        counts = interlace.parse_idet(IDET_STDERR)
+        self.assertEqual(counts["tff"], 160)
+        self.assertEqual(counts["progressive"], 38)
+        self.assertEqual(counts["repeated_top"], 5)
+        self.assertEqual(interlace.classify(counts), "tff")
+
+        progressive = dict(counts, tff=3, bff=1, progressive=196)
+        self.assertEqual(interlace.classify(progressive), "progressive")
+        # 3:2 pulldown: 每 5 帧有 2 个重复场
+        telecined = dict(counts, repeated_neither=120, repeated_top=40)
+        self.assertEqual(interlace.classify(telecined), "telecined")
+        self.assertEqual(interlace.classify(interlace.parse_idet("")), "unknown")
+
+    def test_filters_follow_detection(self):
+        self.assertEqual(
+            video_processor.build_filters(VideoResolution.P720, True, "progressive"),
+            ["scale='trunc(min(1280,iw)/2)*2:trunc(ih/2)*2'"],
+        )
+        self.assertEqual(
+            video_processor.build_deinterlace_filters(True, "bff"), ["yadif=1:1:0"]
+        )
+        self.assertEqual(video_processor.build_deinterlace_filters(False, "tff"), [])
+
+    def test_plan_does_not_sample(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "a.mp4"
+            source.write_bytes(b"v")
+            with mock.patch.object(
+                interlace._cache, "get", return_value=None
+            ), mock.patch.object(interlace.subprocess, "run") as run:
+                spec = video_processor.build_command(
+                    source,
+                    Path(tmp) / "a_720p.mp4",
+                    compatibility_mode=True,
+                    detect=False,
+                )
+        run.assert_not_called()
+        self.assertEqual(spec["undetected"], ["interlace"])
+        self.assertTrue(spec["video_filter"].startswith("yadif=1:-1:0"))
+
+    def test_plan_pins_resolved_settings(self):
+        resolved = {
+            "video_encoder": {"name": "libx265", "quality": "high", "speed": "slow"},
+            "field_order": "tff",
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "a.mp4"
+            source.write_bytes(b"v")
+            with mock.patch.object(interlace.subprocess, "run") as run:
+                spec = video_processor.build_command(
+                    source,
+                    Path(tmp) / "a_720p.mp4",
+                    compatibility_mode=True,
+                    auto_tune=True,
+                    resolved=resolved,
+                )
+        run.assert_not_called()
+        self.assertEqual(spec["video_encoder"], resolved["video_encoder"])
+        self.assertTrue(spec["video_filter"].startswith("yadif=1:0:0"))
+        self.assertEqual(
+            video_processor.resolved_settings(spec), dict(resolved, crop=None)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
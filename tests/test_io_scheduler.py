@@ -0,0 +1,73 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from media_processor.service.common import io_scheduler, metrics
+
+
+class TestIoScheduler(unittest.TestCase):
+    def _run(self, io_concurrency, max_jobs=None):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = []
+            for i in range(4):
+                source = Path(tmp) / f"{i}.mp4"
+                source.write_bytes(b"x" * 1024)
+                output = Path(tmp) / f"{i}_out.mp4"
+                jobs.append({"input": str(source), "output": output})
+
+            lock = threading.Lock()
+            state = {"active": 0, "peak": 0}
+
+            def execute(job):
+                with lock:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                time.sleep(0.05)
+                job["output"].write_bytes(b"y" * 2048)
+                with lock:
+                    state["active"] -= 1
+
+            devices = io_scheduler.run_jobs(
+                jobs,
+                execute,
+                lambda job: ([job["input"]], [job["output"]]),
+                io_concurrency,
+                max_jobs,
+            )
+            return state["peak"], devices
+
+    def test_per_device_limit(self):
+        peak, devices = self._run(io_concurrency=2)
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(devices), 1)
+        self.assertEqual(devices[0].bytes_read, 4 * 1024)
+        self.assertEqual(devices[0].bytes_written, 4 * 2048)
+        self.assertGreater(devices[0].throughput(), 0)
+
+    def test_global_cap(self):
+        peak, _ = self._run(io_concurrency=4, max_jobs=1)
+        self.assertEqual(peak, 1)
+
+    def test_return_value_decides_success(self):
+        metrics._enabled = True
+        metrics._task = "merge"
+        self.addCleanup(metrics._values.clear)
+        self.addCleanup(setattr, metrics, "_enabled", False)
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "0.mp4"
+            source.write_bytes(b"x")
+            # 分段合并只报告输出目录，目录本来就存在
+            job = {"input": str(source)}
+            io_scheduler.run_jobs(
+                [job], lambda job: False, lambda job: ([source], [Path(tmp)]), 1
+            )
+        self.assertIn(
+            'media_processor_jobs_completed_total{task="merge",status="failed"} 1',
+            metrics.render(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from media_processor.service.audio_abstracter import loudness
+
+
+SAMPLE_STDERR = """
+[Parsed_loudnorm_0 @ 0x7f]
+{
+	"input_i" : "-23.10",
+	"input_tp" : "-4.20",
+	"input_lra" : "6.30",
+	"input_thresh" : "-33.50",
+	"output_i" : "-16.02",
+	"output_tp" : "-1.50",
+	"output_lra" : "5.10",
+	"output_thresh" : "-26.40",
+	"normalization_type" : "dynamic",
+	"target_offset" : "0.02"
+}
+"""
+
+
+class TestLoudness(unittest.TestCase):
+    def test_parse_loudnorm_output(self):
+        m = loudness.parse_loudnorm_output(SAMPLE_STDERR)
+        self.assertEqual(m["input_i"], -23.1)
+        self.assertEqual(m["input_thresh"], -33.5)
+        self.assertIsNone(loudness.parse_loudnorm_output("no json here"))
+
+    def test_combine_is_duration_weighted(self):
+        """Equal loudness stays put; silent files are ignored."""
+        a = {"input_i": -20.0, "input_tp": -3.0, "input_lra": 5.0, "input_thresh": -30.0, "duration": 60}
+        b = {"input_i": -20.0, "input_tp": -1.0, "input_lra": 8.0, "input_thresh": -30.0, "duration": 180}
+        silent = {"input_i": float("-inf"), "input_tp": float("-inf"), "input_lra": 0.0, "input_thresh": -70.0, "duration": 30}
+
+        combined = loudness.combine_measurements([a, b, silent, None])
+        self.assertAlmostEqual(combined["input_i"], -20.0)
+        self.assertEqual(combined["input_tp"], -1.0)
+        self.assertEqual(combined["input_lra"], 8.0)
+        self.assertIsNone(loudness.combine_measurements([silent]))
+
+    def test_build_audio_filters(self):
+        self.assertIsNone(loudness.build_audio_filters())
+        m = {"input_i": -23.0, "input_tp": -4.0, "input_lra": 6.0, "input_thresh": -33.0}
+        chain = loudness.build_audio_filters(m, trim_silence=True)
+        self.assertTrue(chain.startswith("silenceremove="))
+        self.assertIn("measured_I=-23.00", chain)
+        self.assertIn("linear=true", chain)
+
+    def test_parse_silences_returns_midpoints(self):
+        stderr = (
+            "[silencedetect @ 0x1] silence_start: -0.01\n"
+            "[silencedetect @ 0x1] silence_end: 1.5 | silence_duration: 1.51\n"
+            "[silencedetect @ 0x1] silence_start: 60\n"
+            "[silencedetect @ 0x1] silence_end: 61 | silence_duration: 1\n"
+        )
+        self.assertEqual(loudness.parse_silences(stderr), [0.75, 60.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
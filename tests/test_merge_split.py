@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.constant.constant import MERGE_SPLIT_MARGIN
+from media_processor.runner import batch_merge_runner
+from media_processor.service.media_process import merge_processor
+
+MB = 1024 * 1024
+
+
+class TestMergeSplit(unittest.TestCase):
+    def test_size_cuts_follow_each_clip_bitrate(self):
+        # 100s @ 1 MB/s, 100s @ 4 MB/s; 上限 200 MB
+        cuts = merge_processor.plan_split_times([(100, 100 * MB), (100, 400 * MB)], 200)
+        budget = 200 * MERGE_SPLIT_MARGIN
+        first = 100 + (budget - 100) / 4
+        self.assertAlmostEqual(cuts[0], first, places=2)
+        self.assertAlmostEqual(cuts[1], first + budget / 4, places=2)
+        self.assertEqual(len(cuts), 2)
+
+    def test_duration_and_size_limits_combine(self):
+        cuts = merge_processor.plan_split_times([(300, 30 * MB)], 1000, 100)
+        self.assertEqual(cuts, [97.0, 194.0, 291.0])
+        self.assertEqual(merge_processor.plan_split_times([(300, 30 * MB)], 1000), [])
+
+    def test_split_command_writes_numbered_parts(self):
+        args = merge_processor.build_command(Path("/out/Trip/Trip.mp4"), [97.0, 194.0])
+        self.assertEqual(args[-1], "/out/Trip/Trip_part%03d.mp4")
+        self.assertEqual(args[args.index("-segment_times") + 1], "97.000,194.000")
+        self.assertEqual(args[args.index("-segment_start_number") + 1], "1")
+
+    def test_same_folder_names_are_not_merged_concurrently(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for parent in ("A", "B"):
+                folder = Path(tmp) / "in" / parent / "Trip"
+                folder.mkdir(parents=True)
+                (folder / "001.mp4").write_bytes(b"v")
+            jobs = batch_merge_runner.plan([Path(tmp) / "in"], Path(tmp) / "out")
+
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(jobs[0]["outputs"], jobs[1]["outputs"])
+        self.assertIsNone(jobs[0]["skip"])
+        self.assertIn(jobs[0]["input"], jobs[1]["skip"])
+
+
+if __name__ == "__main__":
+    unittest.main()
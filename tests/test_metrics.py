@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+import urllib.request
+from pathlib import Path
+
+from media_processor.service.common import metrics, profiler
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics._enabled = True
+        metrics._task = "convert"
+
+    def tearDown(self):
+        metrics._enabled = False
+        metrics._values.clear()
+
+    def test_jobs_and_stages(self):
+        metrics.jobs_queued(2)
+        with metrics.job():
+            with profiler.span("encode"):
+                pass
+        with self.assertRaises(ValueError):
+            with metrics.job():
+                raise ValueError("boom")
+        metrics.observe_encode(120, 40)
+        metrics.add_bytes(read=10_000_000_000, written=1)
+
+        text = metrics.render()
+        self.assertIn('media_processor_jobs_queued{task="convert"} 0', text)
+        self.assertIn(
+            'media_processor_jobs_completed_total{task="convert",status="done"} 1', text
+        )
+        self.assertIn(
+            'media_processor_jobs_completed_total{task="convert",status="failed"} 1',
+            text,
+        )
+        self.assertIn('media_processor_encode_realtime_factor{task="convert"} 3', text)
+        # 大整数不丢精度
+        self.assertIn(
+            'media_processor_bytes_read_total{task="convert"} 10000000000', text
+        )
+        self.assertIn(
+            'media_processor_stage_runs_total{task="convert",stage="encode"} 1', text
+        )
+        self.assertIn("# TYPE media_processor_jobs_running gauge", text)
+
+    def test_exporters(self):
+        metrics.jobs_queued(3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "media_processor.prom"
+            metrics.write_textfile(path)
+            self.assertIn("jobs_queued", path.read_text())
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], [path.name])
+
+        server = metrics.serve(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('media_processor_jobs_queued{task="convert"} 3', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import io
+import unittest
+
+from media_processor.service.media_process import motion
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestMotion(unittest.TestCase):
+    def test_static_stretch_gets_max_speed(self):
+        # 10s 运动 + 20s 静止 + 10s 运动 (4 fps 采样)
+        scores = [10.0] * 40 + [0.0] * 80 + [10.0] * 40
+        runs = motion.build_runs(scores, 40.0, 20, 160)
+
+        self.assertEqual(runs[0][:2], (0.0, runs[0][1]))
+        self.assertEqual(runs[-1][1], 40.0)
+        self.assertEqual(max(speed for _, _, speed in runs), 160)
+        self.assertEqual(runs[0][2], 20)
+        # 比统一 20 倍速短得多
+        self.assertLess(motion.output_duration(runs), 40 / 20 * 0.7)
+
+    def test_setpts_expression_is_continuous(self):
+        runs = [(0.0, 10.0, 20.0), (10.0, 30.0, 160.0)]
+        expr = motion.build_setpts_expr(runs)
+        self.assertTrue(expr.startswith("setpts='("))
+        self.assertIn("gte(T,10.000)*(0.5000+(T-10.000)/160.0000)", expr)
+        self.assertNotIn("lt(T,30.000)", expr)
+
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_frame_difference_scores_across_chunks(self):
+        frames = bytes([0] * 4 + [0] * 4 + [255] * 4 + [255] * 4)
+        scores = motion.frame_difference_scores(
+            io.BytesIO(frames), 4, numpy, chunk_frames=2
+        )
+        self.assertEqual(scores, [0.0, 255.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
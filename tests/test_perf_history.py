@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.service.common import perf_history
+
+
+SETTINGS = {
+    "encoder": "libx264",
+    "preset": "fast",
+    "crf": "28",
+    "filters": ["scale"],
+    "resolution": "720p",
+    "compatibility_mode": False,
+}
+INPUT_1080 = {"codec": "h264", "width": 1920, "height": 1080}
+
+
+class TestPerfHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = Path(self.tmp.name) / "perf_history.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_and_estimate(self):
+        """Recorded runs drive the batch ETA."""
+        perf_history.record_run(INPUT_1080, SETTINGS, 100, 50, self.history)
+        perf_history.record_run(INPUT_1080, SETTINGS, 100, 25, self.history)
+
+        total, unknown = perf_history.estimate_batch(
+            [(INPUT_1080, SETTINGS, 300)], self.history
+        )
+        self.assertEqual(unknown, 0)
+        self.assertAlmostEqual(total, 300 / 3.0)
+
+    def test_estimate_falls_back_to_encoder(self):
+        """Unseen input/filters still match on the encoder."""
+        perf_history.record_run(INPUT_1080, SETTINGS, 100, 50, self.history)
+        records = perf_history.load_records(self.history)
+
+        other = dict(SETTINGS, filters=["yadif", "scale"])
+        speed = perf_history.estimate_speed(
+            records, {"codec": "hevc", "height": 2160}, other
+        )
+        self.assertEqual(speed, 2.0)
+        self.assertIsNone(
+            perf_history.estimate_speed(
+                records, INPUT_1080, dict(SETTINGS, encoder="h264_videotoolbox")
+            )
+        )
+
+    def test_report_groups_by_setting(self):
+        perf_history.record_run(INPUT_1080, SETTINGS, 100, 50, self.history)
+        compat = dict(SETTINGS, compatibility_mode=True)
+        perf_history.record_run(INPUT_1080, compat, 100, 100, self.history)
+
+        rows = perf_history.build_report(
+            perf_history.load_records(self.history), by="compatibility_mode"
+        )
+        speeds = {row["value"]: row["median_speed"] for row in rows}
+        self.assertEqual(speeds, {"False": 2.0, "True": 1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.service.common import profiler
+
+BENCH_STDERR = """\
+[info] bench:      900 user       10 sys     1000 real decode_video 0.0
+[info] bench:     4000 user       20 sys     2000 real encode_video 0.0
+[info] bench:      100 user        0 sys     1000 real decode_video 0.0
+[info] bench: utime=0.005s stime=0.000s rtime=0.004s
+[info] bench: maxrss=20480KiB
+"""
+
+
+class TestProfiler(unittest.TestCase):
+    def tearDown(self):
+        profiler._enabled = False
+        profiler._events.clear()
+
+    def test_parse_bench(self):
+        steps, totals = profiler.parse_bench(BENCH_STDERR)
+        self.assertEqual(steps["decode_video"]["real"], 2000)
+        self.assertEqual(steps["decode_video"]["count"], 2)
+        self.assertEqual(steps["encode_video"]["user"], 4000)
+        self.assertEqual(totals["rtime"], 0.004)
+        self.assertEqual(totals["maxrss_kib"], 20480)
+
+    def test_iter_lines_splits_progress(self):
+        stderr = b"frame=1\rframe=2\r\nbench: maxrss=1KiB"
+        stream = io.BufferedReader(io.BytesIO(stderr))
+        lines = list(profiler._iter_lines(stream, chunk_size=4))
+        self.assertEqual(lines, ["frame=1", "frame=2", "bench: maxrss=1KiB"])
+
+        parser = profiler.BenchParser()
+        for line in lines:
+            parser.feed(line)
+        self.assertEqual(parser.result(), ({}, {"maxrss_kib": 1}))
+
+    def test_disabled_records_nothing(self):
+        with profiler.span("walk"):
+            pass
+        self.assertEqual(profiler._events, [])
+
+    def test_nested_spans_export(self):
+        profiler.enable()
+        with profiler.span("file", file="a.mp4"):
+            with profiler.span("rename"):
+                pass
+
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path = Path(tmp) / "trace.json"
+            profiler.export(trace_path)
+            trace = json.loads(trace_path.read_text())
+
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual([e["name"] for e in events], ["rename", "file"])
+        inner, outer = events
+        self.assertGreaterEqual(inner["ts"], outer["ts"])
+        self.assertEqual(outer["args"], {"file": "a.mp4"})
+
+
+if __name__ == "__main__":
+    unittest.main()
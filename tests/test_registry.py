@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.runner import job_plan, registry
+
+
+class TestRegistry(unittest.TestCase):
+    def test_build_kwargs_maps_param_names(self):
+        kwargs = registry.build_kwargs(
+            "convert", {"task": "convert", "resolution": "720p", "test": True}
+        )
+        self.assertEqual(kwargs["target_resolution"], "720p")
+        self.assertTrue(kwargs["test_mode"])
+        self.assertEqual(kwargs["dedup_policy"], "off")
+        self.assertNotIn("task", kwargs)
+
+    def test_plan_is_discovery_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "in" / "trip"
+            source.mkdir(parents=True)
+            (source / "a.mov").touch()
+            (source / "b.mp4").touch()
+            output_dir = Path(tmp) / "out"
+            (output_dir / "trip").mkdir(parents=True)
+            (output_dir / "trip" / "b_20x.mp4").touch()
+
+            runner = registry.load_runner("timelapse")
+            jobs = runner.plan(
+                **registry.build_kwargs(
+                    "timelapse",
+                    {"input_dirs": [str(source.parent)], "output_dir": str(output_dir)},
+                )
+            )
+
+            self.assertEqual([Path(j["input"]).name for j in jobs], ["a.mov", "b.mp4"])
+            self.assertEqual([j["skip"] for j in jobs], [None, "exists"])
+            self.assertEqual(sorted(p.name for p in output_dir.iterdir()), ["trip"])
+
+    def test_every_task_has_run_and_plan(self):
+        for task_type in registry.task_names():
+            runner = registry.load_runner(task_type)
+            for name in ("run", "plan", "describe_jobs", "execute_job"):
+                self.assertTrue(callable(getattr(runner, name)), (task_type, name))
+
+    def test_assign_shards_balances_cost(self):
+        jobs = [
+            {"skip": None, "estimated_seconds": cost} for cost in (300, 200, 100, 100)
+        ] + [{"skip": "exists"}]
+        loads = job_plan.assign_shards(jobs, 2)
+        self.assertEqual(sorted(loads), [300, 400])
+        self.assertEqual(jobs[0]["shard"], 0)
+        self.assertIsNone(jobs[-1]["shard"])
+        plan = {"jobs": jobs, "shards": len(loads)}
+        self.assertEqual(
+            len(job_plan.select_jobs(plan, 1)),
+            sum(1 for j in jobs if j["shard"] == 1),
+        )
+        for shard in (2, -1):
+            with self.assertRaises(ValueError):
+                job_plan.select_jobs(plan, shard)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.service.media_process import resumable
+
+ENCODER = {"name": "libx264", "quality": "standard", "speed": "fast"}
+
+
+class TestResumable(unittest.TestCase):
+    def test_plan_segments(self):
+        self.assertEqual(
+            resumable.plan_segments(650, 300), [(0, 300), (300, 300), (600, 50)]
+        )
+
+    def test_resumes_after_crash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "long.mov"
+            source.write_bytes(b"video")
+            output = Path(tmp) / "long.mp4"
+            processing = Path(tmp) / "long_processing.mp4"
+            calls = []
+
+            def run(cmd, name, **kwargs):
+                calls.append(name)
+                if name == "encode" and len(calls) == 3 and not self.resumed:
+                    raise subprocess.CalledProcessError(137, cmd)
+                Path(cmd[-1]).touch()
+
+            def encode():
+                resumable.encode(
+                    source,
+                    output,
+                    processing,
+                    1000,
+                    300,
+                    "scale=1280:-2",
+                    ENCODER,
+                    False,
+                    None,
+                    run,
+                )
+
+            self.resumed = False
+            with self.assertRaises(subprocess.CalledProcessError):
+                encode()
+            job_dir = resumable.job_dir_for(output)
+            self.assertEqual(len(list(job_dir.glob("seg_*.partial.mkv"))), 0)
+
+            calls.clear()
+            self.resumed = True
+            encode()
+
+            # 4 个片段中 2 个已完成: 只编码剩下的 2 个，再拼接
+            self.assertEqual(calls, ["encode", "encode", "remux"])
+            self.assertTrue(processing.exists())
+            self.assertFalse(job_dir.exists())
+
+    def test_changed_settings_discard_segments(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            job_dir = Path(tmp)
+            resumable.save_checkpoint(job_dir, "old", {0})
+            resumable.segment_path(job_dir, 0).touch()
+            self.assertEqual(resumable.load_checkpoint(job_dir, "old"), {0})
+            self.assertIsNone(resumable.load_checkpoint(job_dir, "new"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from media_processor.service.media_process import chapter_processor, scenes
+
+METADATA_STDOUT = """frame:0    pts:61440   pts_time:4.8
+lavfi.scene_score=0.512000
+frame:1    pts:1203200 pts_time:94
+lavfi.scene_score=0.830000
+"""
+
+
+class TestScenes(unittest.TestCase):
+    def test_parse_cuts(self):
+        self.assertEqual(
+            scenes.parse_cuts(METADATA_STDOUT), [(4.8, 0.512), (94.0, 0.83)]
+        )
+
+    def test_min_length_keeps_strongest_cuts(self):
+        cuts = [(50.0, 0.9), (100.0, 0.5), (130.0, 0.95), (280.0, 0.7)]
+        # 50 离开头太近, 100 离 130 太近, 280 离结尾太近
+        self.assertEqual(scenes.select_chapter_starts(cuts, 300.0, 60), [0.0, 130.0])
+
+    def test_chapter_times_round_trip(self):
+        self.assertEqual(scenes.format_time(3723.25), "01:02:03.250")
+        self.assertEqual(chapter_processor.time_to_ms("01:02:03.250"), 3723250)
+        self.assertEqual(chapter_processor.time_to_ms("05:00"), 300000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.service.common import staging
+from media_processor.service.common.json_cache import file_fingerprint
+
+
+class TestStaging(unittest.TestCase):
+    def test_stage_encode_publish(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            nas, out = tmp / "nas", tmp / "out"
+            nas.mkdir()
+            sources = []
+            for name in ("a", "b", "c"):
+                (nas / f"{name}.mp4").write_bytes(b"v" * 1000)
+                sources.append(nas / f"{name}.mp4")
+            (nas / "b.srt").write_text("1\n00:00:01,000 --> 00:00:02,000\nhi\n")
+
+            stager = staging.Stager(tmp / "scratch", budget_bytes=10_000, prefetch=1)
+            stager.schedule(sources)
+            published = []
+            for source in sources:
+                local = stager.acquire(source)
+                self.assertNotEqual(local.parent, nas)
+                # 缓存 (probe / idet / cropdetect) 按源文件命中
+                self.assertEqual(file_fingerprint(local), file_fingerprint(source))
+                if source.stem == "b":
+                    self.assertTrue(local.with_suffix(".srt").exists())
+                local_dir = stager.output_dir_for(out / source.name)
+                ok = source.stem != "c"
+                if ok:
+                    (local_dir / source.name).write_bytes(local.read_bytes()[:500])
+                else:
+                    (local_dir / f"{source.stem}_processing.mp4").write_bytes(b"x")
+                stager.finish(
+                    source,
+                    local_dir,
+                    out,
+                    ok,
+                    on_published=lambda s=source: published.append(s.name),
+                )
+            stager.close()
+
+            self.assertEqual(sorted(p.name for p in out.iterdir()), ["a.mp4", "b.mp4"])
+            self.assertEqual(published, ["a.mp4", "b.mp4"])
+            self.assertEqual(stager.used, 0)
+            # 输入副本与失败 job 的半成品都已清理
+            self.assertFalse((tmp / "scratch" / "in").exists())
+            self.assertEqual(
+                [f for f in (tmp / "scratch" / "out").rglob("*") if f.is_file()], []
+            )
+
+    def test_oversized_input_is_read_in_place(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "big.mp4"
+            source.write_bytes(b"v" * 1000)
+            stager = staging.Stager(Path(tmp) / "scratch", budget_bytes=1500)
+            stager.schedule([source])
+            self.assertIsNone(stager.acquire(source))
+            stager.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
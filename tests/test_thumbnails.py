@@ -0,0 +1,73 @@
+import unittest
+
+from media_processor.constant.constant import (
+    THUMBNAIL_PREVIEW_CRF,
+    THUMBNAIL_PREVIEW_PRESET,
+)
+from media_processor.service.media_process import thumbnails as catalog
+from media_processor.service.media_process import video_processor
+from media_processor.service.media_process.video_processor import VideoResolution
+
+
+class TestThumbnails(unittest.TestCase):
+    def test_normalize_options(self):
+        self.assertIsNone(catalog.normalize_options(False))
+        self.assertIsNone(
+            catalog.normalize_options(
+                {"sprite_interval": 0, "preview_duration": 0, "poster": False}
+            )
+        )
+        self.assertEqual(catalog.normalize_options(True), catalog.DEFAULTS)
+
+    def test_sprite_sheets(self):
+        options = catalog.normalize_options({"preview_duration": 0, "poster": False})
+        branches, outputs, artifacts = catalog.build_branches(options, "/out/a.mp4", 60)
+        self.assertEqual(branches, [("vsprite", "fps=1/10,scale=160:-2,tile=5x5")])
+        self.assertEqual(outputs[:2], ["-map", "[vsprite]"])
+        self.assertEqual(outputs[-1], "/out/a_sprite_%03d.jpg")
+        self.assertEqual([p.name for p in artifacts], ["a_sprite_%03d.jpg"])
+
+    def test_preview_clip(self):
+        options = catalog.normalize_options({"sprite_interval": 0, "poster": False})
+        branches, outputs, _ = catalog.build_branches(options, "/out/a.mp4", 200)
+        # 默认从 10% 处开始
+        self.assertEqual(
+            branches,
+            [
+                (
+                    "vpreview",
+                    "trim=start=20.0:duration=10,setpts=PTS-STARTPTS,"
+                    "scale=-2:'min(360,ih)'",
+                )
+            ],
+        )
+        self.assertEqual(outputs[outputs.index("-crf") + 1], THUMBNAIL_PREVIEW_CRF)
+        self.assertEqual(
+            outputs[outputs.index("-preset") + 1], THUMBNAIL_PREVIEW_PRESET
+        )
+        self.assertIn("-an", outputs)
+        self.assertEqual(outputs[-1], "/out/a_preview.mp4")
+
+    def test_thumbnails_branch_from_main(self):
+        options = catalog.normalize_options({"preview_duration": 0})
+        branches, outputs, _ = catalog.build_branches(options, "/out/a.mp4", 100)
+        self.assertEqual([label for label, _ in branches], ["vsprite", "vposter"])
+        self.assertIn("/out/a_poster.jpg", outputs)
+
+        graph, _ = video_processor.build_filter_graph(
+            False, VideoResolution.P720, [], branches
+        )
+        self.assertTrue(graph.startswith("[0:v]scale="))
+        self.assertIn("split=3[vmain][vsprite_in][vposter_in]", graph)
+        self.assertIn("trim=start=10.0[vposter]", graph)
+
+    def test_test_mode_limits_input(self):
+        spec = video_processor.build_command(
+            "/nonexistent/a.mp4", "/out/a.mp4", thumbnails=True, test_mode=True
+        )
+        # 限制放在输入上: 封面/雪碧图分支也只解码前 180s
+        self.assertEqual(spec["cmd"][:3], ["-t", "180", "-i"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from media_processor.service.media_process import encoders, tuning
+
+
+class TestTuning(unittest.TestCase):
+    def setUp(self):
+        self.spec = {"name": "libx264", "quality": "standard", "speed": "fast"}
+
+    def test_encode_size_follows_scale_filter(self):
+        info = {"width": 3840, "height": 2160}
+        self.assertEqual(tuning.encode_size(info, 1280), (1280, 720))
+        self.assertEqual(tuning.size_class(1280, 720), "720p")
+        self.assertEqual(tuning.size_class(1440, 1080), "1080p")
+
+    def test_small_frames_and_parallel_jobs_use_fewer_threads(self):
+        tuned = tuning.tune(self.spec, 854, 480, jobs=1, cores=32)
+        self.assertEqual(tuned["tuning"]["threads"], 4)
+
+        tuned = tuning.tune(self.spec, 1920, 1080, jobs=4, cores=16)
+        self.assertEqual(tuned["tuning"]["threads"], 4)
+        self.assertNotIn("preset", tuned["tuning"])
+
+    def test_4k_on_few_cores_uses_faster_preset(self):
+        tuned = tuning.tune(self.spec, 3840, 2160, jobs=2, cores=8)
+        self.assertEqual(tuned["tuning"]["preset"], "faster")
+        self.assertEqual(encoders.describe(tuned)["preset"], "faster")
+
+    def test_x264_params_merge_with_compatibility_mode(self):
+        tuned = tuning.tune(self.spec, 1920, 1080, jobs=1, cores=8)
+        args = encoders.build_args(tuned, compatibility_mode=True)
+        self.assertEqual(args.count("-x264-params"), 1)
+        self.assertEqual(
+            args[args.index("-x264-params") + 1],
+            "ref=4:bframes=3:lookahead-threads=2:sliced-threads=0",
+        )
+        self.assertEqual(args[args.index("-threads") + 1], "8")
+
+    def test_hardware_encoder_is_not_tuned(self):
+        spec = {"name": "h264_videotoolbox", "quality": "standard", "speed": "fast"}
+        self.assertEqual(tuning.tune(spec, 3840, 2160, jobs=4, cores=8), spec)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from media_processor.runner import batch_runner_media_converter as converter
+
+from media_processor.service.media_process import streaming as packaging
+from media_processor.service.media_process import video_processor
+from media_processor.service.media_process.video_processor import VideoResolution
+
+
+class TestFilterGraph(unittest.TestCase):
+    def test_default_chain_unchanged(self):
+        """Single rendition keeps the plain -vf chain."""
+        self.assertEqual(
+            video_processor.build_filters(VideoResolution.P720, True),
+            ["yadif=1:-1:0", "scale='trunc(min(1280,iw)/2)*2:trunc(ih/2)*2'"],
+        )
+
+    def test_ladder_decodes_once(self):
+        graph, labels = video_processor.build_filter_graph(
+            True,
+            VideoResolution.P1080,
+            [VideoResolution.P720, VideoResolution.P480],
+            [],
+        )
+        self.assertEqual(labels, ["r1", "r2"])
+        # 去隔行只做一次，然后 split 到各档位
+        self.assertEqual(graph.count("yadif"), 1)
+        self.assertTrue(
+            graph.startswith("[0:v]yadif=1:-1:0,split=3[main_src][r1_src][r2_src]")
+        )
+        self.assertIn("min(854,iw)", graph)
+        self.assertIn("[vmain]", graph)
+
+
+class TestStreamingPackage(unittest.TestCase):
+    def test_tee_escapes_paths(self):
+        options = packaging.normalize_options("both")
+        package_dir = Path("/out/a|b:1")
+        args = packaging.build_package_args(options, package_dir)
+
+        self.assertEqual(args[:2], ["-force_key_frames", "expr:gte(t,n_forced*6)"])
+        self.assertEqual(args[2:4], ["-f", "tee"])
+        hls_slave, dash_slave = args[4].split("|[f=dash")
+        # 选项值里的 ":" 先转义一次，整个 slave 再为 "|" 转义一次
+        self.assertIn(r"/out/a\|b\\:1/hls/seg_%05d.m4s]", hls_slave)
+        self.assertTrue(dash_slave.endswith(r"a\|b:1/dash/manifest.mpd"))
+
+    def test_package_dir_for(self):
+        self.assertEqual(
+            packaging.package_dir_for("/out/a_720p.mp4"), Path("/out/a_720p")
+        )
+        with self.assertRaises(ValueError):
+            packaging.normalize_options("smooth")
+
+    def test_dotted_names_map_once(self):
+        """The runner maps outputs to package dirs; build_command must not again."""
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            (tmp / "in").mkdir()
+            for name in ("2024.01.05 trip.mp4", "a.1.mp4", "a.2.mp4"):
+                (tmp / "in" / name).write_bytes(b"")
+            jobs = converter.discover_jobs(
+                [tmp / "in"], tmp / "out", [VideoResolution.P720], False, False, "hls"
+            )
+            outputs = sorted(out.name for _, o in jobs for out in o.values())
+            self.assertEqual(outputs, ["2024.01.05 trip", "a.1", "a.2"])
+
+            for v_path, o in jobs:
+                planned = o[VideoResolution.P720]
+                spec = video_processor.build_command(
+                    v_path, planned, streaming="hls"
+                )
+                self.assertEqual(spec["output_path"], planned.resolve())
+                self.assertEqual(
+                    spec["processing_paths"][spec["output_path"]].name,
+                    f"{planned.name}_processing",
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()